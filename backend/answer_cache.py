@@ -0,0 +1,178 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from backend.metrics import CACHE_REQUESTS_TOTAL
+
+load_dotenv()
+
+logger = logging.getLogger("AnswerCache")
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+# 0 disables near-duplicate matching, otherwise a cosine similarity threshold (e.g. 0.95)
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    return _WHITESPACE.sub(" ", question).strip().lower().rstrip("?!. ")
+
+
+class _Entry:
+    __slots__ = ("answer", "embedding", "created_at", "latency", "generation")
+
+    def __init__(self, answer, embedding, created_at, latency, generation):
+        self.answer = answer
+        self.embedding = embedding
+        self.created_at = created_at
+        self.latency = latency
+        self.generation = generation
+
+
+class AnswerCache:
+    """
+    In-memory cache of /query answers keyed by (file_id, scope, normalized
+    question), with TTL + LRU eviction. `scope` names the retrieval settings
+    the answer was built with (mode, top_k, reranking), so a lexical query
+    never gets a vector answer. With a similarity threshold, a question whose
+    embedding is close enough to a cached one reuses that answer too.
+
+    Every entry records the file's vector generation it was answered from,
+    and a lookup passes the generation currently active in the shared DB.
+    An entry from another generation is a miss and is dropped. That way a
+    re-embed or delete done by another uvicorn worker, which
+    `invalidate_file` cannot reach, still retires this worker's answers.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_MAX_ENTRIES, ttl: float = ANSWER_CACHE_TTL,
+                 similarity_threshold: float = ANSWER_CACHE_SIMILARITY, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._by_file = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return self.similarity_threshold > 0
+
+    def _expired(self, entry: _Entry, generation: int) -> bool:
+        if entry.generation != generation:
+            return True
+        return self.ttl > 0 and self._clock() - entry.created_at > self.ttl
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._by_file.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_file[key[0]]
+
+    def _hit(self, key, entry: _Entry, similar: bool):
+        self._entries.move_to_end(key)
+        self.hits += 1
+        if similar:
+            self.similar_hits += 1
+        self.saved_seconds += entry.latency
+        CACHE_REQUESTS_TOTAL.inc(cache="answer", result="hit")
+        return entry.answer
+
+    def get(self, file_id: str, question: str, scope: str = "", generation: int = 0):
+        """Exact (normalized) match, or None. Does not count a miss."""
+        key = (file_id, scope, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, generation):
+                self._remove(key)
+                return None
+            return self._hit(key, entry, similar=False)
+
+    def get_similar(self, file_id: str, embedding, scope: str = "", generation: int = 0):
+        """Best cached answer for `file_id` above the similarity threshold, or None."""
+        if not self.similarity_enabled:
+            return None
+
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key in list(self._by_file.get(file_id, ())):
+                if key[1] != scope:
+                    continue
+                entry = self._entries[key]
+                if self._expired(entry, generation):
+                    self._remove(key)
+                    continue
+                if entry.embedding is None:
+                    continue
+                score = float(np.dot(query, entry.embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                return None
+            return self._hit(best_key, self._entries[best_key], similar=True)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+        CACHE_REQUESTS_TOTAL.inc(cache="answer", result="miss")
+
+    def put(self, file_id: str, question: str, answer: str, latency: float, embedding=None, scope: str = "",
+            generation: int = 0):
+        if embedding is not None and self.similarity_enabled:
+            embedding = np.array(embedding, dtype=np.float32)
+            embedding /= np.linalg.norm(embedding) or 1.0
+        else:
+            embedding = None
+
+        key = (file_id, scope, normalize_question(question))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(answer, embedding, self._clock(), latency, generation)
+            self._by_file.setdefault(file_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_file(self, file_id: str):
+        with self._lock:
+            keys = list(self._by_file.get(file_id, ()))
+            for key in keys:
+                self._remove(key)
+        if keys:
+            logger.info("🧹 Answer cache invalidated %d entries for file_id=%s", len(keys), file_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+                "ttl": self.ttl,
+                "similarity_threshold": self.similarity_threshold,
+            }
+
+
+answer_cache = AnswerCache() if ANSWER_CACHE_ENABLED else None
@@ -0,0 +1,180 @@
+import logging
+import os
+import re
+from collections import deque
+from typing import NamedTuple, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("Chunking")
+
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "sentence")  # fixed | sentence | paragraph | page
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+
+STRATEGIES = ("fixed", "sentence", "paragraph", "page")
+
+# Cheap, model-agnostic token estimate: words and punctuation marks
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n\s*\n")
+_PARAGRAPH_END = re.compile(r"\n\s*\n")
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int            # character span in the extracted text
+    end: int
+    page: Optional[int]   # 1-based source page, None when page offsets are unknown
+    tokens: int
+
+
+def count_tokens(text: str) -> int:
+    return sum(1 for _ in _TOKEN.finditer(text))
+
+
+def _split_spans(text, start, end, pattern):
+    """Spans of text[start:end] cut after every `pattern` match (separator kept on the left)."""
+    pos = start
+    for match in pattern.finditer(text, start, end):
+        if match.end() > pos:
+            yield pos, match.end()
+            pos = match.end()
+    if pos < end:
+        yield pos, end
+
+
+def _make_chunk(text, start, end, page, tokens):
+    # Trim surrounding whitespace but keep the span exact
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start == end:
+        return None
+    return Chunk(text[start:end], start, end, page, tokens)
+
+
+def _split_long(text, start, end, page, max_tokens):
+    """Window a segment that alone exceeds the budget on token boundaries."""
+    window_start, count, last_end = None, 0, start
+    for match in _TOKEN.finditer(text, start, end):
+        if window_start is None:
+            window_start = match.start()
+        count += 1
+        last_end = match.end()
+        if count == max_tokens:
+            chunk = _make_chunk(text, window_start, last_end, page, count)
+            if chunk:
+                yield chunk
+            window_start, count = None, 0
+    if window_start is not None:
+        chunk = _make_chunk(text, window_start, last_end, page, count)
+        if chunk:
+            yield chunk
+
+
+def _fixed_windows(text, start, end, page, max_tokens, overlap_tokens):
+    """Sliding windows of `max_tokens` tokens over text[start:end], neighbours sharing `overlap_tokens`."""
+    tokens = [(match.start(), match.end()) for match in _TOKEN.finditer(text, start, end)]
+    step = max_tokens - min(overlap_tokens, max_tokens - 1)
+    for i in range(0, len(tokens), step):
+        window = tokens[i:i + max_tokens]
+        yield Chunk(text[window[0][0]:window[-1][1]], window[0][0], window[-1][1], page, len(window))
+        if i + max_tokens >= len(tokens):
+            break
+
+
+def _pack(text, segments, page, max_tokens, overlap_tokens, split_long):
+    """
+    Greedily pack consecutive segments into chunks of at most `max_tokens`
+    tokens. A segment that is too long on its own goes to `split_long`.
+    """
+    current = deque()  # (start, end, tokens)
+    total = 0
+
+    def flush():
+        return _make_chunk(text, current[0][0], current[-1][1], page, total)
+
+    for seg_start, seg_end in segments:
+        n = count_tokens(text[seg_start:seg_end])
+        if n == 0:
+            continue
+
+        if n > max_tokens:
+            if current:
+                chunk = flush()
+                if chunk:
+                    yield chunk
+                current.clear()
+                total = 0
+            yield from split_long(seg_start, seg_end)
+            continue
+
+        if current and total + n > max_tokens:
+            chunk = flush()
+            if chunk:
+                yield chunk
+            # Carry trailing segments forward as overlap, whole segments only
+            carried = deque()
+            carried_tokens = 0
+            while current and carried_tokens + current[-1][2] <= overlap_tokens:
+                segment = current.pop()
+                carried.appendleft(segment)
+                carried_tokens += segment[2]
+            current = carried
+            total = carried_tokens
+            if total + n > max_tokens:
+                current.clear()
+                total = 0
+
+        current.append((seg_start, seg_end, n))
+        total += n
+
+    if current:
+        chunk = flush()
+        if chunk:
+            yield chunk
+
+
+def chunk_document(text: str, page_offsets=None, strategy: str = CHUNK_STRATEGY,
+                   max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """
+    Lazily yield `Chunk`s of `text`.
+
+    - fixed:     windows of exactly `max_tokens` tokens, `overlap_tokens` overlapping,
+                 cut without regard to sentences
+    - sentence:  whole sentences packed up to `max_tokens`
+    - paragraph: whole paragraphs packed up to `max_tokens`
+    - page:      one chunk per page, long pages split by paragraph, then sentence
+
+    Chunks never cross a page boundary when `page_offsets` (from the
+    extraction engine) are given, so each chunk has a single source page.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown chunking strategy: {strategy}")
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be >= 1")
+
+    pages = page_offsets or [(0, len(text))]
+    for page_index, (page_start, page_end) in enumerate(pages):
+        page = page_index + 1 if page_offsets else None
+
+        # Too-long units fall back to the next finer level: paragraph -> sentence -> token windows
+        def windows(start, end):
+            return _split_long(text, start, end, page, max_tokens)
+
+        def sentences(start, end):
+            return _pack(text, _split_spans(text, start, end, _SENTENCE_END), page, max_tokens, overlap_tokens, windows)
+
+        def paragraphs(start, end):
+            return _pack(text, _split_spans(text, start, end, _PARAGRAPH_END), page, max_tokens, overlap_tokens, sentences)
+
+        if strategy == "fixed":
+            yield from _fixed_windows(text, page_start, page_end, page, max_tokens, overlap_tokens)
+        elif strategy == "sentence":
+            yield from sentences(page_start, page_end)
+        elif strategy == "paragraph":
+            yield from paragraphs(page_start, page_end)
+        else:
+            yield from _pack(text, [(page_start, page_end)], page, max_tokens, overlap_tokens, paragraphs)
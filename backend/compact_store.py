@@ -0,0 +1,298 @@
+"""
+Compact per-file vector store: an alternative to keeping every vector in
+Chroma (VECTOR_STORE=compact).
+
+Each file generation is a directory of NumPy files opened with mmap:
+
+- codes.npy   int8 (with a float32 scale per row) or float16 copy of the vectors, scanned per query
+- full.npy    float32 vectors, only the final candidates' rows are read (rescoring);
+              not written with COMPACT_RESCORE=0
+- chunks.json ids, documents and metadata
+- ivf_*.npy   for files of at least COMPACT_IVF_MIN_ROWS chunks: k-means lists,
+              rows stored list by list so a query only scans the probed lists
+
+`CompactIndex` answers the `query` / `get` calls retrieval makes on a
+Chroma collection, so it can be passed wherever a collection is.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("CompactStore")
+
+VECTOR_STORE = os.getenv("VECTOR_STORE", "chroma")  # chroma | compact
+COMPACT_STORE_DIR = os.getenv("COMPACT_STORE_DIR", "compact_store")
+COMPACT_DTYPE = os.getenv("COMPACT_DTYPE", "int8")  # int8 | float16
+# Candidates rescored at full precision: top_k * COMPACT_RESCORE; 0 = no float32 copy, codes only
+COMPACT_RESCORE = int(os.getenv("COMPACT_RESCORE", "4"))
+# Files with at least this many chunks get an IVF index; COMPACT_IVF_PROBE lists are scanned per query
+COMPACT_IVF_MIN_ROWS = int(os.getenv("COMPACT_IVF_MIN_ROWS", "20000"))
+COMPACT_IVF_PROBE = int(os.getenv("COMPACT_IVF_PROBE", "8"))
+
+DTYPES = ("int8", "float16")
+
+# Rows converted to float32 at a time while scanning: bounds the temporary copy
+_SCAN_BLOCK = 8192
+_KMEANS_ITERATIONS = 10
+
+# Indexes kept open between queries
+_CACHE_SIZE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def store_path(file_id: str, generation: int) -> str:
+    return os.path.join(COMPACT_STORE_DIR, f"{file_id}.g{generation}")
+
+
+def _normalize(matrix):
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _quantize(full, dtype: str):
+    import numpy as np
+
+    if dtype == "float16":
+        return full.astype(np.float16), None
+    if dtype == "int8":
+        # Symmetric per-row scale: row ≈ codes * scale
+        scales = np.abs(full).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.round(full / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    raise ValueError(f"Unknown COMPACT_DTYPE {dtype!r}, expected one of {', '.join(DTYPES)}")
+
+
+def _kmeans(full, n_lists: int):
+    """Spherical k-means: (centroids, list of every row)."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    centroids = full[rng.choice(len(full), n_lists, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assignment = np.concatenate([
+            np.argmax(full[start:start + _SCAN_BLOCK] @ centroids.T, axis=1)
+            for start in range(0, len(full), _SCAN_BLOCK)
+        ])
+        for i in range(n_lists):
+            members = full[assignment == i]
+            if len(members):
+                centroids[i] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32), assignment
+
+
+def write(file_id: str, generation: int, ids, documents, metadatas, embeddings, dtype: str = COMPACT_DTYPE,
+          rescore: int = COMPACT_RESCORE):
+    """
+    Store one file generation; it becomes visible to `load` only once
+    complete. The float32 copy is only kept when `rescore` is set.
+    """
+    import numpy as np
+
+    ids, documents, metadatas = list(ids), list(documents), list(metadatas)
+    full = np.asarray(embeddings, dtype=np.float32)
+    full = _normalize(full.reshape(len(ids), -1) if ids else np.zeros((0, 1), dtype=np.float32))
+    path = store_path(file_id, generation)
+    tmp_path = path + ".part"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    # Large files: store rows list by list so a query reads a few contiguous ranges
+    if len(full) >= COMPACT_IVF_MIN_ROWS:
+        n_lists = max(1, int(len(full) ** 0.5))
+        centroids, assignment = _kmeans(full, n_lists)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1)).astype(np.int64)
+        full = full[order]
+        ids, documents, metadatas = ([items[i] for i in order] for items in (ids, documents, metadatas))
+        np.save(os.path.join(tmp_path, "ivf_centroids.npy"), centroids)
+        np.save(os.path.join(tmp_path, "ivf_offsets.npy"), offsets)
+
+    codes, scales = _quantize(full, dtype)
+    np.save(os.path.join(tmp_path, "codes.npy"), codes)
+    if scales is not None:
+        np.save(os.path.join(tmp_path, "scales.npy"), scales)
+    if rescore > 0:
+        np.save(os.path.join(tmp_path, "full.npy"), full)
+    with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    with _cache_lock:
+        _cache.pop(path, None)
+    logger.info("🗜️ Compact vectors stored: file_id=%s, generation=%s, rows=%d, dtype=%s",
+                file_id, generation, len(ids), dtype)
+
+
+class CompactIndex:
+    """One file generation, memory-mapped; duck-types the Chroma collection calls retrieval uses."""
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        with open(os.path.join(path, "chunks.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.ids = data["ids"]
+        self.documents = data["documents"]
+        self.metadatas = data["metadatas"]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+        def optional(name):
+            file_path = os.path.join(path, name)
+            return np.load(file_path, mmap_mode="r") if os.path.exists(file_path) else None
+
+        self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        self.full = optional("full.npy")
+        self.scales = optional("scales.npy")
+        self.centroids = optional("ivf_centroids.npy")
+        self.offsets = optional("ivf_offsets.npy")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _ranges(self, query, n_probe: int):
+        import numpy as np
+
+        if self.centroids is None:
+            return [(0, len(self.ids))]
+        lists = np.argsort(-(self.centroids @ query))[:n_probe]
+        return [(int(self.offsets[i]), int(self.offsets[i + 1])) for i in sorted(lists)]
+
+    def search(self, query_embedding, k: int, rescore: int = COMPACT_RESCORE, n_probe: int = COMPACT_IVF_PROBE):
+        """
+        [(row, cosine similarity)] best first: approximate scan, then
+        float32 rescoring of the best k * rescore (approximate scores as
+        they are when the generation has no float32 copy).
+        """
+        import numpy as np
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        rows, scores = [], []
+        for start, end in self._ranges(query, n_probe):
+            for block in range(start, end, _SCAN_BLOCK):
+                stop = min(end, block + _SCAN_BLOCK)
+                approx = self.codes[block:stop].astype(np.float32) @ query
+                if self.scales is not None:
+                    approx *= self.scales[block:stop]
+                rows.append(np.arange(block, stop))
+                scores.append(approx)
+        if not rows or k < 1:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+
+        if self.full is None or rescore < 1:
+            best = np.argsort(-scores)[:k]
+            return [(int(rows[i]), float(scores[i])) for i in best]
+
+        n_candidates = min(len(rows), max(k, k * rescore))
+        candidates = np.sort(rows[np.argpartition(-scores, n_candidates - 1)[:n_candidates]])
+        exact = self.full[candidates] @ query
+        best = np.argsort(-exact)[:k]
+        return [(int(candidates[i]), float(exact[i])) for i in best]
+
+    def vectors(self, ids):
+        """
+        {chunk_id: float32 vector} for the `ids` stored here (reused by the
+        next generation), decoded from the codes without a float32 copy.
+        """
+        import numpy as np
+
+        rows = sorted(self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows)
+        if not rows:
+            return {}
+        if self.full is not None:
+            vectors = np.asarray(self.full[rows])
+        else:
+            vectors = self.codes[rows].astype(np.float32)
+            if self.scales is not None:
+                vectors *= self.scales[rows][:, None]
+            vectors = _normalize(vectors)
+        return {self.ids[row]: vector for row, vector in zip(rows, vectors)}
+
+    # ---------------- Chroma collection interface ---------------- #
+    # The index holds exactly one file generation: `where` filters on it are already satisfied.
+
+    def query(self, query_embeddings, n_results: int = 10, where=None, include=("documents", "metadatas", "distances")):
+        hits = self.search(query_embeddings[0], n_results)
+        return {
+            "ids": [[self.ids[row] for row, _ in hits]],
+            "documents": [[self.documents[row] for row, _ in hits]],
+            "metadatas": [[self.metadatas[row] for row, _ in hits]],
+            # Cosine distance, as in a Chroma collection with hnsw:space=cosine
+            "distances": [[1.0 - score for _, score in hits]],
+        }
+
+    def get(self, ids=None, where=None, include=("documents", "metadatas"), limit=None):
+        rows = range(len(self.ids)) if ids is None else [self._rows[c] for c in ids if c in self._rows]
+        rows = list(rows)[:limit] if limit else list(rows)
+        return {
+            "ids": [self.ids[row] for row in rows],
+            "documents": [self.documents[row] for row in rows],
+            "metadatas": [self.metadatas[row] for row in rows],
+        }
+
+
+def load(file_id: str, generation: int):
+    """The file generation's CompactIndex, or None when it is stored in Chroma."""
+    if not generation:
+        return None
+    path = store_path(file_id, generation)
+    try:
+        mtime = os.path.getmtime(os.path.join(path, "chunks.json"))
+    except OSError:
+        return None
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(path)
+            return cached[1]
+
+    index = CompactIndex(path)
+    with _cache_lock:
+        _cache[path] = (mtime, index)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def in_use() -> bool:
+    """Cheap check whether any file generation is stored here at all."""
+    try:
+        with os.scandir(COMPACT_STORE_DIR) as entries:
+            return any(True for _ in entries)
+    except OSError:
+        return False
+
+
+def delete(file_id: str, generation: int):
+    path = store_path(file_id, generation)
+    with _cache_lock:
+        _cache.pop(path, None)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def stored_generations():
+    """(file_id, generation) of every generation stored here."""
+    try:
+        with os.scandir(COMPACT_STORE_DIR) as entries:
+            names = [entry.name for entry in entries if entry.is_dir()]
+    except OSError:
+        return
+    for name in names:
+        file_id, _, generation = name.rpartition(".g")
+        if file_id and generation.isdigit():
+            yield file_id, int(generation)
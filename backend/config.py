@@ -1,45 +1,77 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
+import queue
+from datetime import datetime, timezone
 from dotenv import load_dotenv
 import sys
 import io
+from backend.metrics import LOG_RECORDS_DROPPED_TOTAL, SampledFilter, TraceIdFilter
 
 load_dotenv()
 
 LOG_DIR = os.getenv("LOG_DIR")
 os.makedirs(LOG_DIR, exist_ok=True)
 
-def setup_logging():
-    # Root Logger
-    logger = logging.getLogger()
-    # avoid adding duplicate handlers if `setup_logging` called multiple times
-    if logger.handlers:
-        return
-    logger.setLevel(logging.INFO)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text | json
+# Share of requests whose INFO logs are kept (warnings and errors always are)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+# Write logs from a background thread; false = write in the logging thread (debugging)
+LOG_ASYNC = os.getenv("LOG_ASYNC", "true").lower() == "true"
+# Records waiting for the writer thread; beyond that they are dropped (and counted)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+_listener = None
 
-    # Formatter
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] [%(name)s] — %(message)s",
-        "%Y-%m-%d %H:%M:%S",
-    )
 
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, trace_id, message (+ exception)."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "trace_id": getattr(record, "trace_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _BackgroundQueueHandler(QueueHandler):
+    """
+    Hands records to the writer thread as they are: the message is only
+    formatted there (`prepare` of the stdlib handler would format it in the
+    caller), and a full queue drops the record instead of blocking.
+    """
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED_TOTAL.inc()
+
+
+def _build_handlers(formatter):
     # ----------- File: app.log (general logs) -----------
     file_handler = RotatingFileHandler(
         f"{LOG_DIR}/app.log", maxBytes=5_000_000, backupCount=5, encoding="utf-8"
     )
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
     # ----------- File: error.log -----------
     error_handler = RotatingFileHandler(
         f"{LOG_DIR}/error.log", maxBytes=5_000_000, backupCount=5, encoding="utf-8"
     )
     error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
 
-    
     # Wrap the standard error stream with a UTF-8 TextIOWrapper so
     # writing Unicode (e.g. emojis) doesn't raise encoding errors.
     try:
@@ -47,9 +79,55 @@ def setup_logging():
     except Exception:
         # Fallback: use the original stderr if wrapping isn't possible
         stream = sys.stderr
-
     console_handler = logging.StreamHandler(stream)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+
+    handlers = [file_handler, error_handler, console_handler]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def setup_logging():
+    global _listener
+
+    # Root Logger
+    logger = logging.getLogger()
+    # avoid adding duplicate handlers if `setup_logging` called multiple times
+    if logger.handlers:
+        return
+    logger.setLevel(LOG_LEVEL)
+
+    # Formatter
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "[%(asctime)s] [%(levelname)s] [%(name)s] [%(trace_id)s] — %(message)s",
+            "%Y-%m-%d %H:%M:%S",
+        )
+
+    handlers = _build_handlers(formatter)
+    if LOG_ASYNC:
+        # Callers only enqueue; file writes and rotation happen on the listener thread
+        _listener = QueueListener(queue.Queue(LOG_QUEUE_SIZE), *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        handlers = [_BackgroundQueueHandler(_listener.queue)]
+
+    # Filters run in the logging thread: the trace id and the sampling decision live in its context
+    for handler in handlers:
+        handler.addFilter(SampledFilter())
+        # Request / job trace id on every record, so one answer's logs can be grepped together
+        handler.addFilter(TraceIdFilter())
+        logger.addHandler(handler)
 
     logging.info("Logging initialized.")
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread (idempotent)."""
+    global _listener
+
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
@@ -0,0 +1,148 @@
+import contextvars
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+from backend.metrics import INGEST_STAGE_SECONDS
+
+load_dotenv()
+
+logger = logging.getLogger("EmbeddingEngine")
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "models/gemini-embedding-001")
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "1.0"))
+EMBED_BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "30.0"))
+
+
+def is_rate_limit_error(exc: Exception) -> bool:
+    """True for quota / 429 style errors that are worth retrying."""
+    if type(exc).__name__ in ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable"):
+        return True
+    message = str(exc).lower()
+    return "429" in message or "resource_exhausted" in message or "rate limit" in message or "quota" in message
+
+
+class EmbeddingEngine:
+    """
+    Batches texts into `embed_documents` calls and keeps a bounded number
+    of batches in flight. Any object with `embed_documents(list[str])` and
+    `embed_query(str)` can be used as the embedder, which keeps the engine
+    testable against a local fake. With a `cache`, only texts the model has
+    not seen before are sent to it.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        cache=None,
+        model_name: str = EMBED_MODEL,
+        batch_size: int = EMBED_BATCH_SIZE,
+        max_concurrency: int = EMBED_MAX_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff_base: float = EMBED_BACKOFF_BASE,
+        backoff_max: float = EMBED_BACKOFF_MAX,
+        sleep=time.sleep,
+    ):
+        if batch_size < 1 or max_concurrency < 1:
+            raise ValueError("batch_size and max_concurrency must be >= 1")
+        self.embedder = embedder
+        self.cache = cache
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        # Shared pool => the concurrency bound holds across concurrent requests too
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed")
+
+    def _with_retry(self, fn, *args):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_rate_limit_error(e):
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                delay *= 0.5 + random.random() / 2  # jitter
+                logger.warning("⏳ Rate limited, retrying in %.2fs (attempt %d/%d)", delay, attempt + 1, self.max_retries)
+                self._sleep(delay)
+                attempt += 1
+
+    def _embed_batch(self, texts):
+        with INGEST_STAGE_SECONDS.time(stage="embed_batch"):
+            return self._with_retry(self.embedder.embed_documents, texts)
+
+    def embed_documents(self, texts, on_batch=None):
+        """
+        Embed `texts` in batches and return vectors in input order.
+        `on_batch(n)` is called with the number of texts finished after
+        every completed batch.
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        if self.cache is not None:
+            vectors = self.cache.get_many(self.model_name, texts)
+        else:
+            vectors = [None] * len(texts)
+
+        # Only unique, uncached texts go to the model
+        pending = {}
+        for i, (text, vector) in enumerate(zip(texts, vectors)):
+            if vector is None:
+                pending.setdefault(text, []).append(i)
+
+        done = len(texts) - sum(len(positions) for positions in pending.values())
+        if done and on_batch:
+            on_batch(done)
+        if not pending:
+            return vectors
+
+        to_embed = list(pending)
+        futures = {
+            self._pool.submit(contextvars.copy_context().run, self._embed_batch, to_embed[start:start + self.batch_size]): start
+            for start in range(0, len(to_embed), self.batch_size)
+        }
+
+        try:
+            for future in as_completed(futures):
+                start = futures[future]
+                batch_vectors = future.result()
+                batch_texts = to_embed[start:start + len(batch_vectors)]
+                for text, vector in zip(batch_texts, batch_vectors):
+                    for i in pending[text]:
+                        vectors[i] = vector
+                        done += 1
+                if self.cache is not None:
+                    self.cache.put_many(self.model_name, batch_texts, batch_vectors)
+                if on_batch:
+                    on_batch(done)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+        return vectors
+
+    def embed_query(self, text: str):
+        if self.cache is not None:
+            cached = self.cache.get_many(self.model_name, [text], kind="query")[0]
+            if cached is not None:
+                return cached
+
+        vector = self._with_retry(self.embedder.embed_query, text)
+        if self.cache is not None:
+            self.cache.put_many(self.model_name, [text], [vector], kind="query")
+        return vector
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
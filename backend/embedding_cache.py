@@ -0,0 +1,186 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from backend.database import SessionLocal
+from backend.metrics import CACHE_REQUESTS_TOTAL
+from backend.models import EmbeddingCacheEntry
+
+load_dotenv()
+
+logger = logging.getLogger("EmbeddingCache")
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+# A hit only rewrites last_used_at when it is older than this (seconds): LRU order is coarse but lookups stay read-only
+EMBED_CACHE_TOUCH_INTERVAL = float(os.getenv("EMBED_CACHE_TOUCH_INTERVAL", "3600"))
+
+# Keep IN (...) lists below SQLite's bound-parameter limit
+_LOOKUP_BATCH = 500
+# Puts between two exact row counts, to pick up rows other workers inserted
+_RECOUNT_EVERY = 1000
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _encode(vector) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _decode(blob: bytes):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache stored in the app database.
+    Entries are keyed by (model, kind, hash of normalized text), so a chunk
+    that was embedded once is never sent to the model again. The table is
+    capped at `max_entries` rows; least recently used rows are evicted first.
+
+    Hits only touch `last_used_at` once per `touch_interval`, and the row
+    count is tracked in memory (recounted every _RECOUNT_EVERY puts), so a
+    lookup is normally a plain read and a put counts nothing.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+                 touch_interval: float = EMBED_CACHE_TOUCH_INTERVAL):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._rows = None  # estimated table size, None until first counted
+        self._puts = 0
+
+    @staticmethod
+    def make_key(model: str, text: str, kind: str = "document") -> str:
+        payload = f"{model}\x00{kind}\x00{normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts, kind: str = "document"):
+        """Return a list aligned with `texts`: the cached vector or None."""
+        keys = [self.make_key(model, t, kind) for t in texts]
+        found = {}
+        now = time.time()
+        stale = []
+
+        with self.session_factory() as db:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _LOOKUP_BATCH):
+                batch = unique_keys[start:start + _LOOKUP_BATCH]
+                rows = db.query(
+                    EmbeddingCacheEntry.cache_key, EmbeddingCacheEntry.vector, EmbeddingCacheEntry.last_used_at
+                ).filter(EmbeddingCacheEntry.cache_key.in_(batch)).all()
+                for row in rows:
+                    found[row.cache_key] = _decode(row.vector)
+                    if (row.last_used_at or 0) < now - self.touch_interval:
+                        stale.append(row.cache_key)
+
+            # Touch hits so LRU eviction keeps them, only when their timestamp went stale
+            if stale:
+                for start in range(0, len(stale), _LOOKUP_BATCH):
+                    db.query(EmbeddingCacheEntry).filter(
+                        EmbeddingCacheEntry.cache_key.in_(stale[start:start + _LOOKUP_BATCH])
+                    ).update({EmbeddingCacheEntry.last_used_at: now}, synchronize_session=False)
+                db.commit()
+
+        results = [found.get(k) for k in keys]
+        hits = sum(1 for r in results if r is not None)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(results) - hits
+        CACHE_REQUESTS_TOTAL.inc(hits, cache="embedding", result="hit")
+        CACHE_REQUESTS_TOTAL.inc(len(results) - hits, cache="embedding", result="miss")
+        return results
+
+    def put_many(self, model: str, texts, vectors, kind: str = "document"):
+        entries = {}
+        for text, vector in zip(texts, vectors):
+            entries[self.make_key(model, text, kind)] = vector
+        if not entries:
+            return
+
+        now = time.time()
+        with self.session_factory() as db:
+            keys = list(entries)
+            existing = set()
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                rows = db.query(EmbeddingCacheEntry.cache_key).filter(
+                    EmbeddingCacheEntry.cache_key.in_(keys[start:start + _LOOKUP_BATCH])
+                ).all()
+                existing.update(row.cache_key for row in rows)
+
+            new = [
+                EmbeddingCacheEntry(
+                    cache_key=key,
+                    model=model,
+                    dim=len(vector),
+                    vector=_encode(vector),
+                    last_used_at=now,
+                )
+                for key, vector in entries.items()
+                if key not in existing
+            ]
+            if not new:
+                return
+            db.add_all(new)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker cached the same chunk concurrently
+                db.rollback()
+                logger.warning("⚠️ Embedding cache insert raced with another writer, skipped")
+                return
+
+            with self._lock:
+                self._puts += 1
+                recount = self._rows is None or self._puts % _RECOUNT_EVERY == 0
+                if not recount:
+                    self._rows += len(new)
+                over = not recount and self._rows > self.max_entries
+            if recount or over:
+                self._evict(db)
+
+    def _evict(self, db):
+        total = db.query(EmbeddingCacheEntry).count()
+        excess = total - self.max_entries
+        with self._lock:
+            self._rows = min(total, self.max_entries)
+        if excess <= 0:
+            return
+
+        cutoff = db.query(EmbeddingCacheEntry.cache_key).order_by(
+            EmbeddingCacheEntry.last_used_at.asc()
+        ).limit(excess).subquery()
+        db.query(EmbeddingCacheEntry).filter(
+            EmbeddingCacheEntry.cache_key.in_(db.query(cutoff.c.cache_key))
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        with self._lock:
+            self.evictions += excess
+        logger.info("🧹 Embedding cache evicted %d entries", excess)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "max_entries": self.max_entries,
+            }
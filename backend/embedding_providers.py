@@ -0,0 +1,124 @@
+import logging
+import os
+import zlib
+from dotenv import load_dotenv
+from backend.embedding import EMBED_MODEL
+from backend.lexical_index import tokenize
+
+load_dotenv()
+
+logger = logging.getLogger("EmbeddingProviders")
+
+# gemini (remote API) | sentence-transformers (local model, optional package) | hashing (local, no model)
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "gemini")
+EMBED_LOCAL_MODEL = os.getenv("EMBED_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# CPU threads a local model may use for one batch
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", str(os.cpu_count() or 1)))
+EMBED_HASH_DIM = int(os.getenv("EMBED_HASH_DIM", "512"))
+
+PROVIDERS = ("gemini", "sentence-transformers", "hashing")
+
+
+class HashingEmbedder:
+    """
+    Signed feature hashing of word unigrams and bigrams into `dim`
+    buckets, L2-normalized. No model download and no network: lexical
+    similarity only, meant for offline runs, tests and benchmarks.
+    """
+
+    def __init__(self, dim: int = EMBED_HASH_DIM):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        import numpy as np
+
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            words = tokenize(text)
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                # crc32, not hash(): vectors must be stable across processes
+                h = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (rows, columns), signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+
+class SentenceTransformerEmbedder:
+    """Local sentence-transformers model on CPU, one vectorized forward pass per batch."""
+
+    def __init__(self, model_name: str = EMBED_LOCAL_MODEL, threads: int = EMBED_THREADS, batch_size: int = 64):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBED_PROVIDER=sentence-transformers needs `pip install sentence-transformers`"
+            ) from e
+
+        torch.set_num_threads(threads)
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def embed_documents(self, texts):
+        return self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).tolist()
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+
+def provider_model(provider: str = EMBED_PROVIDER) -> str:
+    """
+    Model id stored with the collection and used as the embedding cache key.
+    Gemini keeps the bare EMBED_MODEL so existing cache entries stay valid.
+    """
+    if provider == "gemini":
+        return EMBED_MODEL
+    if provider == "sentence-transformers":
+        return f"sentence-transformers:{EMBED_LOCAL_MODEL}"
+    if provider == "hashing":
+        return f"hashing:{EMBED_HASH_DIM}"
+    raise ValueError(f"Unknown EMBED_PROVIDER {provider!r}, expected one of {', '.join(PROVIDERS)}")
+
+
+def is_local(provider: str = EMBED_PROVIDER) -> bool:
+    return provider != "gemini"
+
+
+def is_embedded(record) -> bool:
+    """True when the file's vectors come from the configured provider (i.e. live in this collection)."""
+    return bool(record.embedding_status) and (record.embedding_model or provider_model("gemini")) == provider_model()
+
+
+def embedded_clause():
+    """`is_embedded` as a SQL filter on FileInfo."""
+    from sqlalchemy import and_, func
+    from backend.models import FileInfo
+
+    return and_(
+        FileInfo.embedding_status.is_(True),
+        func.coalesce(FileInfo.embedding_model, provider_model("gemini")) == provider_model(),
+    )
+
+
+def build_embedder(provider: str = EMBED_PROVIDER):
+    provider_model(provider)  # validates the name
+    logger.info("🧠 Embedding provider: %s (%s)", provider, provider_model(provider))
+
+    if provider == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=EMBED_MODEL)
+    if provider == "sentence-transformers":
+        return SentenceTransformerEmbedder()
+    return HashingEmbedder()
@@ -0,0 +1,50 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Short blocking calls made while serving a request: SQLite, Chroma, file I/O, cached embeddings
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))
+# Long blocking calls (synchronous /extract and /embed): kept apart so they cannot starve queries
+BULK_WORKERS = int(os.getenv("BULK_WORKERS", "2"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(name: str, workers: int):
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+                _pools[name] = pool
+    return pool
+
+
+async def run_io(fn, *args, **kwargs):
+    """Run a short blocking call on the bounded I/O pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    # Copy the context so the request's trace id follows the call into the pool
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_pool("io", IO_WORKERS), call)
+
+
+async def run_bulk(fn, *args, **kwargs):
+    """Run a long blocking call (whole-file extraction / embedding) on the bulk pool."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_get_pool("bulk", BULK_WORKERS), call)
+
+
+def shutdown():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
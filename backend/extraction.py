@@ -0,0 +1,190 @@
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from backend.metrics import INGEST_STAGE_SECONDS
+
+load_dotenv()
+
+logger = logging.getLogger("ExtractionEngine")
+
+EXTRACT_BACKEND = os.getenv("EXTRACT_BACKEND", "pypdf2")  # pypdf2 | pymupdf
+EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", "16"))
+
+BACKENDS = ("pypdf2", "pymupdf")
+
+# Written after every page so page boundaries survive in the text file
+PAGE_SEPARATOR = "\n"
+
+PREVIEW_LINES = 20
+PREVIEW_CHARS = 1000
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a threaded server process is not safe
+                _pool = ProcessPoolExecutor(
+                    max_workers=EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def pages_path(text_path: str) -> str:
+    """Sidecar file holding per-page character offsets of `text_path`."""
+    return os.path.splitext(text_path)[0] + ".pages.json"
+
+
+def load_page_offsets(text_path: str):
+    """[(start, end), ...] character spans of every page, or None if unknown."""
+    path = pages_path(text_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [tuple(span) for span in json.load(f)["pages"]]
+
+
+def count_pages(pdf_path: str, backend: str = EXTRACT_BACKEND) -> int:
+    if backend == "pymupdf":
+        import fitz
+
+        with fitz.open(pdf_path) as doc:
+            return doc.page_count
+
+    import PyPDF2
+
+    with open(pdf_path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _iter_page_texts(pdf_path: str, backend: str, start: int, end: int):
+    if backend == "pymupdf":
+        import fitz
+
+        with fitz.open(pdf_path) as doc:
+            for i in range(start, end):
+                yield doc.load_page(i).get_text() or ""
+        return
+
+    import PyPDF2
+
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        for i in range(start, end):
+            yield reader.pages[i].extract_text() or ""
+
+
+def extract_page_range(pdf_path: str, backend: str, start: int, end: int):
+    """Text of pages [start, end). Runs inside the worker processes."""
+    return list(_iter_page_texts(pdf_path, backend, start, end))
+
+
+def extract_page_range_timed(pdf_path: str, backend: str, start: int, end: int):
+    """Like `extract_page_range`, plus the seconds each page took (first page includes opening the PDF)."""
+    texts, seconds = [], []
+    started = time.perf_counter()
+    for text in _iter_page_texts(pdf_path, backend, start, end):
+        now = time.perf_counter()
+        texts.append(text)
+        seconds.append(now - started)
+        started = now
+    return texts, seconds
+
+
+def extract_to_file(pdf_path: str, out_path: str, backend: str = EXTRACT_BACKEND,
+                    workers: int = EXTRACT_WORKERS, pages_per_task: int = EXTRACT_PAGES_PER_TASK,
+                    progress=None):
+    """
+    Extract `pdf_path` into `out_path`, page ranges in parallel.
+    Pages are written in order as soon as their range is done, so the full
+    text is never held in memory. Per-page offsets go to `pages_path(out_path)`.
+    `progress(pages_done, pages_total)` is called after every written range.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend: {backend}")
+
+    with INGEST_STAGE_SECONDS.time(stage="page_count"):
+        total_pages = count_pages(pdf_path, backend)
+    if total_pages == 0:
+        return {"num_pages": 0, "text_length": 0, "preview_text": ""}
+
+    ranges = [(start, min(start + pages_per_task, total_pages)) for start in range(0, total_pages, pages_per_task)]
+    parallel = workers > 1 and len(ranges) > 1
+    logger.info("📄 Extracting %d pages: backend=%s, ranges=%d, parallel=%s", total_pages, backend, len(ranges), parallel)
+
+    offsets = []
+    position = 0
+    head = []
+    head_chars = 0
+    tmp_path = out_path + ".part"
+
+    def write_pages(out, result):
+        nonlocal position, head_chars
+        texts, seconds = result
+        for page_seconds in seconds:
+            INGEST_STAGE_SECONDS.observe(page_seconds, stage="extract_page")
+        for text in texts:
+            out.write(text)
+            out.write(PAGE_SEPARATOR)
+            offsets.append((position, position + len(text)))
+            position += len(text) + len(PAGE_SEPARATOR)
+            if head_chars < PREVIEW_CHARS * 20:
+                head.append(text)
+                head_chars += len(text)
+        if progress:
+            progress(len(offsets), total_pages)
+
+    try:
+        with open(tmp_path, "w", encoding="utf-8", newline="") as out:
+            if not parallel:
+                for start, end in ranges:
+                    write_pages(out, extract_page_range_timed(pdf_path, backend, start, end))
+            else:
+                # Sliding window: a bounded number of ranges in flight, results consumed in order
+                pool = _get_pool()
+                pending = iter(ranges)
+                window = deque(
+                    pool.submit(extract_page_range_timed, pdf_path, backend, start, end)
+                    for start, end in (r for _, r in zip(range(workers * 2), pending))
+                )
+                while window:
+                    result = window.popleft().result()
+                    next_range = next(pending, None)
+                    if next_range:
+                        window.append(pool.submit(extract_page_range_timed, pdf_path, backend, *next_range))
+                    write_pages(out, result)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, out_path)
+    with open(pages_path(out_path), "w", encoding="utf-8") as f:
+        json.dump({"backend": backend, "separator": PAGE_SEPARATOR, "pages": offsets}, f)
+
+    head_text = PAGE_SEPARATOR.join(head)
+    preview_lines = "\n".join(head_text.split("\n")[:PREVIEW_LINES])
+    preview_text = preview_lines if len(preview_lines) > 0 else head_text[:PREVIEW_CHARS]
+
+    return {
+        "num_pages": total_pages,
+        "text_length": position,
+        "preview_text": preview_text,
+    }
+
+
+def shutdown():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+from collections import defaultdict
+from backend import compact_store
+from backend.answer_cache import answer_cache
+from backend.database import SessionLocal
+from backend.embedding_providers import provider_model
+from backend.lexical_index import build_index, delete_index
+from backend.locks import process_lock
+from backend.metrics import CHUNKS_TOTAL, INGEST_STAGE_SECONDS, TOKENS_TOTAL
+from backend.models import FileInfo
+from backend.partitions import assign_partition, get_partition
+from backend.resources import get_embedding_engine
+
+logger = logging.getLogger("Indexing")
+
+# Chroma rejects very large single calls
+_WRITE_BATCH = 1000
+
+def _file_lock(file_id: str):
+    """One writer per file, across threads and uvicorn worker processes."""
+    return process_lock(f"file_{file_id}")
+
+
+def chunk_ids(file_id: str, texts):
+    """
+    Content-addressed ids `{file_id}_{hash16}_{n}`: an unchanged chunk keeps
+    its id (and its stored vector) across re-indexes; `n` counts repeats
+    of identical text within the file.
+    """
+    seen = defaultdict(int)
+    ids = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        ids.append(f"{file_id}_{digest}_{seen[digest]}")
+        seen[digest] += 1
+    return ids
+
+
+def get_active_generation(file_id: str) -> int:
+    with SessionLocal() as db:
+        record = db.query(FileInfo.active_generation).filter(FileInfo.file_id == file_id).first()
+    return (record[0] or 0) if record else 0
+
+
+def get_active_generations(file_ids):
+    with SessionLocal() as db:
+        rows = db.query(FileInfo.file_id, FileInfo.active_generation).filter(FileInfo.file_id.in_(list(file_ids))).all()
+    return {file_id: generation or 0 for file_id, generation in rows}
+
+
+def _batched(items, size=_WRITE_BATCH):
+    for start in range(0, len(items), size):
+        yield start, items[start:start + size]
+
+
+def index_chunks(file_id: str, chunks, progress=None, full: bool = False):
+    """
+    Store `chunks` as the file's next vector generation and switch queries over to it.
+
+    Chunks whose content-hash id is already stored are not embedded again:
+    their vector is reused and only their metadata (spans, page, generation
+    range) is updated. With `full=True` every chunk is re-embedded (e.g.
+    after an embedding model change).
+
+    Each chunk carries `gen_min`/`gen_max`; queries only see chunks whose range
+    contains FileInfo.active_generation. New chunks are written outside the
+    active range, the active generation is flipped in one DB commit, and
+    only then are removed chunks deleted, so a query never mixes old and new.
+
+    With VECTOR_STORE=compact the generation is written to the compact
+    store instead of Chroma (see compact_store.py); a file moves between
+    the two stores on its next re-index.
+    """
+    with _file_lock(file_id):
+        current = get_active_generation(file_id)
+        generation = current + 1
+        # Where the active generation lives, and where the new one goes
+        previous_compact = compact_store.load(file_id, current)
+        to_compact = compact_store.VECTOR_STORE == "compact"
+        # The file's partition (see partitions.py). Only a Chroma write assigns a new one per VECTOR_LAYOUT;
+        # the compact path just reads chunks the file may already have in Chroma, without creating a collection
+        collection = (get_partition(file_id) if to_compact else assign_partition(file_id)).collection
+
+        texts = [chunk.text for chunk in chunks]
+        ids = chunk_ids(file_id, texts)
+        if previous_compact is not None:
+            stored = previous_compact.get()
+        else:
+            stored = collection.get(where={"file_id": file_id}, include=["metadatas"])
+        stored_meta = dict(zip(stored["ids"], stored["metadatas"] or [{}] * len(stored["ids"])))
+
+        metadatas = []
+        for i, (chunk_id, chunk) in enumerate(zip(ids, chunks)):
+            previous = stored_meta.get(chunk_id) or {}
+            # Visible chunks keep their gen_min and stay visible until the flip; a leftover of an
+            # interrupted re-index (gen_max below the active generation) stays hidden until then
+            visible = previous.get("gen_max", -1) >= current
+            metadata = {
+                "file_id": file_id,
+                "chunk_id": i,
+                "char_start": chunk.start,
+                "char_end": chunk.end,
+                "tokens": chunk.tokens,
+                "gen_min": previous.get("gen_min", generation) if visible else generation,
+                "gen_max": generation,
+            }
+            if chunk.page is not None:
+                metadata["page"] = chunk.page
+            metadatas.append(metadata)
+
+        new_ids = set(ids)
+        to_embed = [i for i, chunk_id in enumerate(ids) if full or chunk_id not in stored_meta]
+        to_embed_set = set(to_embed)
+        unchanged = [i for i in range(len(ids)) if i not in to_embed_set]
+        removed = [chunk_id for chunk_id in stored_meta if chunk_id not in new_ids]
+        logger.info(
+            "🧮 Re-index file_id=%s generation=%s: embed=%d, unchanged=%d, removed=%d",
+            file_id, generation, len(to_embed), len(unchanged), len(removed),
+        )
+
+        # 1️⃣ Embed only new / changed chunks
+        on_batch = (lambda done: progress(len(unchanged) + done, len(ids))) if progress else None
+        if progress:
+            progress(len(unchanged), len(ids))
+        embeddings = get_embedding_engine().embed_documents([texts[i] for i in to_embed], on_batch=on_batch)
+
+        # Unchanged chunks keep their vectors; they only have to be read when switching stores
+        reused = {}
+        if unchanged and (to_compact or previous_compact is not None):
+            unchanged_ids = [ids[i] for i in unchanged]
+            if previous_compact is not None:
+                reused = previous_compact.vectors(unchanged_ids)
+            else:
+                for _, batch in _batched(unchanged_ids):
+                    got = collection.get(ids=batch, include=["embeddings"])
+                    reused.update(zip(got["ids"], got["embeddings"]))
+
+        # 2️⃣ Write them outside the active generation (invisible until the flip)
+        if to_compact:
+            vectors = dict(zip((ids[i] for i in to_embed), embeddings))
+            vectors.update(reused)
+            with INGEST_STAGE_SECONDS.time(stage="compact_write"):
+                compact_store.write(file_id, generation, ids, texts, metadatas, [vectors[c] for c in ids])
+        else:
+            # Chunks coming from the compact store are new to Chroma: written with their stored vector
+            upserts = [(i, vector) for i, vector in zip(to_embed, embeddings)]
+            if reused:
+                upserts += [(i, reused[ids[i]]) for i in unchanged]
+                unchanged = []
+            with INGEST_STAGE_SECONDS.time(stage="chroma_upsert"):
+                for _, batch in _batched(upserts):
+                    collection.upsert(
+                        ids=[ids[i] for i, _ in batch],
+                        embeddings=[vector for _, vector in batch],
+                        documents=[texts[i] for i, _ in batch],
+                        metadatas=[metadatas[i] for i, _ in batch],
+                    )
+                # Unchanged chunks: extend their range to the new generation, no embedding call
+                for _, batch in _batched(unchanged):
+                    collection.update(ids=[ids[i] for i in batch], metadatas=[metadatas[i] for i in batch])
+
+                # Leftovers of an interrupted re-index must not surface after the flip
+                if previous_compact is None:
+                    for _, batch in _batched(removed):
+                        hide = [c for c in batch if (stored_meta[c] or {}).get("gen_max", 0) >= generation]
+                        if hide:
+                            collection.update(ids=hide, metadatas=[{**stored_meta[c], "gen_max": current} for c in hide])
+
+        # 3️⃣ BM25 index for the new generation, built before it becomes visible
+        with INGEST_STAGE_SECONDS.time(stage="lexical_index"):
+            build_index(file_id, ids, texts, generation=generation)
+
+        # 4️⃣ Atomic switch-over: one commit
+        with SessionLocal() as db:
+            record = db.query(FileInfo).filter(FileInfo.file_id == file_id).first()
+            if record:
+                record.active_generation = generation
+                record.embedding_status = True
+                record.embedding_model = provider_model()
+                db.commit()
+
+        # Answers computed against the old vectors are stale now
+        if answer_cache:
+            answer_cache.invalidate_file(file_id)
+
+        # 5️⃣ Clean up what no query can see any more
+        if previous_compact is not None:
+            compact_store.delete(file_id, current)
+        else:
+            for _, batch in _batched(list(stored_meta) if to_compact else removed):
+                collection.delete(ids=batch)
+        delete_index(file_id, current)
+
+    CHUNKS_TOTAL.inc(len(to_embed))
+    TOKENS_TOTAL.inc(sum(chunks[i].tokens for i in to_embed), kind="chunk")
+    logger.info("🔁 file_id=%s now serving generation %s", file_id, generation)
+
+    return {
+        "generation": generation,
+        "total_chunks": len(ids),
+        "embedded_chunks": len(to_embed),
+        "unchanged_chunks": len(ids) - len(to_embed),
+        "removed_chunks": len(removed),
+    }
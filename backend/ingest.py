@@ -0,0 +1,346 @@
+"""
+Bulk ingestion of a directory (or .zip archive) of PDFs:
+
+    python -m backend.ingest /data/contracts --workers 4 --embed-workers 2
+
+Files flow through two worker stages connected by bounded queues:
+upload + extract (CPU / disk) and chunk + embed (embedding API), so a
+slow stage makes the one before it wait instead of piling up extracted
+text. Re-running the same source is cheap: files are deduplicated by
+content hash and files whose FileInfo already has `embedding_status`
+are skipped; files whose text was extracted but not embedded go
+straight to embedding.
+"""
+import argparse
+import contextvars
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from dotenv import load_dotenv
+from backend.metrics import log_sampled, new_trace_id, trace_id
+
+load_dotenv()
+
+logger = logging.getLogger("BulkIngest")
+
+# Upload + extract workers, chunk + embed workers, and the queue bound between stages
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))
+# POST /ingest/ only reads sources below this directory
+INGEST_ROOT = os.getenv("INGEST_ROOT", "ingest_inbox")
+INGEST_REPORT_DIR = os.getenv("INGEST_REPORT_DIR", "ingest_reports")
+EXTRACT_DIR = os.getenv("EXTRACT_DIR")
+
+_STOP = object()
+# Seconds between two progress reports of a running ingest
+_REPORT_INTERVAL = 1.0
+
+_runs = {}
+_runs_lock = threading.Lock()
+
+
+def _now():
+    return datetime.utcnow().isoformat()
+
+
+def _error_detail(e: Exception) -> str:
+    return str(getattr(e, "detail", None) or e)
+
+
+def iter_sources(source: str, workdir: str):
+    """
+    Yield `(name, path)` for every PDF in a directory (recursively, sorted)
+    or a .zip archive. Archive members are copied to `workdir` one at a
+    time as they are consumed, so a bounded consumer bounds disk usage.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, source), path
+        return
+
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not member.filename.lower().endswith(".pdf"):
+                    continue
+                # Never use the member name as a path: archives may contain "../"
+                path = os.path.join(workdir, f"{uuid.uuid4().hex}.pdf")
+                with archive.open(member) as src, open(path, "wb") as out:
+                    shutil.copyfileobj(src, out, 1024 * 1024)
+                yield member.filename, path
+        return
+
+    raise ValueError(f"{source} is neither a directory nor a .zip archive")
+
+
+class IngestRun:
+    """Counters, failures and throughput of one bulk ingestion."""
+
+    def __init__(self, source: str, workers: int, embed_workers: int):
+        self.run_id = str(uuid.uuid4())
+        self.source = source
+        self.workers = workers
+        self.embed_workers = embed_workers
+        self.status = "queued"
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self.report_path = None
+        self.counts = {"seen": 0, "stored": 0, "skipped": 0, "extracted": 0, "embedded": 0, "failed": 0}
+        self.pages = 0
+        self.chunks = 0
+        self.failures = []
+        self._in_flight = set()
+        self._started = None
+        self._elapsed = None
+        self._lock = threading.Lock()
+
+    def add(self, key: str, pages: int = 0, chunks: int = 0):
+        with self._lock:
+            self.counts[key] += 1
+            self.pages += pages
+            self.chunks += chunks
+
+    def claim(self, file_id: str) -> bool:
+        """False when another worker of this run already handles `file_id` (duplicate content)."""
+        with self._lock:
+            if file_id in self._in_flight:
+                return False
+            self._in_flight.add(file_id)
+            return True
+
+    def fail(self, name: str, file_id, stage: str, error: str):
+        logger.warning("⚠️ Ingest failed at %s: %s: %s", stage, name, error)
+        with self._lock:
+            self.counts["failed"] += 1
+            self.failures.append({"source": name, "file_id": file_id, "stage": stage, "error": error})
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = self._elapsed
+            if elapsed is None:
+                elapsed = time.perf_counter() - self._started if self._started else 0.0
+            per_second = (lambda n: round(n / elapsed, 2) if elapsed else 0.0)
+            return {
+                "run_id": self.run_id,
+                "source": self.source,
+                "status": self.status,
+                "error": self.error,
+                "workers": self.workers,
+                "embed_workers": self.embed_workers,
+                "files": dict(self.counts),
+                "pages": self.pages,
+                "chunks": self.chunks,
+                "elapsed_seconds": round(elapsed, 2),
+                "files_per_sec": per_second(self.counts["embedded"] + self.counts["skipped"]),
+                "pages_per_sec": per_second(self.pages),
+                "chunks_per_sec": per_second(self.chunks),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "report_path": self.report_path,
+                "failures": list(self.failures),
+            }
+
+
+def _extract_worker(run: IngestRun, files: queue.Queue, extracted: queue.Queue):
+    # Imported here: the routers import the database / resources at import time
+    from backend.extraction import load_page_offsets
+    from backend.routers.extract import extract_text
+    from backend.routers.upload import store_pdf
+
+    while True:
+        item = files.get()
+        if item is _STOP:
+            return
+        name, path = item
+        file_id, stage = None, "upload"
+        try:
+            stored = store_pdf(path, os.path.basename(name))
+            file_id = stored["file_id"]
+            run.add("stored")
+
+            # 1️⃣ Already embedded (earlier run) or a duplicate within this run: nothing to do
+            if stored.get("embedding_status") or not run.claim(file_id):
+                run.add("skipped", pages=stored.get("num_pages") or 0)
+                continue
+
+            # 2️⃣ Text already extracted by an interrupted run: go straight to embedding
+            stage = "extract"
+            text_path = os.path.join(EXTRACT_DIR, f"{file_id}.txt")
+            if os.path.exists(text_path):
+                offsets = load_page_offsets(text_path)
+                pages = len(offsets) if offsets else stored.get("num_pages") or 0
+            else:
+                pages = extract_text(file_id)["num_pages"]
+            run.add("extracted", pages=pages)
+
+            # Blocks while the embed stage is behind (backpressure)
+            extracted.put((name, file_id))
+        except Exception as e:
+            run.fail(name, file_id, stage, _error_detail(e))
+
+
+def _embed_worker(run: IngestRun, extracted: queue.Queue):
+    from backend.routers.embed import embed_file
+
+    while True:
+        item = extracted.get()
+        if item is _STOP:
+            return
+        name, file_id = item
+        try:
+            result = embed_file(file_id)
+            run.add("embedded", chunks=result["total_chunks"])
+        except Exception as e:
+            run.fail(name, file_id, "embed", _error_detail(e))
+
+
+def _write_report(run: IngestRun, report_path: str = None):
+    report_path = report_path or os.path.join(INGEST_REPORT_DIR, f"{run.run_id}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    run.report_path = report_path
+    # Replaced atomically: other worker processes serve it from GET /ingest/{run_id} while the run goes on
+    tmp_path = f"{report_path}.{threading.get_ident()}.part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(run.snapshot(), f, indent=2)
+    os.replace(tmp_path, report_path)
+    return report_path
+
+
+def _report_progress(run: IngestRun, report_path: str, done: threading.Event):
+    while not done.wait(_REPORT_INTERVAL):
+        _write_report(run, report_path)
+
+
+def run_ingest(run: IngestRun, report_path: str = None):
+    """Run `run` to completion in the calling thread and write its report."""
+    if trace_id.get() == "-":
+        trace_id.set(new_trace_id())
+    log_sampled.set(True)
+
+    files = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    extracted = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+    extract_threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(_extract_worker, run, files, extracted),
+            name=f"ingest-extract-{i}", daemon=True,
+        )
+        for i in range(run.workers)
+    ]
+    embed_threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run, args=(_embed_worker, run, extracted),
+            name=f"ingest-embed-{i}", daemon=True,
+        )
+        for i in range(run.embed_workers)
+    ]
+
+    run.status = "running"
+    run.started_at = _now()
+    run._started = time.perf_counter()
+    logger.info("🚚 Bulk ingest started: run_id=%s, source=%s", run.run_id, run.source)
+    report_path = _write_report(run, report_path)
+    done = threading.Event()
+    reporter = threading.Thread(target=_report_progress, args=(run, report_path, done), name="ingest-report", daemon=True)
+    reporter.start()
+
+    workdir = tempfile.mkdtemp(prefix="chatz_ingest_")
+    try:
+        for thread in extract_threads + embed_threads:
+            thread.start()
+        try:
+            for name, path in iter_sources(run.source, workdir):
+                run.add("seen")
+                # Blocks while the extract stage is behind (backpressure)
+                files.put((name, path))
+        except Exception as e:
+            run.error = _error_detail(e)
+            logger.exception("❌ Bulk ingest could not read %s", run.source)
+        finally:
+            for _ in extract_threads:
+                files.put(_STOP)
+            for thread in extract_threads:
+                thread.join()
+            for _ in embed_threads:
+                extracted.put(_STOP)
+            for thread in embed_threads:
+                thread.join()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    done.set()
+    reporter.join()
+    with run._lock:
+        run._elapsed = time.perf_counter() - run._started
+    run.status = "failed" if run.error else "done"
+    run.finished_at = _now()
+    _write_report(run, report_path)
+
+    summary = run.snapshot()
+    logger.info(
+        "🏁 Bulk ingest %s: run_id=%s, files=%s, %s pages/s, %s chunks/s",
+        run.status, run.run_id, summary["files"], summary["pages_per_sec"], summary["chunks_per_sec"],
+    )
+    return summary
+
+
+def start_ingest(source: str, workers: int = INGEST_WORKERS, embed_workers: int = INGEST_EMBED_WORKERS):
+    """Start a bulk ingestion in a background thread, returns its run id."""
+    run = IngestRun(source, workers, embed_workers)
+    with _runs_lock:
+        _runs[run.run_id] = run
+    # The run's logs carry the trace id of the request that started it
+    threading.Thread(target=contextvars.copy_context().run, args=(run_ingest, run), name=f"ingest-{run.run_id[:8]}", daemon=True).start()
+    return run.run_id
+
+
+def get_run(run_id: str):
+    with _runs_lock:
+        run = _runs.get(run_id)
+    if run is not None:
+        return run.snapshot()
+
+    # Started by another worker process, or finished before a restart: serve the report from disk
+    report_path = os.path.join(INGEST_REPORT_DIR, f"{os.path.basename(run_id)}.json")
+    if os.path.exists(report_path):
+        with open(report_path, encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory or .zip archive of PDFs.")
+    parser.add_argument("source", help="directory (searched recursively) or .zip archive")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="upload + extract workers")
+    parser.add_argument("--embed-workers", type=int, default=INGEST_EMBED_WORKERS, help="chunk + embed workers")
+    parser.add_argument("--report", help=f"failure report path (default {INGEST_REPORT_DIR}/<run_id>.json)")
+    args = parser.parse_args()
+
+    from backend.config import setup_logging
+    from backend.database import engine
+    from backend.migrations import run_migrations
+
+    setup_logging()
+    run_migrations(engine)
+
+    summary = run_ingest(IngestRun(args.source, args.workers, args.embed_workers), args.report)
+    print(json.dumps({key: value for key, value in summary.items() if key != "failures"}, indent=2))
+    print(f"{len(summary['failures'])} failure(s), report: {summary['report_path']}")
+    return 1 if summary["status"] == "failed" else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
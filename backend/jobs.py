@@ -0,0 +1,278 @@
+import contextvars
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from dotenv import load_dotenv
+from backend.database import SessionLocal
+from backend.locks import process_lock
+from backend.models import Job
+from backend.metrics import log_sampled, new_trace_id, trace_id
+
+load_dotenv()
+
+logger = logging.getLogger("JobQueue")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+EXTRACT_DIR = os.getenv("EXTRACT_DIR")
+
+# Minimum seconds between two progress writes of the same job
+PROGRESS_INTERVAL = 0.5
+
+JOB_KINDS = ("extract", "embed", "ingest", "retention", "compact")
+# Kinds that work on the whole store: their file_id is "*"
+STORE_JOB_KINDS = ("retention", "compact")
+
+# Jobs are claimed by one process; uvicorn workers share the jobs table
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    return _pool
+
+
+def _now():
+    return datetime.utcnow()
+
+
+def job_to_dict(job: Job):
+    return {
+        "job_id": job.job_id,
+        "file_id": job.file_id,
+        "kind": job.kind,
+        "status": job.status,
+        "stage": job.stage,
+        "pages_done": job.pages_done,
+        "pages_total": job.pages_total,
+        "chunks_embedded": job.chunks_embedded,
+        "chunks_total": job.chunks_total,
+        "params": json.loads(job.params) if job.params else None,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+
+
+def _update(job_id: str, **fields):
+    with SessionLocal() as db:
+        fields["updated_at"] = _now()
+        db.query(Job).filter(Job.job_id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+
+
+class _Progress:
+    """Throttled progress writer handed to the extract / embed stages."""
+
+    def __init__(self, job_id: str, done_field: str, total_field: str, stage: str = None):
+        self.job_id = job_id
+        self.done_field = done_field
+        self.total_field = total_field
+        self.stage = stage
+        self._last = 0.0
+
+    def __call__(self, done: int, total: int):
+        now = time.monotonic()
+        if done < total and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        fields = {self.done_field: done, self.total_field: total}
+        if self.stage:
+            fields["stage"] = self.stage
+        _update(self.job_id, **fields)
+
+
+def _claim(job_id: str, status: str, owner: str = None) -> bool:
+    """
+    Atomically take `job_id` over if it is still in `status` (and, for a
+    running job, still owned by `owner`): when several workers try to run
+    the same job, exactly one UPDATE matches.
+    """
+    with SessionLocal() as db:
+        query = db.query(Job).filter(Job.job_id == job_id, Job.status == status)
+        if status == "running":
+            query = query.filter(Job.worker_id.is_(None) if owner is None else Job.worker_id == owner)
+        claimed = query.update({"status": "running", "worker_id": WORKER_ID, "updated_at": _now()},
+                               synchronize_session=False)
+        db.commit()
+    return claimed == 1
+
+
+def _owner_alive(worker_id: str) -> bool:
+    """Whether the process that claimed a job still runs (only checkable on this host)."""
+    host, _, pid = (worker_id or "").rpartition(":")
+    # (os.kill on Windows terminates the process: treat the owner as gone, i.e. single-worker behaviour)
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def submit_job(file_id: str, kind: str = "ingest", params: dict = None):
+    """
+    Queue a job and return it. While a job of the same kind (and params)
+    for the same file is still queued or running, that job is returned
+    instead of queuing a duplicate.
+    """
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if kind in STORE_JOB_KINDS:
+        file_id = "*"
+    params_json = json.dumps(params) if params else None
+
+    # Serializes check + insert across workers, so two identical submits cannot both queue
+    with process_lock(f"submit_{kind}_{file_id}"):
+        with SessionLocal() as db:
+            existing = db.query(Job).filter(
+                Job.file_id == file_id,
+                Job.kind == kind,
+                Job.status.in_(["queued", "running"]),
+                Job.params.is_(None) if params_json is None else Job.params == params_json,
+            ).order_by(Job.created_at).first()
+            if existing is not None:
+                logger.info("♻️ Job already %s: job_id=%s, file_id=%s, kind=%s",
+                            existing.status, existing.job_id, file_id, kind)
+                return job_to_dict(existing)
+
+            job = Job(
+                job_id=str(uuid.uuid4()),
+                file_id=file_id,
+                kind=kind,
+                status="queued",
+                stage="queued",
+                params=params_json,
+                created_at=_now(),
+                updated_at=_now(),
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            payload = job_to_dict(job)
+
+    logger.info("🗂️ Job queued: job_id=%s, file_id=%s, kind=%s", job.job_id, file_id, kind)
+    # The job's logs carry the trace id of the request that submitted it
+    _get_pool().submit(contextvars.copy_context().run, _run_job, job.job_id, "queued")
+    return payload
+
+
+def get_job(job_id: str):
+    with SessionLocal() as db:
+        job = db.query(Job).filter(Job.job_id == job_id).first()
+        return job_to_dict(job) if job else None
+
+
+def _run_file_stages(job_id: str, file_id: str, kind: str, stage: str):
+    """Extract and / or embed one file; the caller holds the file's lock."""
+    # Imported here: the routers import this module for their job endpoints
+    from backend.routers.extract import extract_text
+    from backend.routers.embed import embed_file
+
+    result = None
+    text_path = os.path.join(EXTRACT_DIR, f"{file_id}.txt")
+
+    # A resumed ingest job whose text is already on disk goes straight to embedding
+    resume_embedding = stage in ("chunking", "embedding") and os.path.exists(text_path)
+
+    if kind in ("extract", "ingest") and not resume_embedding:
+        _update(job_id, stage="extracting")
+        result = extract_text(file_id, progress=_Progress(job_id, "pages_done", "pages_total"))
+
+    if kind in ("embed", "ingest"):
+        _update(job_id, stage="chunking")
+        result = embed_file(
+            file_id,
+            progress=_Progress(job_id, "chunks_embedded", "chunks_total", stage="embedding"),
+        )
+        _update(job_id, chunks_embedded=result["total_chunks"], chunks_total=result["total_chunks"])
+    return result
+
+
+def _run_job(job_id: str, status: str, owner: str = None):
+    # Imported here, like the stages in _run_file_stages
+    from backend import retention
+    from backend.indexing import _file_lock
+
+    if trace_id.get() == "-":
+        # Resumed after a restart: no request to inherit a trace id from
+        trace_id.set(new_trace_id())
+    # Jobs always log, even when the request that submitted them was not sampled
+    log_sampled.set(True)
+
+    if not _claim(job_id, status, owner):
+        # Finished, or taken by another worker in the meantime
+        return
+
+    with SessionLocal() as db:
+        job = db.query(Job).filter(Job.job_id == job_id).first()
+        file_id, kind, stage = job.file_id, job.kind, job.stage
+        params = json.loads(job.params) if job.params else {}
+
+    logger.info("▶️ Job started: job_id=%s, kind=%s, stage=%s", job_id, kind, stage)
+
+    try:
+        if kind in ("retention", "compact"):
+            # One retention / compaction run at a time; the scheduler skips its turn meanwhile
+            with process_lock("retention"):
+                if kind == "retention":
+                    _update(job_id, stage="deleting")
+                    result = retention.apply_retention(**params)
+                else:
+                    _update(job_id, stage="compacting")
+                    result = retention.compact()
+        else:
+            # One extract / embed at a time per file, across workers: an extract must not
+            # rewrite (or an embed delete) the text another job of the same file is reading
+            with _file_lock(file_id):
+                result = _run_file_stages(job_id, file_id, kind, stage)
+
+        _update(job_id, status="done", stage="done", result=json.dumps(result, default=str))
+        logger.info("✅ Job finished: job_id=%s", job_id)
+
+    except Exception as e:
+        detail = getattr(e, "detail", None) or str(e)
+        logger.exception("❌ Job failed: job_id=%s", job_id)
+        _update(job_id, status="failed", stage="failed", error=str(detail))
+
+
+def resume_jobs():
+    """
+    Re-queue jobs that were queued, or running in a process that is gone,
+    when the server (or one of its workers) stopped. Every worker calls
+    this on startup; `_claim` hands each job to one of them.
+    """
+    with SessionLocal() as db:
+        jobs = db.query(Job).filter(Job.status.in_(["queued", "running"])).order_by(Job.created_at).all()
+        pending = [
+            (job.job_id, job.status, job.worker_id)
+            for job in jobs
+            if job.status == "queued" or not _owner_alive(job.worker_id)
+        ]
+
+    for job_id, status, owner in pending:
+        _get_pool().submit(_run_job, job_id, status, owner)
+
+    if pending:
+        logger.info("🔁 Resumed %d unfinished job(s)", len(pending))
+
+
+def shutdown():
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,151 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("LexicalIndex")
+
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "lexical_index")
+os.makedirs(LEXICAL_INDEX_DIR, exist_ok=True)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Indexes kept in memory between queries
+_CACHE_SIZE = 64
+
+# Compound tokens ("PN-1042", "4.2.1", "a/b") are indexed whole and by their parts
+_INDEX_FILE = re.compile(r"^(?P<file_id>.+?)(?:\.g(?P<generation>\d+))?\.json$")
+_COMPOUND = re.compile(r"\w+(?:[-./]\w+)*")
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str):
+    tokens = []
+    for match in _COMPOUND.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        parts = _WORD.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index over one file's chunks, scored with Okapi BM25."""
+
+    def __init__(self, ids, doc_lens, postings):
+        self.ids = ids
+        self.doc_lens = doc_lens
+        self.postings = postings  # term -> [[doc_index, term_frequency], ...]
+        self.avg_len = (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0
+
+    @classmethod
+    def build(cls, ids, texts):
+        postings = {}
+        doc_lens = []
+        for doc_index, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append([doc_index, tf])
+        return cls(list(ids), doc_lens, postings)
+
+    def search(self, query: str, k: int = 10):
+        """[(chunk_id, score), ...] best first."""
+        n_docs = len(self.ids)
+        if not n_docs:
+            return []
+
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_index, tf in posting:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lens[doc_index] / (self.avg_len or 1))
+                scores[doc_index] = scores.get(doc_index, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.ids[doc_index], score) for doc_index, score in best]
+
+    def to_dict(self):
+        return {"ids": self.ids, "doc_lens": self.doc_lens, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["ids"], data["doc_lens"], data["postings"])
+
+
+def index_path(file_id: str, generation: int = 0) -> str:
+    """One index per vector generation, so a re-index can be built before it is switched on."""
+    if generation:
+        return os.path.join(LEXICAL_INDEX_DIR, f"{file_id}.g{generation}.json")
+    return os.path.join(LEXICAL_INDEX_DIR, f"{file_id}.json")
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def build_index(file_id: str, ids, texts, generation: int = 0) -> BM25Index:
+    index = BM25Index.build(ids, texts)
+    path = index_path(file_id, generation)
+    tmp_path = path + ".part"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_dict(), f)
+    os.replace(tmp_path, path)
+
+    with _cache_lock:
+        _cache.pop(path, None)
+    logger.info("🔤 Lexical index built: file_id=%s, chunks=%d, terms=%d", file_id, len(index.ids), len(index.postings))
+    return index
+
+
+def load_index(file_id: str, generation: int = 0):
+    """The file's BM25 index, or None if it was embedded before lexical indexing existed."""
+    path = index_path(file_id, generation)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(path)
+            return cached[1]
+
+    with open(path, "r", encoding="utf-8") as f:
+        index = BM25Index.from_dict(json.load(f))
+
+    with _cache_lock:
+        _cache[path] = (mtime, index)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+
+def delete_index(file_id: str, generation: int = 0):
+    path = index_path(file_id, generation)
+    with _cache_lock:
+        _cache.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def stored_indexes():
+    """(file_id, generation) of every index file on disk."""
+    with os.scandir(LEXICAL_INDEX_DIR) as entries:
+        names = [entry.name for entry in entries]
+    for name in names:
+        match = _INDEX_FILE.match(name)
+        if match:
+            yield match["file_id"], int(match["generation"] or 0)
@@ -0,0 +1,71 @@
+"""
+Named locks that hold across uvicorn worker processes, not only threads:
+a thread lock per name plus an exclusive flock on LOCK_DIR/{name}.lock.
+Where fcntl is unavailable (Windows) only threads of one process are
+serialized, which is enough for the single-worker setup. A thread that
+already holds a lock can enter it again (a job holding its file's lock
+calls index_chunks, which takes the same lock).
+
+With `blocking=False` a lock held elsewhere is not waited for: the
+context manager yields False instead of True and the caller skips its work.
+"""
+import os
+import re
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+load_dotenv()
+
+LOCK_DIR = os.getenv("LOCK_DIR", "locks")
+
+_thread_locks = defaultdict(threading.Lock)
+_thread_locks_lock = threading.Lock()
+# Names the current thread holds
+_held = threading.local()
+
+
+@contextmanager
+def process_lock(name: str, blocking: bool = True):
+    name = re.sub(r"[^A-Za-z0-9_.-]", "-", name)
+    held = _held.__dict__.setdefault("names", set())
+    if name in held:
+        yield True
+        return
+    with _thread_locks_lock:
+        lock = _thread_locks[name]
+
+    # The thread lock first: threads of this process queue up without holding a file descriptor
+    if not lock.acquire(blocking):
+        yield False
+        return
+    try:
+        if fcntl is None:
+            held.add(name)
+            try:
+                yield True
+            finally:
+                held.discard(name)
+            return
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        with open(os.path.join(LOCK_DIR, f"{name}.lock"), "a") as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Held by another process
+                yield False
+                return
+            held.add(name)
+            try:
+                yield True
+            finally:
+                held.discard(name)
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    finally:
+        lock.release()
@@ -1,27 +1,79 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
-from backend.routers import upload, extract ,embed ,query
+from fastapi.responses import PlainTextResponse
+from backend.routers import upload, extract ,embed ,query, chat, jobs as jobs_router, ingest as ingest_router
+from backend import jobs, extraction, resources, executors, retention
 from fastapi.middleware.cors import CORSMiddleware
-from backend.config import setup_logging
+from backend.config import LOG_SAMPLE_RATE, setup_logging
 import logging
-from backend.database import engine, Base
+import random
+import time
+from backend.database import engine
+from backend.locks import process_lock
+from backend.migrations import run_migrations
+from backend import metrics
 
 setup_logging()
 logger = logging.getLogger("MainApp")
 
 
-Base.metadata.create_all(bind=engine)
+# Every uvicorn worker imports this module: one migrates, the others wait and find nothing to do
+with process_lock("migrations"):
+    run_migrations(engine)
 
-app = FastAPI(title="ChatZ")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared vector store / embedder / chat model, built lazily unless warm-up is on
+    if resources.RESOURCES_WARMUP:
+        resources.warm_up()
+    # Pick up extract / embed jobs interrupted by a restart
+    jobs.resume_jobs()
+    # Periodic retention + compaction when RETENTION_INTERVAL_HOURS is set
+    retention.start_scheduler()
+    yield
+    retention.shutdown()
+    jobs.shutdown()
+    executors.shutdown()
+    extraction.shutdown()
+    resources.shutdown()
+
+
+app = FastAPI(title="ChatZ", lifespan=lifespan)
+
+# Innermost: oversized uploads are refused before their body is read, and still logged + CORS-wrapped
+app.add_middleware(upload.UploadSizeLimit)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"➡️ Incoming Request: {request.method} {request.url}")
+    # Reuse the caller's trace id when given, so logs line up across services
+    trace_id = request.headers.get("X-Trace-Id") or metrics.new_trace_id()
+    token = metrics.trace_id.set(trace_id)
+    # Unsampled requests keep their warnings / errors and metrics, not their INFO lines
+    sampled_token = metrics.log_sampled.set(LOG_SAMPLE_RATE >= 1.0 or random.random() < LOG_SAMPLE_RATE)
+    started = time.perf_counter()
+    logger.info("➡️ Incoming Request: %s %s", request.method, request.url)
+
+    try:
+        response = await call_next(request)
+
+        elapsed = time.perf_counter() - started
+        # Route template (/embed/{file_id}) rather than the raw path keeps label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=response.status_code)
+        response.headers["X-Trace-Id"] = trace_id
+
+        logger.info("⬅️ Response Status: %s in %.0f ms", response.status_code, elapsed * 1000)
 
-    response = await call_next(request)
+        return response
+    finally:
+        metrics.log_sampled.reset(sampled_token)
+        metrics.trace_id.reset(token)
 
-    logger.info(f"⬅️ Response Status: {response.status_code}")
 
-    return response
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 app.add_middleware(
@@ -35,4 +87,7 @@ app.add_middleware(
 app.include_router(upload.router)
 app.include_router(extract.router)
 app.include_router(embed.router)
-app.include_router(query.router)
\ No newline at end of file
+app.include_router(query.router)
+app.include_router(chat.router)
+app.include_router(jobs_router.router)
+app.include_router(ingest_router.router)
\ No newline at end of file
@@ -0,0 +1,183 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Trace id of the request (or job) being served, "-" outside of one
+trace_id = contextvars.ContextVar("trace_id", default="-")
+# False while serving a request left out of LOG_SAMPLE_RATE: its INFO/DEBUG logs are dropped
+log_sampled = contextvars.ContextVar("log_sampled", default=True)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds `%(trace_id)s` to every log record."""
+
+    def filter(self, record):
+        record.trace_id = trace_id.get()
+        return True
+
+
+class SampledFilter(logging.Filter):
+    """Drops INFO/DEBUG records of requests that were not sampled; warnings and errors always pass."""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or log_sampled.get()
+
+
+# Seconds: covers cached lookups (ms) up to slow LLM calls / batches
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _render_value(self, key, value):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last = +Inf), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block, also when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_value(self, key, value):
+        counts, total, count = value
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+            cumulative += bucket_count
+            le = bound if bound == "+Inf" else _format_value(bound)
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+        yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- Metrics exported at /metrics ---------------- #
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "chatz_http_request_duration_seconds",
+    "HTTP request latency until the response starts (streams: until headers are sent).",
+    ("method", "route", "status"),
+)
+QUERY_STAGE_SECONDS = Histogram(
+    "chatz_query_stage_seconds",
+    "Query pipeline stage latency: rewrite, embed_question, vector_search, lexical_search, fetch_documents, rerank, llm_first_token, llm.",
+    ("stage",),
+)
+INGEST_STAGE_SECONDS = Histogram(
+    "chatz_ingest_stage_seconds",
+    "Ingest pipeline stage latency: upload_write, page_count, extract_page, chunking, embed_batch, chroma_upsert, compact_write, lexical_index.",
+    ("stage",),
+)
+CHUNKS_TOTAL = Counter("chatz_chunks_embedded_total", "Chunks embedded and stored.")
+TOKENS_TOTAL = Counter(
+    "chatz_tokens_total",
+    "Estimated tokens processed: chunk (embedded), prompt and answer (LLM).",
+    ("kind",),
+)
+LOG_RECORDS_DROPPED_TOTAL = Counter(
+    "chatz_log_records_dropped_total",
+    "Log records dropped because the background log writer's queue was full.",
+)
+CACHE_REQUESTS_TOTAL = Counter(
+    "chatz_cache_requests_total",
+    "Cache lookups by cache (answer, embedding, chat_context) and result (hit, miss).",
+    ("cache", "result"),
+)
+FILES_DELETED_TOTAL = Counter(
+    "chatz_files_deleted_total",
+    "Files deleted with their PDF and vectors, by reason (api, retention).",
+    ("reason",),
+)
+RECLAIMED_TOTAL = Counter(
+    "chatz_compaction_reclaimed_total",
+    "What compaction removed: orphan_chunks, stale_chunks, collections, index_files, files, sqlite_pages.",
+    ("kind",),
+)
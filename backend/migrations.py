@@ -0,0 +1,98 @@
+import logging
+from datetime import datetime
+from sqlalchemy import DateTime, inspect, text
+from backend.database import Base
+from backend import models  # noqa: F401  (registers the tables on Base)
+
+logger = logging.getLogger("Migrations")
+
+
+def _rebuild_table(conn, table):
+    """Recreate `table` from the current model (SQLite cannot drop constraints in place)."""
+    inspector = inspect(conn)
+    old_columns = {c["name"] for c in inspector.get_columns(table.name)}
+    shared = [c.name for c in table.columns if c.name in old_columns]
+    column_list = ", ".join(f'"{name}"' for name in shared)
+
+    for index in inspector.get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+    conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{table.name}_old"'))
+    table.create(conn)
+    conn.execute(text(f'INSERT INTO "{table.name}" ({column_list}) SELECT {column_list} FROM "{table.name}_old"'))
+    conn.execute(text(f'DROP TABLE "{table.name}_old"'))
+    logger.info("🛠️ Rebuilt table %s", table.name)
+
+
+def _stale_unique_columns(inspector, table):
+    """Columns that are UNIQUE in the database but no longer in the model."""
+    stale = []
+    for constraint in inspector.get_unique_constraints(table.name):
+        columns = constraint["column_names"]
+        if len(columns) == 1 and not table.columns[columns[0]].unique:
+            stale.append(columns[0])
+    return stale
+
+
+def _retyped_columns(inspector, table, dialect):
+    """Columns whose type in the database differs from the model's."""
+    existing = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+    return [
+        column for column in table.columns
+        if column.name in existing and str(existing[column.name]) != column.type.compile(dialect=dialect)
+    ]
+
+
+def _convert_datetimes(conn, table, columns):
+    """
+    ISO-8601 strings written by `datetime.isoformat()` -> SQLAlchemy's SQLite
+    DateTime format ("YYYY-MM-DD HH:MM:SS.ffffff"). Missing dates become the
+    migration time, so every row has a place in the (uploaded_at, file_id)
+    order without pretending the file is decades old.
+    """
+    migrated_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")
+    for column in columns:
+        if not isinstance(column.type, DateTime):
+            continue
+        name = f'"{column.name}"'
+        for statement in (
+            f"UPDATE \"{table.name}\" SET {name} = REPLACE({name}, 'T', ' ') WHERE {name} LIKE '%T%'",
+            f"UPDATE \"{table.name}\" SET {name} = {name} || '.000000' WHERE length({name}) = 19",
+            f"UPDATE \"{table.name}\" SET {name} = '{migrated_at}' WHERE {name} IS NULL OR {name} = ''",
+        ):
+            conn.execute(text(statement))
+        logger.info("🛠️ Converted %s.%s to DATETIME", table.name, column.name)
+
+
+def run_migrations(engine):
+    """
+    Bring an existing database up to the current models: add missing
+    columns and indexes, drop UNIQUE constraints the models no longer
+    declare and convert columns whose type changed (SQLite).
+    `create_all` only creates missing tables.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            if engine.dialect.name == "sqlite":
+                retyped = _retyped_columns(inspector, table, engine.dialect)
+                if retyped or _stale_unique_columns(inspector, table):
+                    _rebuild_table(conn, table)
+                    _convert_datetimes(conn, table, retyped)
+                    inspector = inspect(conn)
+                    continue
+
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                logger.info("🛠️ Added column %s.%s", table.name, column.name)
+
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    logger.info("🛠️ Created index %s", index.name)
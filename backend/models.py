@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, String, Boolean, Integer
+from sqlalchemy import Column, String, Boolean, Integer, Float, LargeBinary, Text, DateTime, Index
 from sqlalchemy.orm import declarative_base
 from backend.database import Base
 
@@ -7,9 +7,73 @@ class FileInfo(Base):
     __tablename__ = "file_info"
 
     file_id = Column(String, primary_key=True)
-    file_name = Column(String, unique=True, nullable=True)
+    file_name = Column(String, index=True, nullable=True)
     num_pages = Column(Integer, nullable=True)
-    uploaded_at = Column(String, nullable=True)
+    uploaded_at = Column(DateTime, nullable=True)
     embedding_status = Column(Boolean, default=False)
-    
-    
+    # sha256 of the PDF bytes; identical uploads map to the same file_id
+    content_hash = Column(String, unique=True, index=True, nullable=True)
+    file_size = Column(Integer, nullable=True)
+    # Vector generation queries read; 0 = embedded before generations (chunks carry no gen_min/gen_max)
+    active_generation = Column(Integer, default=0, nullable=True)
+    # Embedding model of the stored vectors (embedding_providers.provider_model); NULL = Gemini
+    embedding_model = Column(String, nullable=True)
+    # Last query touching the file (retention.mark_used, coarse); NULL = never queried
+    last_used_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # GET /upload/list_files: newest first, (uploaded_at, file_id) is the page cursor
+        Index("ix_file_info_uploaded", "uploaded_at", "file_id"),
+        Index("ix_file_info_status_uploaded", "embedding_status", "uploaded_at", "file_id"),
+    )
+
+
+class VectorPartition(Base):
+    __tablename__ = "vector_partitions"
+
+    # Files without a row live in the default collection (embedded before partitioning)
+    file_id = Column(String, primary_key=True)
+    collection_name = Column(String, index=True, nullable=False)
+    shared = Column(Boolean, default=True)  # other files in the collection too: filter by file_id
+
+
+class EmbeddingCacheEntry(Base):
+    __tablename__ = "embedding_cache"
+
+    # sha256 of (model, kind, normalized text)
+    cache_key = Column(String, primary_key=True)
+    model = Column(String, nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    last_used_at = Column(Float, nullable=False, index=True)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    job_id = Column(String, primary_key=True)
+    file_id = Column(String, index=True, nullable=False)
+    kind = Column(String, nullable=False)                  # extract | embed | ingest | retention | compact
+    status = Column(String, index=True, default="queued")  # queued | running | done | failed
+    stage = Column(String, default="queued")               # queued | extracting | chunking | embedding | deleting | compacting | done | failed
+    pages_done = Column(Integer, default=0)
+    pages_total = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    chunks_total = Column(Integer, default=0)
+    result = Column(Text, nullable=True)                   # JSON payload of the finished stage
+    params = Column(Text, nullable=True)                   # JSON arguments (retention policy overrides)
+    error = Column(String, nullable=True)
+    # "{host}:{pid}" of the process running the job; a job of a dead process is resumed by another
+    worker_id = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+
+
+class ChatSessionRecord(Base):
+    __tablename__ = "chat_sessions"
+
+    # Used with CHAT_SESSION_STORE=sqlite, so every worker sees the same conversation
+    session_id = Column(String, primary_key=True)
+    file_id = Column(String, index=True, nullable=False)
+    state = Column(Text, nullable=False)                # JSON of sessions.ChatSession
+    updated_at = Column(Float, nullable=False, index=True)
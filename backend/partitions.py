@@ -0,0 +1,219 @@
+"""
+Vector storage layout: where a file's chunks live in Chroma.
+
+- single: every file in the default collection, queries filter by file_id
+- bucket: files hashed into VECTOR_BUCKETS collections, so each search
+          (and filter) only covers ~1/VECTOR_BUCKETS of the corpus
+- file:   one collection per file, searched without any filter; deleting a
+          file drops its collection
+
+The `vector_partitions` table maps file_id -> collection. Files without a
+row were embedded before partitioning and live in the default collection,
+so switching VECTOR_LAYOUT only affects newly embedded files until
+
+    python -m backend.partitions --layout bucket
+
+moves the existing ones.
+"""
+import argparse
+import logging
+import os
+import re
+import zlib
+from typing import NamedTuple
+from dotenv import load_dotenv
+from backend.database import SessionLocal
+from backend.models import FileInfo, VectorPartition
+from backend.resources import COLLECTION_NAME, drop_collection, get_collection
+
+load_dotenv()
+
+logger = logging.getLogger("Partitions")
+
+VECTOR_LAYOUT = os.getenv("VECTOR_LAYOUT", "single")  # single | bucket | file
+VECTOR_BUCKETS = int(os.getenv("VECTOR_BUCKETS", "64"))
+
+LAYOUTS = ("single", "bucket", "file")
+
+# Chroma writes are batched; very large single calls are rejected
+_COPY_BATCH = 1000
+
+
+class Partition(NamedTuple):
+    name: str
+    shared: bool  # holds other files too: searches must filter by file_id
+
+    @property
+    def collection(self):
+        return get_collection(self.name)
+
+
+DEFAULT_PARTITION = Partition(COLLECTION_NAME, True)
+
+# Names partition_for_layout builds; other providers' collections (pdf_collection_<provider>...) share the prefix
+FILE_COLLECTION_PREFIX = f"{COLLECTION_NAME}_f_"
+_BUCKET_NAME = re.compile(rf"{re.escape(COLLECTION_NAME)}_b\d{{3,}}")
+
+
+def is_partition_name(name: str) -> bool:
+    """True for the default collection, a bucket or a per-file collection of this provider."""
+    return name == COLLECTION_NAME or bool(_BUCKET_NAME.fullmatch(name)) or is_file_collection(name)
+
+
+def is_file_collection(name: str) -> bool:
+    return name.startswith(FILE_COLLECTION_PREFIX)
+
+
+def partition_for_layout(file_id: str, layout: str = VECTOR_LAYOUT) -> Partition:
+    if layout == "single":
+        return DEFAULT_PARTITION
+    if layout == "bucket":
+        return Partition(f"{COLLECTION_NAME}_b{zlib.crc32(file_id.encode('utf-8')) % VECTOR_BUCKETS:03d}", True)
+    if layout == "file":
+        # Chroma names allow [A-Za-z0-9._-] only
+        return Partition(f"{FILE_COLLECTION_PREFIX}{re.sub(r'[^A-Za-z0-9_-]', '-', file_id)}"[:512], False)
+    raise ValueError(f"Unknown VECTOR_LAYOUT {layout!r}, expected one of {', '.join(LAYOUTS)}")
+
+
+def get_partition(file_id: str) -> Partition:
+    with SessionLocal() as db:
+        row = db.get(VectorPartition, file_id)
+        return Partition(row.collection_name, bool(row.shared)) if row else DEFAULT_PARTITION
+
+
+def get_partitions(file_ids):
+    file_ids = list(file_ids)
+    with SessionLocal() as db:
+        rows = db.query(VectorPartition).filter(VectorPartition.file_id.in_(file_ids)).all()
+        found = {row.file_id: Partition(row.collection_name, bool(row.shared)) for row in rows}
+    return {file_id: found.get(file_id, DEFAULT_PARTITION) for file_id in file_ids}
+
+
+def _register(file_id: str, partition: Partition):
+    with SessionLocal() as db:
+        db.merge(VectorPartition(file_id=file_id, collection_name=partition.name, shared=partition.shared))
+        db.commit()
+
+
+def assign_partition(file_id: str) -> Partition:
+    """
+    Partition new chunks of `file_id` are written to: its registered one;
+    the default collection if it already holds chunks of the file (embedded
+    before partitioning, moved only by a migration); otherwise a new
+    partition per VECTOR_LAYOUT.
+    """
+    with SessionLocal() as db:
+        row = db.get(VectorPartition, file_id)
+        if row:
+            return Partition(row.collection_name, bool(row.shared))
+
+    legacy = get_collection().get(where={"file_id": file_id}, limit=1, include=[])
+    if legacy["ids"]:
+        return DEFAULT_PARTITION
+
+    partition = partition_for_layout(file_id)
+    _register(file_id, partition)
+    return partition
+
+
+def unregister(file_id: str):
+    with SessionLocal() as db:
+        db.query(VectorPartition).filter(VectorPartition.file_id == file_id).delete()
+        db.commit()
+
+
+def search_groups(file_ids=None):
+    """
+    Partitions to search for `file_ids` (None = every file) as
+    [(partition, file_ids to filter on or None)].
+    """
+    if file_ids is None:
+        with SessionLocal() as db:
+            rows = db.query(VectorPartition.collection_name, VectorPartition.shared).distinct().all()
+        partitions = {DEFAULT_PARTITION.name: DEFAULT_PARTITION}
+        for name, shared in rows:
+            partitions.setdefault(name, Partition(name, bool(shared)))
+        return [(partition, None) for partition in partitions.values()]
+
+    grouped = {}
+    for file_id, partition in get_partitions(file_ids).items():
+        grouped.setdefault(partition, []).append(file_id)
+    return [(partition, ids if partition.shared else None) for partition, ids in grouped.items()]
+
+
+def migrate(layout: str = VECTOR_LAYOUT):
+    """
+    Move every file's chunks into the partition `layout` assigns it:
+    copy, switch the registry row (queries follow from then on), then
+    delete the source. Safe to re-run after an interruption.
+    """
+    # Imported here: indexing imports this module
+    from backend import compact_store
+    from backend.indexing import _file_lock, get_active_generation
+
+    partition_for_layout("", layout)  # validates the name
+    with SessionLocal() as db:
+        file_ids = [row[0] for row in db.query(FileInfo.file_id).order_by(FileInfo.file_id).all()]
+
+    moved = chunks = skipped = 0
+    for file_id in file_ids:
+        target = partition_for_layout(file_id, layout)
+        with _file_lock(file_id):
+            # Served from the compact store: nothing in Chroma to move
+            if compact_store.load(file_id, get_active_generation(file_id)) is not None:
+                skipped += 1
+                continue
+
+            source = get_partition(file_id)
+            if source == target:
+                _register(file_id, target)
+                continue
+
+            # 1️⃣ Copy vectors as stored: nothing is re-embedded
+            stored = source.collection.get(where={"file_id": file_id}, include=["embeddings", "documents", "metadatas"])
+            ids = stored["ids"]
+            for start in range(0, len(ids), _COPY_BATCH):
+                end = start + _COPY_BATCH
+                target.collection.upsert(
+                    ids=ids[start:end],
+                    embeddings=stored["embeddings"][start:end],
+                    documents=stored["documents"][start:end],
+                    metadatas=stored["metadatas"][start:end],
+                )
+
+            # 2️⃣ Switch queries over, 3️⃣ then drop the source copy
+            _register(file_id, target)
+            if source.shared:
+                for start in range(0, len(ids), _COPY_BATCH):
+                    source.collection.delete(ids=ids[start:start + _COPY_BATCH])
+            else:
+                drop_collection(source.name)
+
+        moved += 1
+        chunks += len(ids)
+        if moved % 100 == 0:
+            logger.info("📦 Migrated %d file(s), %d chunk(s) to layout=%s", moved, chunks, layout)
+
+    logger.info(
+        "✅ Layout migration done: %d file(s), %d chunk(s) moved to layout=%s, %d compact file(s) skipped",
+        moved, chunks, layout, skipped,
+    )
+    return {"layout": layout, "files_moved": moved, "chunks_moved": chunks, "files_skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move stored vectors to another storage layout.")
+    parser.add_argument("--layout", choices=LAYOUTS, default=VECTOR_LAYOUT)
+    args = parser.parse_args()
+
+    from backend.config import setup_logging
+    from backend.database import engine
+    from backend.migrations import run_migrations
+
+    setup_logging()
+    run_migrations(engine)
+    print(migrate(args.layout))
+
+
+if __name__ == "__main__":
+    main()
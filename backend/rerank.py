@@ -0,0 +1,208 @@
+import math
+import os
+import re
+from collections import Counter
+from typing import List, NamedTuple, Optional
+from dotenv import load_dotenv
+from backend.chunking import count_tokens
+from backend.lexical_index import tokenize
+
+load_dotenv()
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "true").lower() == "true"
+# Chunks fetched from retrieval before reranking (the old behaviour sent the top 3 as-is)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "12"))
+# Upper bound on context tokens in the LLM prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+# Passages kept at most, and the minimum score relative to the best one: the budget is a ceiling, not a target
+RERANK_MAX_PASSAGES = int(os.getenv("RERANK_MAX_PASSAGES", "3"))
+RERANK_MIN_RELATIVE_SCORE = float(os.getenv("RERANK_MIN_RELATIVE_SCORE", "0.6"))
+# A candidate whose span is at least this much covered by better-scored chunks adds nothing new
+RERANK_MAX_OVERLAP = float(os.getenv("RERANK_MAX_OVERLAP", "0.5"))
+
+# Weight of the retriever's own rank next to query-term coverage
+RANK_PRIOR_WEIGHT = 0.2
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+class Passage(NamedTuple):
+    text: str
+    chunk_ids: List[str]   # chunks merged into this passage, in document order
+    score: float
+    file_id: Optional[str]
+    page: Optional[int]    # page of the first chunk
+    tokens: int
+
+
+class _Candidate(NamedTuple):
+    chunk_id: str
+    text: str
+    metadata: dict
+    score: float
+
+
+def score_candidates(question: str, documents, ranks=None):
+    """
+    Cheap CPU relevance score per document: IDF-weighted share of the
+    question's terms the chunk contains (IDF over the candidate set), plus
+    a prior for the retriever's own rank.
+    """
+    ranks = ranks if ranks is not None else range(len(documents))
+    question_terms = set(tokenize(question))
+    doc_terms = [set(tokenize(document)) & question_terms for document in documents]
+
+    n = len(documents)
+    df = Counter(term for terms in doc_terms for term in terms)
+    idf = {term: math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5)) for term in question_terms}
+    total = sum(idf.values()) or 1.0
+
+    return [
+        sum(idf[term] for term in terms) / total + RANK_PRIOR_WEIGHT / (1 + rank)
+        for terms, rank in zip(doc_terms, ranks)
+    ]
+
+
+def _span(metadata):
+    start, end = metadata.get("char_start"), metadata.get("char_end")
+    if start is None or end is None or end <= start:
+        return None
+    return metadata.get("file_id"), start, end
+
+
+def _covered(span, kept_spans) -> float:
+    """Share of `span` already covered by `kept_spans` of the same file."""
+    file_id, start, end = span
+    intervals = sorted(
+        (max(start, s), min(end, e)) for f, s, e in kept_spans if f == file_id and s < end and e > start
+    )
+    covered, position = 0, start
+    for s, e in intervals:
+        s = max(s, position)
+        if e > s:
+            covered += e - s
+            position = e
+    return covered / (end - start)
+
+
+def _merge(group):
+    """Join chunks of one file (sorted by span) into one passage text without repeating overlaps."""
+    text = group[0].text
+    end = group[0].metadata["char_end"]
+    for candidate in group[1:]:
+        start = candidate.metadata["char_start"]
+        if start < end:
+            # Overlapping span: keep only the part past what we already have
+            text += candidate.text[end - start:]
+        else:
+            text += " " + candidate.text
+        end = max(end, candidate.metadata["char_end"])
+    return text
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    for count, match in enumerate(_TOKEN.finditer(text), start=1):
+        if count == max_tokens:
+            return text[:match.end()]
+    return text
+
+
+def rerank(question: str, ids, documents, metadatas=None, budget: int = CONTEXT_TOKEN_BUDGET,
+           max_passages: int = RERANK_MAX_PASSAGES, min_relative_score: float = RERANK_MIN_RELATIVE_SCORE,
+           max_overlap: float = RERANK_MAX_OVERLAP) -> List[Passage]:
+    """
+    Turn retrieval candidates (best first) into context passages:
+
+    1. rescore every candidate with `score_candidates`
+    2. drop candidates mostly covered by better-scored chunks (overlap dedupe)
+    3. merge chunks of the same file whose spans overlap or are consecutive
+    4. pack up to `max_passages` passages best first while they fit in
+       `budget` tokens, skipping any scoring below `min_relative_score`
+       times the best score
+
+    Chunks without span metadata (embedded before spans existed) are never
+    merged, only deduplicated by exact text.
+    """
+    if not documents:
+        return []
+    metadatas = metadatas or [{} for _ in documents]
+
+    scores = score_candidates(question, documents)
+    candidates = sorted(
+        (_Candidate(chunk_id, text, metadata or {}, score)
+         for chunk_id, text, metadata, score in zip(ids, documents, metadatas, scores)),
+        key=lambda c: c.score,
+        reverse=True,
+    )
+
+    # 2️⃣ Overlap dedupe, best first
+    kept, kept_spans, seen_texts = [], [], set()
+    for candidate in candidates:
+        span = _span(candidate.metadata)
+        if span is not None:
+            if kept_spans and _covered(span, kept_spans) >= max_overlap:
+                continue
+            kept_spans.append(span)
+        elif candidate.text in seen_texts:
+            continue
+        seen_texts.add(candidate.text)
+        kept.append(candidate)
+
+    # 3️⃣ Merge overlapping / consecutive chunks of the same file
+    groups, loose = {}, []
+    for candidate in kept:
+        if _span(candidate.metadata) is None:
+            loose.append([candidate])
+        else:
+            groups.setdefault(candidate.metadata.get("file_id"), []).append(candidate)
+
+    def tokens_of(candidate):
+        return candidate.metadata.get("tokens") or count_tokens(candidate.text)
+
+    merged = []
+    for group in groups.values():
+        group.sort(key=lambda c: c.metadata["char_start"])
+        current, current_tokens = [group[0]], tokens_of(group[0])
+        for candidate in group[1:]:
+            previous = current[-1].metadata
+            touching = (
+                candidate.metadata["char_start"] <= max(c.metadata["char_end"] for c in current)
+                or candidate.metadata.get("chunk_id") == previous.get("chunk_id", -2) + 1
+            )
+            # Stop merging before a passage outgrows the whole budget
+            if touching and current_tokens + tokens_of(candidate) <= budget:
+                current.append(candidate)
+                current_tokens += tokens_of(candidate)
+            else:
+                merged.append(current)
+                current, current_tokens = [candidate], tokens_of(candidate)
+        merged.append(current)
+    merged.extend(loose)
+
+    passages = []
+    for group in merged:
+        text = _merge(group) if _span(group[0].metadata) is not None else group[0].text
+        passages.append(Passage(
+            text=text,
+            chunk_ids=[c.chunk_id for c in group],
+            score=max(c.score for c in group),
+            file_id=group[0].metadata.get("file_id"),
+            page=group[0].metadata.get("page"),
+            tokens=count_tokens(text),
+        ))
+    passages.sort(key=lambda p: p.score, reverse=True)
+
+    # 4️⃣ Pack best first into the token budget; the best passage is truncated rather than dropped
+    packed, used = [], 0
+    cutoff = passages[0].score * min_relative_score
+    for passage in passages:
+        if len(packed) == max_passages or passage.score < cutoff:
+            break
+        if used + passage.tokens <= budget:
+            packed.append(passage)
+            used += passage.tokens
+        elif not packed:
+            text = _truncate(passage.text, budget)
+            packed.append(passage._replace(text=text, tokens=count_tokens(text)))
+            used = packed[0].tokens
+    return packed
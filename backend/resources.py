@@ -0,0 +1,133 @@
+import logging
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from backend.embedding import EmbeddingEngine
+from backend.embedding_providers import EMBED_PROVIDER, build_embedder, is_local, provider_model
+
+load_dotenv()
+
+logger = logging.getLogger("Resources")
+
+CHROMA_DIR = os.getenv("CHROMA_DIR", "chroma_db")
+# A Chroma server shared by every uvicorn worker (`chroma run --path chroma_db --port 8001`);
+# unset = an embedded PersistentClient on CHROMA_DIR, for a single worker process only
+CHROMA_HOST = os.getenv("CHROMA_HOST")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8001"))
+# Vectors of different embedding models can't share a collection: local providers default to their own
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION") or (
+    "pdf_collection" if EMBED_PROVIDER == "gemini" else f"pdf_collection_{EMBED_PROVIDER.replace('-', '_')}"
+)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-2.5-flash")
+# Build every client at startup instead of on first use
+RESOURCES_WARMUP = os.getenv("RESOURCES_WARMUP", "false").lower() == "true"
+
+# One instance of each client per process, built on first use
+_resources = {}
+_lock = threading.RLock()
+
+
+def _get(name: str, factory):
+    value = _resources.get(name)
+    if value is None:
+        with _lock:
+            value = _resources.get(name)
+            if value is None:
+                started = time.perf_counter()
+                value = factory()
+                _resources[name] = value
+                logger.info("🔌 %s ready in %.0f ms", name, (time.perf_counter() - started) * 1000)
+    return value
+
+
+def _build_collection(name: str = COLLECTION_NAME):
+    collection = get_chroma_client().get_or_create_collection(
+        name=name,
+        metadata={"hnsw:space": "cosine", "embed_model": provider_model()}
+    )
+    # Collections created before providers existed hold Gemini vectors
+    stored_model = (collection.metadata or {}).get("embed_model", provider_model("gemini"))
+    if stored_model != provider_model():
+        raise RuntimeError(
+            f"Collection '{name}' holds {stored_model} vectors but EMBED_PROVIDER={EMBED_PROVIDER} "
+            f"embeds with {provider_model()}; set CHROMA_COLLECTION to a new collection"
+        )
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    if space != "cosine":
+        logger.warning("⚠️ Collection '%s' was created with hnsw:space=%s; re-embed into a new collection to use cosine",
+                       name, space)
+    return collection
+
+
+def _build_embedding_engine():
+    from backend.embedding_cache import EMBED_CACHE_ENABLED, EmbeddingCache
+
+    return EmbeddingEngine(
+        get_embedder(),
+        cache=EmbeddingCache() if EMBED_CACHE_ENABLED else None,
+        model_name=provider_model(),
+        # A local model already uses EMBED_THREADS per batch: one batch at a time
+        **({"max_concurrency": 1} if is_local() else {}),
+    )
+
+
+def get_chroma_client():
+    import chromadb
+
+    if CHROMA_HOST:
+        return _get("chroma_client", lambda: chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT))
+    return _get("chroma_client", lambda: chromadb.PersistentClient(path=CHROMA_DIR))
+
+
+def get_collection(name: str = None):
+    """The default collection, or the partition collection `name` (see backend/partitions.py)."""
+    if name is None or name == COLLECTION_NAME:
+        return _get("collection", _build_collection)
+    return _get(f"collection:{name}", lambda: _build_collection(name))
+
+
+def drop_collection(name: str):
+    with _lock:
+        _resources.pop(f"collection:{name}", None)
+    try:
+        get_chroma_client().delete_collection(name)
+    except Exception as e:
+        # Already gone (e.g. a retried delete)
+        logger.warning("⚠️ Could not drop collection '%s': %s", name, e)
+
+
+def get_embedder():
+    return _get("embedder", build_embedder)
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    return _get("embedding_engine", _build_embedding_engine)
+
+
+def get_chat_model():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return _get("chat_model", lambda: ChatGoogleGenerativeAI(model=CHAT_MODEL))
+
+
+def override(**values):
+    """Swap in ready-made resources (local fakes in benchmarks)."""
+    with _lock:
+        _resources.update(values)
+
+
+def warm_up():
+    started = time.perf_counter()
+    get_collection()
+    get_embedding_engine()
+    get_chat_model()
+    logger.info("🔥 Resources warmed up in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+def shutdown():
+    with _lock:
+        engine = _resources.get("embedding_engine")
+        if engine is not None:
+            engine.shutdown()
+        _resources.clear()
@@ -0,0 +1,501 @@
+"""
+Deleting files and reclaiming the space they leave behind.
+
+- `delete_files`: the DB rows (file, partition, jobs, chat sessions) go in
+  one commit, then every vector of the file (a `$in` delete per shared
+  partition, a dropped collection for a file of its own), every compact
+  store / BM25 generation, the PDF and its extracted text
+- `apply_retention`: deletes files uploaded more than RETENTION_MAX_AGE_DAYS
+  ago or not queried for RETENTION_UNUSED_DAYS (`last_used_at`, written at
+  most once per RETENTION_USAGE_RESOLUTION seconds per file by `mark_used`)
+- `compact`: garbage-collects what deletes and re-indexes left over
+  (chunks of deleted files or replaced generations, collections and index
+  files nobody maps to, stray PDFs / temp files), then hands freed SQLite
+  pages back to the filesystem
+
+All of it runs as jobs (see jobs.py) next to live queries: only the files
+being cleaned are locked, Chroma deletes are batched, and SQLite pages are
+freed a few at a time, so readers are never blocked and writers only wait
+for one short step.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from sqlalchemy import and_, or_
+from backend import compact_store, sessions
+from backend.answer_cache import answer_cache
+from backend.database import SessionLocal, engine
+from backend.indexing import _file_lock
+from backend.lexical_index import LEXICAL_INDEX_DIR, delete_index, stored_indexes
+from backend.locks import LOCK_DIR, process_lock
+from backend.metrics import FILES_DELETED_TOTAL, RECLAIMED_TOTAL
+from backend.models import ChatSessionRecord, FileInfo, Job, VectorPartition
+from backend.partitions import get_partitions, is_file_collection, is_partition_name
+from backend.resources import drop_collection, get_chroma_client, get_collection
+
+load_dotenv()
+
+logger = logging.getLogger("Retention")
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR")
+EXTRACT_DIR = os.getenv("EXTRACT_DIR")
+
+# 0 disables either rule; a file matching any enabled rule is deleted
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+RETENTION_UNUSED_DAYS = float(os.getenv("RETENTION_UNUSED_DAYS", "0"))
+# Run retention + compaction every N hours in the background; 0 = only on request
+RETENTION_INTERVAL_HOURS = float(os.getenv("RETENTION_INTERVAL_HOURS", "0"))
+# Files deleted per lock / commit round
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "100"))
+# Seconds between two last_used_at writes of the same file
+RETENTION_USAGE_RESOLUTION = float(os.getenv("RETENTION_USAGE_RESOLUTION", "3600"))
+
+# SQLite pages freed per step, and the pause that lets other writers in between steps
+COMPACT_VACUUM_PAGES = int(os.getenv("COMPACT_VACUUM_PAGES", "2000"))
+COMPACT_VACUUM_PAUSE = float(os.getenv("COMPACT_VACUUM_PAUSE", "0.05"))
+# A database created before incremental vacuum needs one full VACUUM (writers wait while it runs)
+COMPACT_FULL_VACUUM = os.getenv("COMPACT_FULL_VACUUM", "false").lower() == "true"
+# Temp files (*.part) older than this are leftovers of an interrupted write
+COMPACT_TEMP_MAX_AGE = float(os.getenv("COMPACT_TEMP_MAX_AGE", "3600"))
+
+# Chroma rejects very large single calls
+_BATCH = 1000
+_SCAN_BATCH = 5000
+
+_marked = {}
+_marked_lock = threading.Lock()
+# Bound on files remembered by mark_used; forgetting only costs an early write
+_MARKED_MAX = 100_000
+
+
+def mark_used(file_ids):
+    """Record that the files answered a query (at most one DB write per file per resolution)."""
+    now = time.monotonic()
+    with _marked_lock:
+        due = [f for f in set(file_ids) if now - _marked.get(f, -RETENTION_USAGE_RESOLUTION) >= RETENTION_USAGE_RESOLUTION]
+        if len(_marked) + len(due) > _MARKED_MAX:
+            _marked.clear()
+        _marked.update((file_id, now) for file_id in due)
+    if not due:
+        return
+    with SessionLocal() as db:
+        db.query(FileInfo).filter(FileInfo.file_id.in_(due)).update(
+            {FileInfo.last_used_at: datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path)
+            for name in names
+        )
+    return os.path.getsize(path)
+
+
+def _remove_path(path: str) -> int:
+    """Delete a file or directory; bytes freed (0 if it was not there)."""
+    try:
+        size = _size(path)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError:
+        return 0
+    return size
+
+
+def _file_paths(file_id: str):
+    """Per-file paths outside the vector stores."""
+    paths = []
+    if UPLOAD_DIR:
+        paths.append(os.path.join(UPLOAD_DIR, f"{file_id}.pdf"))
+    if EXTRACT_DIR:
+        paths += [os.path.join(EXTRACT_DIR, f"{file_id}.txt"), os.path.join(EXTRACT_DIR, f"{file_id}.pages.json")]
+    return paths
+
+
+def _file_filter(file_ids):
+    return {"file_id": file_ids[0]} if len(file_ids) == 1 else {"file_id": {"$in": list(file_ids)}}
+
+
+def _missing(file_ids):
+    """The subset of `file_ids` without a file_info row right now."""
+    file_ids = list(file_ids)
+    present = set()
+    with SessionLocal() as db:
+        for start in range(0, len(file_ids), _BATCH):
+            present.update(
+                row[0] for row in
+                db.query(FileInfo.file_id).filter(FileInfo.file_id.in_(file_ids[start:start + _BATCH])).all()
+            )
+    return set(file_ids) - present
+
+
+def delete_files(file_ids, reason: str = "api"):
+    """
+    Delete `file_ids` with everything stored for them, RETENTION_BATCH
+    files at a time. Returns the deleted / unknown ids, chunks deleted and
+    bytes freed on disk.
+    """
+    # Sorted: batches take their locks in one global order
+    file_ids = sorted(set(file_ids))
+    summary = {"deleted": [], "missing": [], "chunks_deleted": 0, "bytes_freed": 0}
+    for start in range(0, len(file_ids), RETENTION_BATCH):
+        _delete_batch(file_ids[start:start + RETENTION_BATCH], reason, summary)
+    return summary
+
+
+def _delete_batch(file_ids, reason: str, summary):
+    with ExitStack() as locks:
+        # Waits for a running re-index of any of them; queries are not blocked
+        for file_id in file_ids:
+            locks.enter_context(_file_lock(file_id))
+
+        with SessionLocal() as db:
+            generations = dict(
+                db.query(FileInfo.file_id, FileInfo.active_generation).filter(FileInfo.file_id.in_(file_ids)).all()
+            )
+        found = sorted(generations)
+        summary["missing"] += sorted(set(file_ids) - set(found))
+        if not found:
+            return
+        partitions = get_partitions(found)
+
+        # 1️⃣ One commit: from here on the files are gone for every endpoint
+        with SessionLocal() as db:
+            for model, column in (
+                (FileInfo, FileInfo.file_id),
+                (VectorPartition, VectorPartition.file_id),
+                (Job, Job.file_id),
+                (ChatSessionRecord, ChatSessionRecord.file_id),
+            ):
+                db.query(model).filter(column.in_(found)).delete(synchronize_session=False)
+            db.commit()
+
+        # 2️⃣ Vectors in bulk: one `$in` delete per shared partition, a dropped collection per own one
+        grouped = {}
+        for file_id, partition in partitions.items():
+            grouped.setdefault(partition, []).append(file_id)
+        for partition, members in grouped.items():
+            if partition.shared:
+                collection = partition.collection
+                for start in range(0, len(members), _BATCH):
+                    ids = collection.get(where=_file_filter(members[start:start + _BATCH]), include=[])["ids"]
+                    for offset in range(0, len(ids), _BATCH):
+                        collection.delete(ids=ids[offset:offset + _BATCH])
+                    summary["chunks_deleted"] += len(ids)
+            else:
+                summary["chunks_deleted"] += partition.collection.count()
+                drop_collection(partition.name)
+
+        # 3️⃣ Every compact store / BM25 generation (not just the active one), the PDF and its text
+        targets = set(found)
+        freed = 0
+        for file_id, generation in list(compact_store.stored_generations()):
+            if file_id in targets:
+                if generation == generations[file_id]:
+                    index = compact_store.load(file_id, generation)
+                    summary["chunks_deleted"] += len(index) if index is not None else 0
+                freed += _size(compact_store.store_path(file_id, generation))
+                compact_store.delete(file_id, generation)
+        for file_id, generation in list(stored_indexes()):
+            if file_id in targets:
+                delete_index(file_id, generation)
+        for file_id in found:
+            freed += sum(_remove_path(path) for path in _file_paths(file_id))
+            if answer_cache:
+                answer_cache.invalidate_file(file_id)
+            sessions.forget_file(file_id)
+        summary["bytes_freed"] += freed
+
+    # Lock files last, once released (a waiter on the old file finds nothing left to do)
+    for file_id in found:
+        _remove_path(os.path.join(LOCK_DIR, f"file_{file_id}.lock"))
+
+    summary["deleted"] += found
+    FILES_DELETED_TOTAL.inc(len(found), reason=reason)
+    logger.info("🗑️ Deleted %d file(s) (%s): %d chunk(s), %.1f MB", len(found), reason,
+                summary["chunks_deleted"], summary["bytes_freed"] / 1e6)
+
+
+def expired_files(max_age_days: float = RETENTION_MAX_AGE_DAYS, unused_days: float = RETENTION_UNUSED_DAYS):
+    """
+    Files matching the retention policy, oldest first. Never-queried files
+    count from their upload; a file without a known date is never expired
+    by the rule that needs it.
+    """
+    now = datetime.utcnow()
+    conditions = []
+    if max_age_days:
+        conditions.append(and_(
+            FileInfo.uploaded_at.isnot(None),
+            FileInfo.uploaded_at < now - timedelta(days=max_age_days),
+        ))
+    if unused_days:
+        cutoff = now - timedelta(days=unused_days)
+        conditions.append(or_(
+            and_(FileInfo.last_used_at.isnot(None), FileInfo.last_used_at < cutoff),
+            and_(FileInfo.last_used_at.is_(None), FileInfo.uploaded_at.isnot(None), FileInfo.uploaded_at < cutoff),
+        ))
+    if not conditions:
+        return []
+
+    with SessionLocal() as db:
+        rows = db.query(FileInfo).filter(or_(*conditions)).order_by(FileInfo.uploaded_at, FileInfo.file_id).all()
+        return [
+            {
+                "file_id": f.file_id,
+                "file_name": f.file_name,
+                "uploaded_at": f.uploaded_at,
+                "last_used_at": f.last_used_at,
+            }
+            for f in rows
+        ]
+
+
+def apply_retention(max_age_days: float = None, unused_days: float = None, dry_run: bool = False,
+                    compact_after: bool = False):
+    """Delete the files `expired_files` returns (or only list them); optionally compact afterwards."""
+    policy = {
+        "max_age_days": RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days,
+        "unused_days": RETENTION_UNUSED_DAYS if unused_days is None else unused_days,
+    }
+    files = expired_files(**policy)
+    if dry_run:
+        return {"policy": policy, "dry_run": True, "files": files}
+
+    logger.info("⏳ Retention %s: %d file(s) expired", policy, len(files))
+    result = {"policy": policy, **delete_files([f["file_id"] for f in files], reason="retention")}
+    if compact_after:
+        result["compaction"] = compact()
+    return result
+
+
+def _compact_chroma(active, report):
+    """Drop per-file collections nobody maps to; delete chunks of deleted files and of replaced generations."""
+    client = get_chroma_client()
+    with SessionLocal() as db:
+        registered = {row[0] for row in db.query(VectorPartition.collection_name).distinct().all()}
+
+    for name in sorted(c if isinstance(c, str) else c.name for c in client.list_collections()):
+        if not is_partition_name(name):
+            continue  # another embedding provider's collections
+
+        if is_file_collection(name):
+            if name in registered:
+                continue
+            # Re-checked: a new file registers its collection before writing to it
+            with SessionLocal() as db:
+                if db.query(VectorPartition).filter(VectorPartition.collection_name == name).first() is None:
+                    drop_collection(name)
+                    report["collections"] += 1
+            continue
+
+        # Shared collection: one pass over the metadata, deletes afterwards
+        collection = get_collection(name)
+        orphans, stale = {}, {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=_SCAN_BATCH, offset=offset)
+            for chunk_id, metadata in zip(page["ids"], page["metadatas"] or []):
+                file_id = (metadata or {}).get("file_id")
+                if file_id is None:
+                    continue  # not written by this app
+                if file_id not in active:
+                    orphans.setdefault(file_id, []).append(chunk_id)
+                # Generations only move forward: a chunk whose range ends before the active one stays invisible
+                elif active[file_id] and (metadata or {}).get("gen_max", 0) < active[file_id]:
+                    stale.setdefault(file_id, []).append(chunk_id)
+            if len(page["ids"]) < _SCAN_BATCH:
+                break
+            offset += _SCAN_BATCH
+
+        # Re-checked: a file uploaded during the scan has its row before its first chunk
+        for file_id in _missing(orphans):
+            ids = orphans[file_id]
+            for start in range(0, len(ids), _BATCH):
+                collection.delete(ids=ids[start:start + _BATCH])
+            report["orphan_chunks"] += len(ids)
+        for file_id, ids in stale.items():
+            # Not while the file is being re-indexed (it reads and updates its stored chunks)
+            with _file_lock(file_id):
+                for start in range(0, len(ids), _BATCH):
+                    collection.delete(ids=ids[start:start + _BATCH])
+            report["stale_chunks"] += len(ids)
+
+
+def _compact_generations(active, report):
+    """Compact store / BM25 generations no query can reach: deleted files, or older than the active one."""
+    stored = [("compact", f, g) for f, g in compact_store.stored_generations()]
+    stored += [("lexical", f, g) for f, g in stored_indexes()]
+    missing = _missing({file_id for _, file_id, _ in stored if file_id not in active})
+
+    for kind, file_id, generation in stored:
+        # Newer than the active generation: a re-index in progress, left alone
+        if file_id not in missing and not (file_id in active and generation < active[file_id]):
+            continue
+        with _file_lock(file_id):
+            if kind == "compact":
+                report["bytes_freed"] += _size(compact_store.store_path(file_id, generation))
+                compact_store.delete(file_id, generation)
+            else:
+                delete_index(file_id, generation)
+        report["index_files"] += 1
+
+
+def _compact_files(active, report):
+    """PDFs, extracted text and lock files of deleted files, and temp files of interrupted writes."""
+    now = time.time()
+    candidates = {}
+    for directory, suffixes in (
+        (UPLOAD_DIR, (".pdf",)),
+        (EXTRACT_DIR, (".pages.json", ".txt")),
+        (LOCK_DIR, (".lock",)),
+        (LEXICAL_INDEX_DIR, ()),
+        (compact_store.COMPACT_STORE_DIR, ()),
+    ):
+        if not directory or not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".part"):
+                    if now - entry.stat().st_mtime > COMPACT_TEMP_MAX_AGE:
+                        report["bytes_freed"] += _remove_path(entry.path)
+                        report["files"] += 1
+                    continue
+                for suffix in suffixes:
+                    if entry.name.endswith(suffix):
+                        file_id = entry.name[:-len(suffix)]
+                        if directory == LOCK_DIR:
+                            if not file_id.startswith("file_"):
+                                break
+                            file_id = file_id[len("file_"):]
+                        if file_id not in active:
+                            candidates.setdefault(file_id, []).append(entry.path)
+                        break
+
+    for file_id in _missing(candidates):
+        for path in candidates[file_id]:
+            report["bytes_freed"] += _remove_path(path)
+            report["files"] += 1
+
+
+def _vacuum_sqlite(report):
+    """Hand free SQLite pages back to the filesystem in small steps, then truncate the WAL."""
+    if engine.dialect.name != "sqlite" or engine.url.database in (None, "", ":memory:"):
+        return
+    raw = engine.raw_connection()
+    try:
+        connection = raw.driver_connection
+        mode = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+        free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        if mode != 2:  # not INCREMENTAL
+            if not COMPACT_FULL_VACUUM:
+                logger.info("ℹ️ SQLite has %d free page(s); set COMPACT_FULL_VACUUM=true once to enable "
+                            "incremental vacuum on this database", free)
+                return
+            logger.info("🧽 One-time full VACUUM to switch the database to incremental vacuum")
+            connection.executescript("PRAGMA auto_vacuum=INCREMENTAL; VACUUM;")
+            report["sqlite_pages"] += free
+            free = 0
+
+        # Each step is a short write transaction: other writers get the lock in between
+        while free > 0:
+            connection.executescript(f"PRAGMA incremental_vacuum({COMPACT_VACUUM_PAGES});")
+            remaining = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            report["sqlite_pages"] += free - remaining
+            if remaining >= free:
+                break
+            free = remaining
+            time.sleep(COMPACT_VACUUM_PAUSE)
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    finally:
+        raw.close()
+
+
+def compact():
+    """
+    Garbage-collect what deleted files and replaced generations left in the
+    vector stores and on disk, then reclaim SQLite space. Safe to run at
+    any time, next to queries and ingestion.
+    """
+    started = time.perf_counter()
+    report = {"orphan_chunks": 0, "stale_chunks": 0, "collections": 0, "index_files": 0, "files": 0,
+              "sqlite_pages": 0, "bytes_freed": 0}
+    with SessionLocal() as db:
+        active = {file_id: generation or 0 for file_id, generation in
+                  db.query(FileInfo.file_id, FileInfo.active_generation).all()}
+
+    # 1️⃣ Chroma, 2️⃣ compact store + BM25 generations, 3️⃣ stray files
+    _compact_chroma(active, report)
+    _compact_generations(active, report)
+    _compact_files(active, report)
+
+    # 4️⃣ Expired chat sessions, then the pages every delete above freed in the app database
+    store = sessions.get_session_store()
+    if isinstance(store, sessions.SqliteSessionStore):
+        store.evict()
+    _vacuum_sqlite(report)
+
+    for kind in ("orphan_chunks", "stale_chunks", "collections", "index_files", "files", "sqlite_pages"):
+        RECLAIMED_TOTAL.inc(report[kind], kind=kind)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info("🧹 Compaction done: %s", report)
+    return report
+
+
+_scheduler = None
+_stop = threading.Event()
+
+
+def _schedule_once(interval: float):
+    """
+    Submit a retention + compaction job unless one was submitted in the
+    last half interval, or retention is running / being scheduled elsewhere.
+    """
+    # Imported here: jobs runs this module's functions
+    from backend import jobs
+
+    with process_lock("retention", blocking=False) as acquired:
+        if not acquired:
+            logger.info("⏭️ Scheduled retention skipped: another worker holds the retention lock")
+            return None
+        since = datetime.utcnow() - timedelta(seconds=interval / 2)
+        with SessionLocal() as db:
+            recent = db.query(Job.job_id).filter(Job.kind == "retention", Job.created_at >= since).first()
+        if recent is not None:
+            return None
+        return jobs.submit_job("*", "retention", params={"compact_after": True})
+
+
+def _schedule_loop(interval: float):
+    while not _stop.wait(interval):
+        # Every uvicorn worker runs this loop: only one of them submits per interval
+        _schedule_once(interval)
+
+
+def start_scheduler():
+    global _scheduler
+    if RETENTION_INTERVAL_HOURS <= 0 or _scheduler is not None:
+        return
+    _stop.clear()
+    _scheduler = threading.Thread(
+        target=_schedule_loop, args=(RETENTION_INTERVAL_HOURS * 3600,), name="retention", daemon=True
+    )
+    _scheduler.start()
+    logger.info("⏰ Retention + compaction scheduled every %g hour(s)", RETENTION_INTERVAL_HOURS)
+
+
+def shutdown():
+    global _scheduler
+    _stop.set()
+    _scheduler = None
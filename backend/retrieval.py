@@ -0,0 +1,224 @@
+import logging
+import os
+from dotenv import load_dotenv
+from backend.lexical_index import load_index
+from backend.metrics import QUERY_STAGE_SECONDS
+
+load_dotenv()
+
+logger = logging.getLogger("Retrieval")
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # vector | lexical | hybrid
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+# Candidates taken from each side before fusion
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+RRF_K = 60
+
+# Multi-document queries: chunks kept in total and per file, and how many nearest chunks to rank them from
+MULTI_TOP_K = int(os.getenv("MULTI_QUERY_TOP_K", "8"))
+MULTI_PER_FILE = int(os.getenv("MULTI_QUERY_PER_FILE", "2"))
+MULTI_CANDIDATES = int(os.getenv("MULTI_QUERY_CANDIDATES", "50"))
+# Searches (collections + compact file generations) one multi-document query may fan out to
+MULTI_MAX_SEARCHES = int(os.getenv("MULTI_QUERY_MAX_SEARCHES", "128"))
+
+MODES = ("vector", "lexical", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    """Fuse several ranked id lists; [(id, score), ...] best first."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def generation_where(file_id: str, generation: int = 0, shared: bool = True):
+    """
+    Chroma filter for the chunks of `file_id` visible in `generation`
+    (0 = pre-generation file). In a collection of its own (`shared=False`)
+    the file needs no filter.
+    """
+    conditions = [{"file_id": file_id}] if shared else []
+    if generation:
+        conditions += [{"gen_min": {"$lte": generation}}, {"gen_max": {"$gte": generation}}]
+    if len(conditions) > 1:
+        return {"$and": conditions}
+    return conditions[0] if conditions else None
+
+
+def is_visible(metadata, generation: int = 0) -> bool:
+    if not generation:
+        return True
+    metadata = metadata or {}
+    return metadata.get("gen_min", generation + 1) <= generation <= metadata.get("gen_max", -1)
+
+
+def _vector_search(collection, file_id: str, query_embedding, n_results: int, generation: int = 0,
+                   shared: bool = True):
+    with QUERY_STAGE_SECONDS.time(stage="vector_search"):
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=generation_where(file_id, generation, shared),
+        )
+    ids = (results.get("ids") or [[]])[0]
+    documents = (results.get("documents") or [[]])[0]
+    metadatas = (results.get("metadatas") or [[]])[0] or [None] * len(ids)
+    return ids, dict(zip(ids, documents)), dict(zip(ids, metadatas))
+
+
+def retrieve(collection, file_id: str, question: str, embed_query, mode: str = RETRIEVAL_MODE,
+             top_k: int = RETRIEVAL_TOP_K, query_embedding=None, generation: int = 0, shared: bool = True):
+    """Top chunks of `file_id` for `question` as (ids, documents, query_embedding)."""
+    ids, documents, _, query_embedding = retrieve_candidates(
+        collection, file_id, question, embed_query, mode=mode, top_k=top_k,
+        query_embedding=query_embedding, generation=generation, shared=shared,
+    )
+    return ids, documents, query_embedding
+
+
+def retrieve_candidates(collection, file_id: str, question: str, embed_query, mode: str = RETRIEVAL_MODE,
+                        top_k: int = RETRIEVAL_TOP_K, query_embedding=None, generation: int = 0,
+                        shared: bool = True):
+    """
+    Top chunks of `file_id` for `question`, best first, as
+    (ids, documents, metadatas, query_embedding).
+
+    - vector:  Chroma similarity search
+    - lexical: BM25 over the file's local index, no embedding call at all
+    - hybrid:  both, fused with reciprocal rank fusion
+
+    `embed_query(question)` is only called when the vector side runs.
+    Files indexed before lexical indexing existed fall back to vector search.
+    Only chunks of the file's active `generation` are returned.
+    `shared=False` means `collection` holds only this file (see partitions.py).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+
+    index, lexical_ids = lexical_search(file_id, question, generation) if mode != "vector" else (None, [])
+
+    if mode == "lexical" and lexical_ids:
+        ids = lexical_ids[:top_k]
+        documents, metadatas = {}, {}
+    else:
+        if mode != "vector" and index is None:
+            logger.info("ℹ️ No lexical index for file_id=%s, using vector search", file_id)
+        if query_embedding is None:
+            with QUERY_STAGE_SECONDS.time(stage="embed_question"):
+                query_embedding = embed_query(question)
+
+        fuse = bool(lexical_ids) and mode == "hybrid"
+        vector_ids, documents, metadatas = _vector_search(
+            collection, file_id, query_embedding, RETRIEVAL_CANDIDATES if fuse else top_k, generation, shared
+        )
+        if fuse:
+            ids = [chunk_id for chunk_id, _ in reciprocal_rank_fusion([vector_ids, lexical_ids])[:top_k]]
+        else:
+            ids = vector_ids[:top_k]
+
+    # Lexical-only hits still need their text
+    ids, documents, metadatas = fetch_documents(collection, ids, documents, metadatas)
+    return ids, documents, metadatas, query_embedding
+
+
+def lexical_search(file_id: str, question: str, generation: int = 0, k: int = RETRIEVAL_CANDIDATES):
+    """(BM25 index or None, best chunk ids) — local, no embedding call."""
+    with QUERY_STAGE_SECONDS.time(stage="lexical_search"):
+        index = load_index(file_id, generation)
+        return index, ([chunk_id for chunk_id, _ in index.search(question, k)] if index else [])
+
+
+def fetch_documents(collection, ids, documents, metadatas):
+    """
+    (ids, documents, metadatas) lists for `ids`, taking what is already in
+    the `documents` / `metadatas` dicts and getting the rest from
+    `collection`. Ids the collection no longer has are dropped.
+    """
+    missing = [chunk_id for chunk_id in ids if chunk_id not in documents]
+    if missing:
+        with QUERY_STAGE_SECONDS.time(stage="fetch_documents"):
+            fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+        documents.update(zip(fetched["ids"], fetched["documents"]))
+        metadatas.update(zip(fetched["ids"], fetched["metadatas"] or [None] * len(fetched["ids"])))
+
+    ids = [chunk_id for chunk_id in ids if chunk_id in documents]
+    return ids, [documents[chunk_id] for chunk_id in ids], [metadatas.get(chunk_id) or {} for chunk_id in ids]
+
+
+def retrieve_multi(collection, file_ids, question: str, embed_query, top_k: int = MULTI_TOP_K,
+                   per_file: int = MULTI_PER_FILE, candidates: int = MULTI_CANDIDATES, query_embedding=None,
+                   active_generations=None):
+    """
+    Top chunks for `question` across `file_ids` (None = every file) as
+    (ids, documents, metadatas, query_embedding).
+
+    One vector search with a `$in` filter (no filter at all for every
+    file), nearest first, keeping at most `per_file` chunks of any one
+    file so a single long document cannot crowd out the rest.
+
+    `active_generations(file_ids) -> {file_id: generation}` drops chunks
+    of a generation that is being built or was just replaced.
+    """
+    if file_ids is not None and not file_ids:
+        return [], [], [], query_embedding
+    return retrieve_multi_groups(
+        [(collection, file_ids)], question, embed_query, top_k=top_k, per_file=per_file,
+        candidates=candidates, query_embedding=query_embedding, active_generations=active_generations,
+    )
+
+
+def retrieve_multi_groups(groups, question: str, embed_query, top_k: int = MULTI_TOP_K,
+                          per_file: int = MULTI_PER_FILE, candidates: int = MULTI_CANDIDATES, query_embedding=None,
+                          active_generations=None):
+    """
+    `retrieve_multi` over several collections: `groups` is
+    [(collection, file_ids to filter on or None)], one search each, hits
+    merged by distance.
+    """
+    if not groups:
+        return [], [], [], query_embedding
+
+    if query_embedding is None:
+        with QUERY_STAGE_SECONDS.time(stage="embed_question"):
+            query_embedding = embed_query(question)
+
+    hits = []
+    with QUERY_STAGE_SECONDS.time(stage="vector_search"):
+        for collection, file_ids in groups:
+            where = None
+            if file_ids is not None:
+                where = {"file_id": file_ids[0]} if len(file_ids) == 1 else {"file_id": {"$in": list(file_ids)}}
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=max(candidates, top_k),
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            )
+            ids = (results.get("ids") or [[]])[0]
+            hits.extend(zip(
+                (results.get("distances") or [[]])[0] or [0.0] * len(ids),
+                ids,
+                (results.get("documents") or [[]])[0],
+                [metadata or {} for metadata in (results.get("metadatas") or [[]])[0]],
+            ))
+    if len(groups) > 1:
+        hits.sort(key=lambda hit: hit[0])
+
+    generations = active_generations({metadata.get("file_id") for *_, metadata in hits}) if active_generations else {}
+
+    ids, documents, metadatas = [], [], []
+    taken = {}
+    for _, chunk_id, document, metadata in hits:
+        file_id = metadata.get("file_id")
+        if taken.get(file_id, 0) >= per_file or not is_visible(metadata, generations.get(file_id, 0)):
+            continue
+        taken[file_id] = taken.get(file_id, 0) + 1
+        ids.append(chunk_id)
+        documents.append(document)
+        metadatas.append(metadata)
+        if len(ids) == top_k:
+            break
+
+    return ids, documents, metadatas, query_embedding
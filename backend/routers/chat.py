@@ -0,0 +1,150 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+from typing import Optional
+import logging
+from backend import retrieval, sessions
+from backend.resources import get_chat_model, get_embedding_engine
+from backend.executors import run_io
+from backend.chunking import count_tokens
+from backend.metrics import CACHE_REQUESTS_TOTAL, QUERY_STAGE_SECONDS, TOKENS_TOTAL
+from backend.database import SessionLocal
+from backend.models import FileInfo
+from backend.routers.query import build_prompt, candidate_count, check_mode, pack_context, search_target
+
+router = APIRouter(prefix="/chat", tags=["Chat"])
+logger = logging.getLogger("ChatRouter")
+
+
+# Request bodies
+class SessionRequest(BaseModel):
+    file_id: str
+
+
+class MessageRequest(BaseModel):
+    question: str
+    mode: Optional[str] = None  # vector | lexical | hybrid, defaults to RETRIEVAL_MODE
+
+
+def _file_exists(file_id: str) -> bool:
+    with SessionLocal() as db:
+        return db.query(FileInfo.file_id).filter(FileInfo.file_id == file_id).first() is not None
+
+
+def retrieve_turn(session: sessions.ChatSession, question: str, mode: str):
+    """
+    Context for one turn as (chunk ids, passages, reused). When the
+    question's BM25 top-k mostly overlaps the last turn's candidates, those
+    candidates (plus any new BM25 hits) are reranked for the new question
+    instead of embedding it and searching again. Updates
+    `session.candidates` for the next turn.
+    """
+    generation, collection, shared = search_target(session.file_id)
+    top_k = candidate_count()
+
+    lexical_ids = []
+    if mode != "vector":
+        _, lexical_ids = retrieval.lexical_search(session.file_id, question, generation, top_k)
+
+    reused = sessions.reusable_candidates(session, generation, lexical_ids)
+    if reused:
+        cached = session.candidates
+        ranked = retrieval.reciprocal_rank_fusion([cached["ids"], lexical_ids])[:top_k]
+        ids, documents, metadatas = retrieval.fetch_documents(
+            collection,
+            [chunk_id for chunk_id, _ in ranked],
+            dict(zip(cached["ids"], cached["documents"])),
+            dict(zip(cached["ids"], cached["metadatas"])),
+        )
+    else:
+        ids, documents, metadatas, _ = retrieval.retrieve_candidates(
+            collection,
+            session.file_id,
+            question,
+            embed_query=get_embedding_engine().embed_query,
+            mode=mode,
+            top_k=top_k,
+            generation=generation,
+            shared=shared,
+        )
+    CACHE_REQUESTS_TOTAL.inc(cache="chat_context", result="hit" if reused else "miss")
+
+    if not documents:
+        raise HTTPException(404, "No embeddings found for this file.")
+
+    session.candidates = {"generation": generation, "ids": ids, "documents": documents, "metadatas": metadatas}
+    ids, documents = pack_context(question, ids, documents, metadatas)
+    return ids, documents, reused
+
+
+@router.post("/")
+async def create_session(data: SessionRequest):
+    if not await run_io(_file_exists, data.file_id):
+        raise HTTPException(404, "File not found")
+
+    session = await run_io(sessions.create_session, data.file_id)
+    logger.info("💬 Chat session %s started for file_id=%s", session.session_id, data.file_id)
+    return {"session_id": session.session_id, "file_id": session.file_id}
+
+
+@router.post("/{session_id}")
+async def send_message(session_id: str, data: MessageRequest, model=Depends(get_chat_model)):
+    store = sessions.get_session_store()
+    session = await run_io(store.get, session_id)
+    if session is None:
+        raise HTTPException(404, "Chat session not found or expired")
+    mode = check_mode(data.mode)
+    logger.info("💬 Chat turn %d: session=%s, question=%.200s", session.turn_count + 1, session_id, data.question)
+
+    # 1️⃣ Follow-up => standalone question for retrieval
+    with QUERY_STAGE_SECONDS.time(stage="rewrite"):
+        standalone = await sessions.standalone_question(session, data.question, model)
+    if standalone != data.question:
+        logger.info("✏️ Rewritten follow-up: %.200s", standalone)
+
+    # 2️⃣ Retrieve, or reuse the last turn's candidates when they still cover the question
+    chunk_ids, documents, reused = await run_io(retrieve_turn, session, standalone, mode)
+
+    # 3️⃣ Prompt with the summarized history and the recent turns
+    prompt = build_prompt("\n\n".join(documents), data.question, history=session.history_text())
+
+    # 4️⃣ Call LLM
+    with QUERY_STAGE_SECONDS.time(stage="llm"):
+        llm_response = await model.ainvoke(prompt)
+    answer = llm_response.content
+    prompt_tokens = count_tokens(prompt)
+    TOKENS_TOTAL.inc(prompt_tokens, kind="prompt")
+    TOKENS_TOTAL.inc(count_tokens(answer), kind="answer")
+
+    # 5️⃣ Remember the turn (older turns fold into the summary)
+    session.add_turn(data.question, standalone, answer)
+    await run_io(store.save, session)
+
+    return {
+        "answer": answer,
+        "standalone_question": standalone,
+        "reused_context": reused,
+        "chunk_ids": chunk_ids,
+        "turn": session.turn_count,
+        "prompt_tokens": prompt_tokens,
+    }
+
+
+@router.get("/{session_id}")
+async def get_session(session_id: str):
+    session = await run_io(sessions.get_session_store().get, session_id)
+    if session is None:
+        raise HTTPException(404, "Chat session not found or expired")
+    return {
+        "session_id": session.session_id,
+        "file_id": session.file_id,
+        "turn_count": session.turn_count,
+        "summary": session.summary,
+        "turns": session.turns,
+    }
+
+
+@router.delete("/{session_id}")
+async def delete_session(session_id: str):
+    if not await run_io(sessions.get_session_store().delete, session_id):
+        raise HTTPException(404, "Chat session not found or expired")
+    return {"deleted": session_id}
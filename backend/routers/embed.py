@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException
 import os
 import logging
-from chromadb import PersistentClient
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from dotenv import load_dotenv
-from backend.database import SessionLocal
-from backend.models import FileInfo
+from backend.executors import run_bulk
+from backend.resources import get_embedding_engine
+from backend.chunking import chunk_document
+from backend.extraction import load_page_offsets, pages_path
+from backend.indexing import index_chunks
+from backend.metrics import INGEST_STAGE_SECONDS
 
 load_dotenv()
 
@@ -15,95 +17,56 @@ logger = logging.getLogger("EmbedRouter")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR")
 EXTRACT_DIR = os.getenv("EXTRACT_DIR")
 
-client = PersistentClient(path="chroma_db")
+@router.get("/cache_stats")
+def embedding_cache_stats():
+    cache = get_embedding_engine().cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
 
-def chunk_text(text, chunk_size=700, overlap=100):
-    logger.info(f"✂️ Chunking text: chunk_size={chunk_size}, overlap={overlap}")
+
+def embed_file(file_id: str, progress=None, full: bool = False):
     """
-    Splits the text into chunks with overlap.
-    chunk_size = number of characters per chunk
-    overlap = number of characters that overlap between chunks
+    Chunk + embed EXTRACT_DIR/{file_id}.txt into Chroma. Re-embedding a
+    file is incremental: unchanged chunks keep their vectors, see
+    `indexing.index_chunks`. `progress(chunks_embedded, chunks_total)` is
+    called after every batch.
     """
-    chunks = []
-    start = 0
-
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-
-        # Move pointer with overlap
-        start = end - overlap  
-    logger.info(f"📦 Total chunks created: {len(chunks)}")
-    return chunks
-
-
-def get_collection():
-    return client.get_or_create_collection(
-        name="pdf_collection",
-        metadata={"hnsw:space": "cosine"}
-    )
-
-def generate_embedding(text: str):
-    embedder = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-    return embedder.embed_documents([text])[0]
-
-
-@router.post("/{file_id}")
-async def embed_and_store(file_id: str):
-    logger.info(f"Embedding request: {file_id}")
     text_path = os.path.join(EXTRACT_DIR, f"{file_id}.txt")
 
     if not os.path.exists(text_path):
         raise HTTPException(status_code=404, detail="Extracted text not found")
 
     # Read extracted text
-    with open(text_path, "r", encoding="utf-8") as f:
+    with open(text_path, "r", encoding="utf-8", newline="") as f:
         text = f.read()
 
-    # Chunk text
-    chunks = chunk_text(text)
+    # Chunk text on sentence / paragraph / page boundaries, sized in tokens
+    with INGEST_STAGE_SECONDS.time(stage="chunking"):
+        chunks = list(chunk_document(text, load_page_offsets(text_path)))
+    logger.info("📦 Total chunks created: %d", len(chunks))
 
-    collection = get_collection()
-
-    ids, embeddings, documents, metadatas = [], [], [], []
-
-    for i, chunk in enumerate(chunks):
-        vector = generate_embedding(chunk)
-        ids.append(f"{file_id}_chunk_{i}")
-        embeddings.append(vector)
-        documents.append(chunk)
-        metadatas.append({
-            "file_id": file_id,
-            "chunk_id": i
-        })
-
-    # Store in Chroma
-    collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        documents=documents,
-        metadatas=metadatas
-    )
-
-    # ---------------- UPDATE DB embedding_status = True -----------------
-    db = SessionLocal()
-    record = db.query(FileInfo).filter(FileInfo.file_id == file_id).first()
-
-    if record:
-        record.embedding_status = True
-        db.commit()
+    # Embed only new / changed chunks, then switch the file to the new vector generation
+    stats = index_chunks(file_id, chunks, progress=progress, full=full)
 
     # ---------------- DELETE extracted text file silently ---------------
     try:
-        if os.path.exists(text_path):
-            os.remove(text_path)    
+        for path in (text_path, pages_path(text_path)):
+            if os.path.exists(path):
+                os.remove(path)
     except Exception as e:
         # Log the error but DO NOT send to API response
-        logger.error(f"Failed to delete extracted file: {e}")
+        logger.error("Failed to delete extracted file: %s", e)
 
     return {
         "message": "Embedding completed",
         "file_id": file_id,
-        "total_chunks": len(chunks)
+        **stats,
     }
+
+
+@router.post("/{file_id}")
+async def embed_and_store(file_id: str, full: bool = False):
+    logger.info("Embedding request: %s, full=%s", file_id, full)
+    # Chunking, embedding and Chroma writes all block: run them off the event loop
+    return await run_bulk(embed_file, file_id, full=full)
@@ -3,7 +3,10 @@ from fastapi.responses import JSONResponse
 import logging
 import os
 import PyPDF2
+import fitz
 from dotenv import load_dotenv
+from backend.extraction import extract_to_file
+from backend.executors import run_bulk
 load_dotenv()
 
 router = APIRouter(prefix="/extract", tags=["Extract"])
@@ -13,9 +16,11 @@ UPLOAD_DIR = os.getenv("UPLOAD_DIR")
 EXTRACT_DIR = os.getenv("EXTRACT_DIR")
 os.makedirs(EXTRACT_DIR, exist_ok=True)
 
-@router.get("/{file_id}")
-async def extract_pdf_text(file_id: str):
-    logger.info(f"📥 Extract request for file_id={file_id}")
+def extract_text(file_id: str, progress=None):
+    """
+    Extract the PDF text to EXTRACT_DIR/{file_id}.txt.
+    `progress(pages_done, pages_total)` is called as pages are written.
+    """
     pdf_path = os.path.join(UPLOAD_DIR, f"{file_id}.pdf")
 
     # 1️⃣ Validate file exists
@@ -25,45 +30,40 @@ async def extract_pdf_text(file_id: str):
 
     extracted_path = os.path.join(EXTRACT_DIR, f"{file_id}.txt")
 
-    # 2️⃣ Extract text using PyPDF2
+    # 2️⃣ Extract page ranges in parallel, streaming pages to the text file
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
+        result = extract_to_file(pdf_path, extracted_path, progress=progress)
 
-            if len(reader.pages) == 0:
-                logger.warning("⚠️ PDF has zero pages")
-                raise HTTPException(status_code=400, detail="PDF has no pages")
+        if result["num_pages"] == 0:
+            logger.warning("⚠️ PDF has zero pages")
+            raise HTTPException(status_code=400, detail="PDF has no pages")
 
-            extracted_text = ""
-            for page in reader.pages:
-                extracted_text += page.extract_text() or ""
-        logger.info(f"📝 Text extracted: {len(extracted_text)} characters")
+        logger.info("📝 Text extracted: %s characters", result["text_length"])
 
-    except PyPDF2.errors.PdfReadError:
+    except HTTPException:
+        raise
+    except (PyPDF2.errors.PdfReadError, fitz.FileDataError):
         raise HTTPException(status_code=400, detail="PDF is encrypted or unreadable")
     except Exception as e:
         logger.exception("❌ Text extraction failed")
         raise HTTPException(status_code=500, detail=f"Error extracting text: {e}")
 
-    # 3️⃣ Save extracted text
-    with open(extracted_path, "w", encoding="utf-8") as out:
-        out.write(extracted_text)
-    logger.info(f"💾 Extracted text saved: {extracted_path}")
+    # 3️⃣ Text + per-page offsets saved by the extraction engine
+    logger.info("💾 Extracted text saved: %s", extracted_path)
 
-    # 4️⃣ Create preview (first lines or first 300 chars)
-    preview_lines = "\n".join(extracted_text.split("\n")[:20])  # first 5 lines
-    preview_chars = extracted_text[:1000]                        # first 300 chars
+    return {
+        "message": "Text extracted successfully",
+        "file_id": file_id,
+        "text_file": f"{file_id}.txt",
+        "num_pages": result["num_pages"],
+        "text_length": result["text_length"],
+        "preview_text": result["preview_text"].strip()  # 🆕 added preview
+    }
 
-    preview_text = preview_lines if len(preview_lines) > 0 else preview_chars
 
-    # 5️⃣ Return success response
-    return JSONResponse(
-        content={
-            "message": "Text extracted successfully",
-            "file_id": file_id,
-            "text_file": f"{file_id}.txt",
-            "text_length": len(extracted_text),
-            "preview_text": preview_text.strip()  # 🆕 added preview
-        }
-    )
+@router.get("/{file_id}")
+async def extract_pdf_text(file_id: str):
+    logger.info("📥 Extract request for file_id=%s", file_id)
 
+    # 4️⃣ Return success response (extraction blocks: run it off the event loop)
+    return JSONResponse(content=await run_bulk(extract_text, file_id))
@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+import os
+import logging
+from backend import ingest
+from backend.executors import run_io
+
+router = APIRouter(prefix="/ingest", tags=["Bulk Ingest"])
+logger = logging.getLogger("IngestRouter")
+
+
+# Request body
+class IngestRequest(BaseModel):
+    source: str  # directory or .zip archive, relative to INGEST_ROOT
+    workers: Optional[int] = None
+    embed_workers: Optional[int] = None
+
+
+def _resolve_source(source: str) -> str:
+    root = os.path.realpath(ingest.INGEST_ROOT)
+    path = os.path.realpath(os.path.join(root, source))
+    # Only sources inside INGEST_ROOT: the API must not read arbitrary server paths
+    if os.path.commonpath([root, path]) != root:
+        raise HTTPException(400, "source must be inside INGEST_ROOT")
+    if not os.path.exists(path):
+        raise HTTPException(404, "source not found")
+    return path
+
+
+@router.post("/")
+async def start_bulk_ingest(data: IngestRequest):
+    source = _resolve_source(data.source)
+    for value in (data.workers, data.embed_workers):
+        if value is not None and not 1 <= value <= 32:
+            raise HTTPException(400, "workers must be between 1 and 32")
+
+    run_id = ingest.start_ingest(
+        source,
+        workers=data.workers or ingest.INGEST_WORKERS,
+        embed_workers=data.embed_workers or ingest.INGEST_EMBED_WORKERS,
+    )
+    logger.info("🚚 Bulk ingest requested: run_id=%s, source=%s", run_id, source)
+    return await run_io(ingest.get_run, run_id)
+
+
+@router.get("/{run_id}")
+async def bulk_ingest_status(run_id: str):
+    run = await run_io(ingest.get_run, run_id)
+    if run is None:
+        raise HTTPException(404, "Ingest run not found")
+    return run
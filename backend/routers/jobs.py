@@ -0,0 +1,30 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+import logging
+from backend import jobs
+from backend.executors import run_io
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+logger = logging.getLogger("JobsRouter")
+
+
+# Request body
+class JobRequest(BaseModel):
+    file_id: str
+    kind: str = "ingest"  # extract | embed | ingest (extract → chunk → embed) | retention | compact (file_id ignored)
+
+
+@router.post("/")
+async def submit_job(data: JobRequest):
+    if data.kind not in jobs.JOB_KINDS:
+        raise HTTPException(400, f"kind must be one of {', '.join(jobs.JOB_KINDS)}")
+
+    return await run_io(jobs.submit_job, data.file_id, data.kind)
+
+
+@router.get("/{job_id}")
+async def job_status(job_id: str):
+    job = await run_io(jobs.get_job, job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+    return job
@@ -1,61 +1,326 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-import chromadb
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import json
 import logging
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+import time
+from backend.answer_cache import answer_cache
+from backend.resources import get_chat_model, get_embedding_engine
+from backend.partitions import get_partition, search_groups
+from backend import compact_store
+from backend import retrieval, rerank, retention
+from backend.executors import run_io
+from backend.chunking import count_tokens
+from backend.metrics import QUERY_STAGE_SECONDS, TOKENS_TOTAL
+from backend.database import SessionLocal
+from backend.models import FileInfo
+from backend.indexing import get_active_generation, get_active_generations
 
 router = APIRouter(prefix="/query", tags=["Query"])
 logger = logging.getLogger("QueryRouter")
 
-# Persistent client and collection
-chroma_client = chromadb.PersistentClient(path="chroma_db")
-collection = chroma_client.get_or_create_collection(name="pdf_collection")
-
-# Embedder
-embedder = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
-
 # Request body
 class QueryRequest(BaseModel):
     question: str
     file_id: str
+    mode: Optional[str] = None  # vector | lexical | hybrid, defaults to RETRIEVAL_MODE
+
+
+class MultiQueryRequest(BaseModel):
+    question: str
+    file_ids: Optional[List[str]] = None  # None => every embedded file
+    # Both are capped at MULTI_QUERY_CANDIDATES, the number of nearest chunks ranked per search
+    top_k: Optional[int] = Field(None, ge=1, le=retrieval.MULTI_CANDIDATES)     # chunks in the context, defaults to MULTI_QUERY_TOP_K
+    per_file: Optional[int] = Field(None, ge=1, le=retrieval.MULTI_CANDIDATES)  # max chunks from one file, defaults to MULTI_QUERY_PER_FILE
+
+
+def build_prompt(context: str, question: str, history: str = "") -> str:
+    # /chat passes the conversation so far; plain queries get exactly the same prompt as before
+    conversation = f"""
+    CONVERSATION SO FAR (for understanding the question only, not a source of facts):
+    {history}
+    -----------------------------
+""" if history else ""
+    return f"""
+    You are an expert AI assistant designed to answer user questions strictly using the provided context.
+
+    Follow these rules:
+    1. Use ONLY the information present in the context.
+    2. Do NOT add assumptions, external knowledge, or invented details.
+    3. If the answer is not found in the context, reply with:
+    "The information you requested is not available in the document."
+    4. Keep the answer concise (4–5 lines), clear, and user-friendly.
+    5. Maintain accuracy and avoid repetition.
+
+    -----------------------------
+    CONTEXT:
+    {context}
+    -----------------------------
+{conversation}
+    USER QUESTION:
+    {question}
+
+    Now provide the best possible answer based only on the context.
+    """
+
+
+def search_target(file_id: str):
+    """
+    (generation, collection, shared) to search `file_id` in: its compact
+    store index if the active generation lives there, else its Chroma
+    partition.
+    """
+    # Feeds the unused-since retention rule (one DB write per file per RETENTION_USAGE_RESOLUTION)
+    retention.mark_used([file_id])
+    # Read once per query: a re-index switching generations mid-query cannot mix old and new chunks
+    generation = get_active_generation(file_id)
+    compact = compact_store.load(file_id, generation)
+    if compact is not None:
+        return generation, compact, False
+    partition = get_partition(file_id)
+    return generation, partition.collection, partition.shared
+
+
+def candidate_count() -> int:
+    """Candidates retrieved per query: more when reranking packs them afterwards."""
+    return rerank.RERANK_CANDIDATES if rerank.RERANK_ENABLED else retrieval.RETRIEVAL_TOP_K
+
+
+def check_mode(mode: Optional[str]) -> str:
+    mode = mode or retrieval.RETRIEVAL_MODE
+    if mode not in retrieval.MODES:
+        raise HTTPException(400, f"mode must be one of {', '.join(retrieval.MODES)}")
+    return mode
+
+
+def pack_context(question: str, ids, documents, metadatas):
+    """Candidates -> (chunk ids, passages) for the prompt, reranked when RERANK_ENABLED."""
+    if rerank.RERANK_ENABLED:
+        with QUERY_STAGE_SECONDS.time(stage="rerank"):
+            passages = rerank.rerank(question, ids, documents, metadatas)
+        ids = [chunk_id for passage in passages for chunk_id in passage.chunk_ids]
+        documents = [passage.text for passage in passages]
+    return ids, documents
+
+
+def retrieve(data: QueryRequest, query_embedding=None):
+    """
+    Context for the prompt as (chunk ids, passages, query_embedding); 404
+    if the file has no embeddings. With reranking on, more candidates are
+    fetched and packed into CONTEXT_TOKEN_BUDGET tokens.
+    """
+    mode = check_mode(data.mode)
+    generation, collection, shared = search_target(data.file_id)
+    ids, documents, metadatas, query_embedding = retrieval.retrieve_candidates(
+        collection,
+        data.file_id,
+        data.question,
+        embed_query=get_embedding_engine().embed_query,
+        mode=mode,
+        top_k=candidate_count(),
+        query_embedding=query_embedding,
+        generation=generation,
+        shared=shared,
+    )
+
+    if not documents:
+        raise HTTPException(404, "No embeddings found for this file.")
+
+    ids, documents = pack_context(data.question, ids, documents, metadatas)
+    return ids, documents, query_embedding
+
+
+def embed_for_cache(data: QueryRequest):
+    """
+    Question embedding for near-duplicate cache lookups. Skipped when the
+    lexical fast path would not embed the question anyway.
+    """
+    if not (answer_cache and answer_cache.similarity_enabled):
+        return None
+    if (data.mode or retrieval.RETRIEVAL_MODE) == "lexical":
+        return None
+    with QUERY_STAGE_SECONDS.time(stage="embed_question"):
+        return get_embedding_engine().embed_query(data.question)
+
+
+def cache_scope(data: QueryRequest) -> str:
+    """Retrieval settings an answer depends on; part of its answer cache key."""
+    mode = check_mode(data.mode)
+    if rerank.RERANK_ENABLED:
+        return f"{mode}:rerank:{rerank.RERANK_CANDIDATES}:{rerank.CONTEXT_TOKEN_BUDGET}:{rerank.RERANK_MAX_PASSAGES}"
+    return f"{mode}:top{retrieval.RETRIEVAL_TOP_K}"
+
+
+def cache_generation(file_id: str) -> int:
+    """
+    Active generation to validate cached answers against, read from the
+    shared DB so re-embeds and deletes by other workers count; 0 (no lookup)
+    without a cache.
+    """
+    return get_active_generation(file_id) if answer_cache else 0
+
+
+def cached_answer(file_id: str, question: str, scope: str, generation: int, query_embedding=None):
+    """Exact match (no embedding yet) or near-duplicate match (with embedding)."""
+    # Generation 0: deleted or not embedded, never served from the cache
+    if not answer_cache or not generation:
+        return None
+
+    if query_embedding is None:
+        cached = answer_cache.get(file_id, question, scope, generation)
+        if cached is not None:
+            logger.info("♻️ Answer served from cache")
+        return cached
+
+    cached = answer_cache.get_similar(file_id, query_embedding, scope, generation)
+    if cached is not None:
+        logger.info("♻️ Answer served from cache (similar question)")
+    return cached
+
 
 @router.post("/")
-async def query_pdf(data: QueryRequest):
-    logger.info(f"🔎 Query received: file_id={data.file_id}, question={data.question}")
+async def query_pdf(data: QueryRequest, model=Depends(get_chat_model)):
+    logger.info("🔎 Query received: file_id=%s, question=%.200s", data.file_id, data.question)
     question = data.question
     file_id = data.file_id
+    started = time.perf_counter()
+    scope = cache_scope(data)
+    generation = await run_io(cache_generation, file_id)
 
-    # 1️⃣ Embed the question
-    query_embedding = embedder.embed_query(question)
+    # 0️⃣ Same question on the same file generation and retrieval settings => cached answer
+    cached = cached_answer(file_id, question, scope, generation)
+    if cached is not None:
+        return {"answer": cached, "cached": True}
 
-    # 2️⃣ Run similarity search WITHOUT relying on chunk-specific IDs
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=3,
-        where={"file_id": file_id}  # Only main file_id
-    )
+    # 1️⃣ Embed the question (served from the embedding cache when repeated)
+    query_embedding = await run_io(embed_for_cache, data)
 
-    documents_list = results.get("documents", [])
-    metadatas_list = results.get("metadatas", [])
+    # Near-duplicate question => cached answer
+    if query_embedding is not None:
+        cached = cached_answer(file_id, question, scope, generation, query_embedding)
+        if cached is not None:
+            return {"answer": cached, "cached": True}
+    if answer_cache:
+        answer_cache.record_miss()
 
-    if not documents_list or not documents_list[0]:
-        raise HTTPException(404, "No embeddings found for this file.")
+    # 2️⃣ Hybrid (vector + BM25) search restricted to this file (Chroma / SQLite are blocking)
+    _, documents, query_embedding = await run_io(retrieve, data, query_embedding)
 
     # 3️⃣ Build context from retrieved chunks
-    context = "\n\n".join(documents_list[0])
+    context = "\n\n".join(documents)
 
     # 4️⃣ Call LLM with context
-    model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
-    prompt = f"""
-    You are an expert AI assistant designed to answer user questions strictly using the provided context.
+    prompt = build_prompt(context, question)
+
+    with QUERY_STAGE_SECONDS.time(stage="llm"):
+        llm_response = await model.ainvoke(prompt)
+    answer = llm_response.content
+    TOKENS_TOTAL.inc(count_tokens(prompt), kind="prompt")
+    TOKENS_TOTAL.inc(count_tokens(answer), kind="answer")
+
+    # Stored under the generation read before retrieval: if a re-index flipped in between, the
+    # entry is already stale and the next lookup drops it
+    if answer_cache and generation:
+        answer_cache.put(file_id, question, answer, time.perf_counter() - started, embedding=query_embedding,
+                         scope=scope, generation=generation)
+
+    # 5️⃣ Return answer
+
+    return {
+        "answer": answer,
+        "cached": False
+    }
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/stream")
+async def query_pdf_stream(data: QueryRequest, model=Depends(get_chat_model)):
+    """
+    Same as POST /query/ but answers as Server-Sent Events:
+    `context` (retrieved chunk ids) first, then one `token` event per
+    generated piece of text, then `done`.
+    """
+    logger.info("🔎 Streaming query received: file_id=%s, question=%.200s", data.file_id, data.question)
+    question = data.question
+    file_id = data.file_id
+    started = time.perf_counter()
+    scope = cache_scope(data)
+    generation = await run_io(cache_generation, file_id)
+
+    cached = cached_answer(file_id, question, scope, generation)
+    query_embedding = None
+    chunk_ids = []
+
+    if cached is None:
+        query_embedding = await run_io(embed_for_cache, data)
+        if query_embedding is not None:
+            cached = cached_answer(file_id, question, scope, generation, query_embedding)
+        if cached is None and answer_cache:
+            answer_cache.record_miss()
+
+    # Retrieval happens before the stream opens so a missing file is still a plain 404
+    if cached is None:
+        chunk_ids, documents, query_embedding = await run_io(retrieve, data, query_embedding)
+        prompt = build_prompt("\n\n".join(documents), question)
+
+    async def events():
+        yield sse_event("context", {"chunk_ids": chunk_ids, "cached": cached is not None})
+
+        if cached is not None:
+            yield sse_event("token", {"text": cached})
+            yield sse_event("done", {"cached": True})
+            return
+
+        parts = []
+        llm_started = time.perf_counter()
+        stream = model.astream(prompt)
+        try:
+            async for chunk in stream:
+                if chunk.content:
+                    if not parts:
+                        QUERY_STAGE_SECONDS.observe(time.perf_counter() - llm_started, stage="llm_first_token")
+                    parts.append(chunk.content)
+                    yield sse_event("token", {"text": chunk.content})
+        except Exception as e:
+            logger.exception("❌ Streaming LLM call failed")
+            yield sse_event("error", {"detail": str(e)})
+            return
+        finally:
+            # The client may have gone away mid-answer: stop the LLM call instead of leaving it running
+            await stream.aclose()
+        QUERY_STAGE_SECONDS.observe(time.perf_counter() - llm_started, stage="llm")
+        TOKENS_TOTAL.inc(count_tokens(prompt), kind="prompt")
+        TOKENS_TOTAL.inc(count_tokens("".join(parts)), kind="answer")
+
+        if answer_cache and generation:
+            answer_cache.put(file_id, question, "".join(parts), time.perf_counter() - started,
+                             embedding=query_embedding, scope=scope, generation=generation)
+        yield sse_event("done", {"cached": False})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def build_multi_prompt(context: str, question: str) -> str:
+    return f"""
+    You are an expert AI assistant answering a question across several documents, strictly using the provided context.
 
     Follow these rules:
     1. Use ONLY the information present in the context.
     2. Do NOT add assumptions, external knowledge, or invented details.
-    3. If the answer is not found in the context, reply with:
-    "The information you requested is not available in the document."
-    4. Keep the answer concise (4–5 lines), clear, and user-friendly.
-    5. Maintain accuracy and avoid repetition.
+    3. Every context passage starts with a source number like [2] and its file and page.
+       Cite the source number after each statement it supports, e.g. "Payment is due in 30 days [2]."
+    4. If documents disagree, say so and cite each of them.
+    5. If the answer is not found in the context, reply with:
+    "The information you requested is not available in the documents."
+    6. Keep the answer concise, clear, and user-friendly.
 
     -----------------------------
     CONTEXT:
@@ -65,18 +330,129 @@ async def query_pdf(data: QueryRequest):
     USER QUESTION:
     {question}
 
-    Now provide the best possible answer based only on the context.
+    Now provide the best possible answer based only on the context, with citations.
+    """
+
+
+def search_targets(file_ids):
+    """
+    [(collection, file_ids to filter on or None)] for a multi-document
+    query: one search per Chroma partition holding any of the files (a
+    single one with VECTOR_LAYOUT=single), plus one per file generation in
+    the compact store. 400 when that is more than MULTI_QUERY_MAX_SEARCHES,
+    e.g. every file with VECTOR_LAYOUT=file.
+    """
+    generations = {}
+    if compact_store.in_use():
+        with SessionLocal() as db:
+            query = db.query(FileInfo.file_id, FileInfo.active_generation).filter(FileInfo.active_generation > 0)
+            if file_ids is not None:
+                query = query.filter(FileInfo.file_id.in_(file_ids))
+            generations = dict(query.all())
+    # Checked before any compact index is opened
+    _check_fan_out(len(generations))
+
+    compact = {}
+    for file_id, generation in generations.items():
+        index = compact_store.load(file_id, generation)
+        if index is not None:
+            compact[file_id] = index
+
+    targets = [(index, None) for index in compact.values()]
+    if file_ids is None:
+        targets += [(partition.collection, None) for partition, _ in search_groups(None)]
+    else:
+        remaining = [file_id for file_id in file_ids if file_id not in compact]
+        if remaining:
+            targets += [(partition.collection, ids) for partition, ids in search_groups(remaining)]
+    _check_fan_out(len(targets))
+    return targets
+
+
+def _check_fan_out(searches: int):
+    if searches > retrieval.MULTI_MAX_SEARCHES:
+        raise HTTPException(
+            400,
+            f"This query would run {searches} searches (limit {retrieval.MULTI_MAX_SEARCHES}); "
+            "pass fewer file_ids or raise MULTI_QUERY_MAX_SEARCHES.",
+        )
+
+
+def retrieve_multi(data: MultiQueryRequest):
+    """Chunks across the requested files plus one citation per chunk; 404 if none match."""
+    ids, documents, metadatas, _ = retrieval.retrieve_multi_groups(
+        search_targets(data.file_ids),
+        data.question,
+        embed_query=get_embedding_engine().embed_query,
+        top_k=data.top_k or retrieval.MULTI_TOP_K,
+        per_file=data.per_file or retrieval.MULTI_PER_FILE,
+        active_generations=get_active_generations,
+    )
+
+    if not documents:
+        raise HTTPException(404, "No embeddings found for these files.")
+
+    file_ids = {metadata.get("file_id") for metadata in metadatas}
+    retention.mark_used(file_ids)
+    with SessionLocal() as db:
+        names = dict(
+            db.query(FileInfo.file_id, FileInfo.file_name).filter(FileInfo.file_id.in_(file_ids)).all()
+        )
+
+    citations = [
+        {
+            "ref": i + 1,
+            "chunk_id": chunk_id,
+            "file_id": metadata.get("file_id"),
+            "file_name": names.get(metadata.get("file_id")),
+            "page": metadata.get("page"),
+        }
+        for i, (chunk_id, metadata) in enumerate(zip(ids, metadatas))
+    ]
+    return documents, citations
+
+
+@router.post("/multi")
+async def query_multiple_pdfs(data: MultiQueryRequest, model=Depends(get_chat_model)):
+    """
+    One question over a set of files (or all of them): a single vector
+    search, capped per file, and a single LLM call whose answer cites
+    [n] sources listed in `citations`.
     """
-    
-    llm_response = model.invoke(prompt)
+    if data.file_ids is not None and not data.file_ids:
+        raise HTTPException(400, "file_ids must not be empty (omit it to query every file)")
+
+    scope = "all files" if data.file_ids is None else f"{len(data.file_ids)} file(s)"
+    logger.info("🔎 Multi-document query received: %s, question=%.200s", scope, data.question)
+
+    # 1️⃣ + 2️⃣ Embed the question, one `$in`-filtered vector search, cap per file
+    documents, citations = await run_io(retrieve_multi, data)
+
+    # 3️⃣ Build numbered context so the answer can cite file + page
+    context = "\n\n".join(
+        f"[{c['ref']}] {c['file_name'] or c['file_id']}"
+        + (f", page {c['page']}" if c["page"] is not None else "")
+        + f"\n{document}"
+        for c, document in zip(citations, documents)
+    )
+
+    # 4️⃣ Single LLM call for all documents
+    prompt = build_multi_prompt(context, data.question)
+    with QUERY_STAGE_SECONDS.time(stage="llm"):
+        llm_response = await model.ainvoke(prompt)
     answer = llm_response.content
+    TOKENS_TOTAL.inc(count_tokens(prompt), kind="prompt")
+    TOKENS_TOTAL.inc(count_tokens(answer), kind="answer")
 
-    # 5️⃣ Return answer
-    
+    # 5️⃣ Return answer with its sources
     return {
-        "answer": answer
+        "answer": answer,
+        "citations": citations,
     }
 
 
-    
-
+@router.get("/cache_stats")
+def answer_cache_stats():
+    if not answer_cache:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
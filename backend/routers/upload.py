@@ -1,10 +1,18 @@
-from fastapi import UploadFile, File, HTTPException, APIRouter, Depends
+from fastapi import UploadFile, File, HTTPException, APIRouter, Depends, Query
 from fastapi.responses import JSONResponse
-import uuid, os, logging, fitz
+import uuid, os, logging, fitz, hashlib, time, base64, json
 from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from backend.database import SessionLocal, get_db
 from backend.models import FileInfo
+from backend.embedding_providers import embedded_clause, is_embedded
+from backend.executors import run_bulk, run_io
+from backend import jobs, retention
+from backend.metrics import INGEST_STAGE_SECONDS
 import os
 from dotenv import load_dotenv
 
@@ -16,80 +24,377 @@ logger = logging.getLogger("UploadRouter")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "200"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Multipart framing around the PDF bytes (boundaries, part headers, file name)
+MULTIPART_OVERHEAD = 64 * 1024
 
-@router.post("/upload_file")
-async def upload_pdf(file: UploadFile = File(...)):
-    db = SessionLocal()
+FILE_LIST_PAGE_SIZE = int(os.getenv("FILE_LIST_PAGE_SIZE", "50"))
+FILE_LIST_MAX_PAGE_SIZE = int(os.getenv("FILE_LIST_MAX_PAGE_SIZE", "500"))
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
 
-    file_name = file.filename  # <---- SEARCH BASED ON THIS
 
-    # ✅ 1. Check if file already exists by file_name
-    existing_file = db.query(FileInfo).filter(FileInfo.file_name == file_name).first()
+def _existing_response(existing_file: FileInfo):
+    # Embedded with another provider = not in the current collection yet
+    embedded = is_embedded(existing_file)
+    return {
+        "message": "File already exists",
+        "file_id": existing_file.file_id,
+        "file_name": existing_file.file_name,
+        "num_pages": existing_file.num_pages,
+        "embedding_status": embedded,
+        "redirect_to": (
+            "query"
+            if embedded
+            else "extract"
+        )
+    }
+
 
+def _find_duplicate(db: Session, file_name: str, content_hash: str):
+    existing_file = db.query(FileInfo).filter(FileInfo.content_hash == content_hash).first()
     if existing_file:
-        return {
-            "message": "File already exists",
-            "file_id": existing_file.file_id,
-            "file_name": existing_file.file_name,
-            "embedding_status": existing_file.embedding_status,
-            "redirect_to": (
-                "query"
-                if existing_file.embedding_status
-                else "extract"
-            )
-        }
-
-    # ---------- File does NOT exist → upload normally ---------- #
+        return existing_file
 
-    file_id = str(uuid.uuid4())
-    file_path = os.path.join(UPLOAD_DIR, f"{file_id}.pdf")
+    # Rows from before content hashing: hash the stored PDF once, on demand
+    legacy = db.query(FileInfo).filter(FileInfo.file_name == file_name, FileInfo.content_hash.is_(None)).all()
+    for row in legacy:
+        pdf_path = os.path.join(UPLOAD_DIR, f"{row.file_id}.pdf")
+        if not os.path.exists(pdf_path):
+            continue
+        row.content_hash = file_sha256(pdf_path)
+        db.commit()
+        if row.content_hash == content_hash:
+            return row
+    return None
 
-    # Save file
-    contents = await file.read()
-    if len(contents) == 0:
-        raise HTTPException(400, "Empty PDF uploaded")
 
-    with open(file_path, "wb") as f:
-        f.write(contents)
+def register_pdf(db: Session, tmp_path: str, file_name: str, content_hash: str, file_size: int):
+    """
+    Turn a fully written temp file into a stored PDF + FileInfo row, or
+    short-circuit to the existing file_id when the same bytes were uploaded before.
+    """
+    # ✅ 1. Check if the same content already exists (under any name)
+    existing_file = _find_duplicate(db, file_name, content_hash)
+    if existing_file:
+        os.remove(tmp_path)
+        logger.info("♻️ Duplicate upload of %s, reusing file_id=%s", file_name, existing_file.file_id)
+        return _existing_response(existing_file)
+
+    # ---------- File does NOT exist → store it ---------- #
+
+    file_id = str(uuid.uuid4())
+    file_path = os.path.join(UPLOAD_DIR, f"{file_id}.pdf")
+    os.replace(tmp_path, file_path)
 
     # Extract metadata safely
-    pdf = fitz.open(file_path)
-    num_pages = pdf.page_count
-    pdf.close()
+    try:
+        with INGEST_STAGE_SECONDS.time(stage="page_count"):
+            pdf = fitz.open(file_path)
+            num_pages = pdf.page_count
+            pdf.close()
+    except Exception:
+        os.remove(file_path)
+        raise HTTPException(400, "Uploaded file is not a readable PDF")
+
+    uploaded_at = datetime.utcnow()
 
     # Save record into DB
     new_entry = FileInfo(
         file_id=file_id,
         file_name=file_name,
-        num_pages=num_pages,    
-        uploaded_at=datetime.utcnow().isoformat(),
-        embedding_status=False  # default
-        
+        num_pages=num_pages,
+        uploaded_at=uploaded_at,
+        embedding_status=False,  # default
+        content_hash=content_hash,
+        file_size=file_size,
     )
     db.add(new_entry)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Same bytes uploaded concurrently: keep the row that won
+        db.rollback()
+        os.remove(file_path)
+        existing_file = db.query(FileInfo).filter(FileInfo.content_hash == content_hash).first()
+        return _existing_response(existing_file)
 
     return {
         "message": "PDF uploaded successfully",
         "file_id": file_id,
         "file_name": file_name,
         "num_pages": num_pages,
-        "uploaded_at": datetime.utcnow().isoformat(),
+        "uploaded_at": uploaded_at,
         "embedding_status": False,
         "redirect_to": "extract"
     }
 
+
+class UploadSizeLimit:
+    """
+    ASGI middleware rejecting /upload bodies over MAX_UPLOAD_MB with 413
+    before Starlette spools the multipart body to its own temp file: up
+    front from Content-Length, or (chunked uploads) as soon as the bytes
+    received pass the limit. `_stream_to_temp` still enforces the exact
+    limit on the PDF itself.
+    """
+
+    def __init__(self, app, max_bytes: int = None):
+        self.app = app
+        self.max_bytes = max_bytes or MAX_UPLOAD_MB * 1024 * 1024 + MULTIPART_OVERHEAD
+
+    def _too_large(self):
+        return HTTPException(413, f"PDF exceeds the {MAX_UPLOAD_MB} MB upload limit")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT") or not scope["path"].startswith(router.prefix):
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            logger.warning("⚠️ Upload rejected: Content-Length %s over the %s MB limit", length.decode(), MAX_UPLOAD_MB)
+            error = self._too_large()
+            response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside body parsing: FastAPI turns it into the 413 response
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _temp_path():
+    return os.path.join(UPLOAD_DIR, f".{uuid.uuid4()}.part")
+
+
+async def _stream_to_temp(file: UploadFile):
+    """Write the upload to a temp file in UPLOAD_DIR; returns (tmp_path, sha256, size)."""
+    max_bytes = MAX_UPLOAD_MB * 1024 * 1024
+
+    # Stream to disk in chunks while hashing => flat memory for any PDF size
+    tmp_path = _temp_path()
+    sha = hashlib.sha256()
+    size = 0
+    started = time.perf_counter()
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                block = await file.read(UPLOAD_CHUNK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise HTTPException(413, f"PDF exceeds the {MAX_UPLOAD_MB} MB upload limit")
+                sha.update(block)
+                await run_io(out.write, block)
+
+        if size == 0:
+            raise HTTPException(400, "Empty PDF uploaded")
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    INGEST_STAGE_SECONDS.observe(time.perf_counter() - started, stage="upload_write")
+    return tmp_path, sha.hexdigest(), size
+
+
+@router.post("/upload_file")
+async def upload_pdf(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    tmp_path, content_hash, size = await _stream_to_temp(file)
+
+    # DB lookups, the rename and fitz page counting all block
+    return await run_io(register_pdf, db, tmp_path, file.filename, content_hash, size)
+
+
+def replace_pdf(db: Session, file_id: str, tmp_path: str, file_name: str, content_hash: str, file_size: int):
+    """
+    Swap in a new version of an existing file under the same file_id.
+    Queries keep using the old vectors until the file is re-embedded,
+    which only embeds the chunks that changed.
+    """
+    record = db.query(FileInfo).filter(FileInfo.file_id == file_id).first()
+    if record is None:
+        os.remove(tmp_path)
+        raise HTTPException(404, "File not found")
+
+    if record.content_hash == content_hash:
+        os.remove(tmp_path)
+        return {**_existing_response(record), "message": "File unchanged"}
+
+    other = db.query(FileInfo).filter(FileInfo.content_hash == content_hash).first()
+    if other is not None:
+        os.remove(tmp_path)
+        raise HTTPException(409, f"This content is already stored as file_id={other.file_id}")
+
+    try:
+        with INGEST_STAGE_SECONDS.time(stage="page_count"):
+            with fitz.open(tmp_path) as pdf:
+                num_pages = pdf.page_count
+    except Exception:
+        os.remove(tmp_path)
+        raise HTTPException(400, "Uploaded file is not a readable PDF")
+
+    os.replace(tmp_path, os.path.join(UPLOAD_DIR, f"{file_id}.pdf"))
+    record.file_name = file_name or record.file_name
+    record.num_pages = num_pages
+    record.content_hash = content_hash
+    record.file_size = file_size
+    record.uploaded_at = datetime.utcnow()
+    db.commit()
+    logger.info("📝 Replaced PDF content: file_id=%s, pages=%s", file_id, num_pages)
+
+    return {
+        "message": "PDF replaced, re-extract and re-embed to update answers",
+        "file_id": file_id,
+        "file_name": record.file_name,
+        "num_pages": num_pages,
+        "uploaded_at": record.uploaded_at,
+        "embedding_status": is_embedded(record),
+        "redirect_to": "extract"
+    }
+
+
+@router.put("/{file_id}")
+async def replace_uploaded_pdf(file_id: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    tmp_path, content_hash, size = await _stream_to_temp(file)
+    return await run_io(replace_pdf, db, file_id, tmp_path, file.filename, content_hash, size)
+
+
+def store_pdf(src_path: str, file_name: str = None):
+    """Copy a local PDF into UPLOAD_DIR the same way /upload/upload_file does."""
+    file_name = file_name or os.path.basename(src_path)
+    size = os.path.getsize(src_path)
+    if size == 0:
+        raise HTTPException(400, "Empty PDF uploaded")
+    if size > MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(413, f"PDF exceeds the {MAX_UPLOAD_MB} MB upload limit")
+
+    tmp_path = _temp_path()
+    sha = hashlib.sha256()
+    try:
+        with open(src_path, "rb") as src, open(tmp_path, "wb") as out:
+            for block in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+                sha.update(block)
+                out.write(block)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    with SessionLocal() as db:
+        return register_pdf(db, tmp_path, file_name, sha.hexdigest(), size)
+
+def _encode_cursor(record: FileInfo) -> str:
+    raw = json.dumps([record.uploaded_at.isoformat(), record.file_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        uploaded_at, file_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(uploaded_at), str(file_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def _file_summary(f: FileInfo):
+    return {
+        "file_id": f.file_id,
+        "file_name": f.file_name,
+        "num_pages": f.num_pages,
+        "uploaded_at": f.uploaded_at,
+        "last_used_at": f.last_used_at,
+        "embedding_status": is_embedded(f),
+    }
+
+
+def list_files_page(db: Session, limit: int = FILE_LIST_PAGE_SIZE, cursor: str = None,
+                    embedded: bool = None, name_prefix: str = None):
+    """
+    One page of files, newest first. Keyset pagination on (uploaded_at, file_id):
+    every page is an index range scan, however deep, and rows added meanwhile
+    do not shift later pages.
+    """
+    query = db.query(FileInfo)
+    if embedded is not None:
+        clause = embedded_clause()
+        query = query.filter(clause if embedded else ~clause)
+    if name_prefix:
+        # Range instead of LIKE: served by the file_name index (case-sensitive)
+        query = query.filter(FileInfo.file_name >= name_prefix, FileInfo.file_name < name_prefix + "\U0010ffff")
+    if cursor:
+        query = query.filter(tuple_(FileInfo.uploaded_at, FileInfo.file_id) < _decode_cursor(cursor))
+
+    # One extra row tells whether another page follows
+    rows = query.order_by(FileInfo.uploaded_at.desc(), FileInfo.file_id.desc()).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "files": [_file_summary(f) for f in rows],
+        "next_cursor": _encode_cursor(rows[-1]) if more else None,
+    }
+
+
 @router.get("/list_files")
-def list_files(db: Session = Depends(get_db)):
-    files = db.query(FileInfo).all()
-
-    return [
-        {
-            "file_id": f.file_id,
-            "file_name": f.file_name,
-            "num_pages": f.num_pages,
-            "uploaded_at": f.uploaded_at,
-            "embedding_status": f.embedding_status,
-        }
-        for f in files
-    ]
\ No newline at end of file
+def list_files(
+    limit: int = Query(FILE_LIST_PAGE_SIZE, ge=1, le=FILE_LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    embedded: Optional[bool] = None,
+    name_prefix: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    return list_files_page(db, limit, cursor, embedded, name_prefix)
+
+
+@router.delete("/{file_id}")
+async def delete_uploaded_file(file_id: str):
+    """Delete the file: its row, PDF, extracted text, vectors and indexes of every generation."""
+    result = await run_bulk(retention.delete_files, [file_id])
+    if not result["deleted"]:
+        raise HTTPException(404, "File not found")
+    return {
+        "message": "File deleted",
+        "file_id": file_id,
+        "chunks_deleted": result["chunks_deleted"],
+        "bytes_freed": result["bytes_freed"],
+    }
+
+
+# Request body
+class RetentionRequest(BaseModel):
+    max_age_days: Optional[float] = None  # defaults to RETENTION_MAX_AGE_DAYS, 0 = rule off
+    unused_days: Optional[float] = None   # defaults to RETENTION_UNUSED_DAYS, 0 = rule off
+    dry_run: bool = False                 # only list the files that would be deleted
+    compact: bool = True                  # reclaim space once the files are deleted
+
+
+@router.post("/retention")
+async def run_retention(data: RetentionRequest):
+    """Delete expired files in a background job (`dry_run` answers right away with the list)."""
+    if data.dry_run:
+        return await run_io(retention.apply_retention, data.max_age_days, data.unused_days, dry_run=True)
+
+    params = {"max_age_days": data.max_age_days, "unused_days": data.unused_days, "compact_after": data.compact}
+    return await run_io(jobs.submit_job, "*", "retention", params)
+
+
+@router.post("/compact")
+async def run_compaction():
+    """Garbage-collect vectors / index files of deleted files and reclaim SQLite space, in a background job."""
+    return await run_io(jobs.submit_job, "*", "compact")
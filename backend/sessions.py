@@ -0,0 +1,328 @@
+"""
+Conversation state for /chat: per-session history, follow-up rewriting and
+the previous turn's retrieval candidates.
+
+- the last CHAT_HISTORY_TURNS turns go into the prompt as they are, older
+  turns are folded into a short extractive summary capped at
+  CHAT_SUMMARY_TOKENS, so the prompt stops growing after a few turns
+- a follow-up ("and the penalty?", "what about it in 2023?") is rewritten
+  into a standalone question before retrieval: heuristically by default,
+  by the chat model with CHAT_REWRITE=llm
+- the candidates retrieved for the last turn are kept, so a follow-up whose
+  BM25 top-k mostly overlaps them can skip the embedding call and the
+  vector search (see routers/chat.py)
+
+Sessions live in memory (LRU + TTL) or, with CHAT_SESSION_STORE=sqlite, in
+the app database so every uvicorn worker sees the same conversation.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dotenv import load_dotenv
+from backend.database import SessionLocal
+from backend.models import ChatSessionRecord
+
+load_dotenv()
+
+logger = logging.getLogger("ChatSessions")
+
+CHAT_SESSION_STORE = os.getenv("CHAT_SESSION_STORE", "memory")  # memory | sqlite
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "3600"))
+# Turns quoted verbatim in the prompt; older ones only survive in the summary
+CHAT_HISTORY_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "3"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "200"))
+# Words of an answer kept when quoting a recent turn / summarizing an old one
+CHAT_ANSWER_TOKENS = int(os.getenv("CHAT_ANSWER_TOKENS", "120"))
+CHAT_SUMMARY_ANSWER_TOKENS = int(os.getenv("CHAT_SUMMARY_ANSWER_TOKENS", "25"))
+CHAT_REWRITE = os.getenv("CHAT_REWRITE", "heuristic")  # heuristic | llm | off
+# Share of the follow-up's BM25 top-k already among the last turn's candidates to reuse them
+CHAT_REUSE_OVERLAP = float(os.getenv("CHAT_REUSE_OVERLAP", "0.6"))
+
+# Terms of the previous question carried into a rewritten follow-up
+_REWRITE_MAX_TERMS = 8
+# A question with this few content words leans on the conversation ("and in 2023?")
+_FOLLOW_UP_MAX_TERMS = 1
+
+_WORD = re.compile(r"\w+(?:[-./]\w+)*")
+_FOLLOW_UP_OPENERS = re.compile(
+    r"^\s*(and|also|but|so|then|what about|how about|what else|why|how so|same for|more on|tell me more)\b",
+    re.IGNORECASE,
+)
+_REFERENCES = {
+    "it", "its", "they", "them", "their", "theirs", "this", "that", "these", "those", "he", "she", "him",
+    "her", "his", "there", "former", "latter", "above", "same", "one", "ones",
+}
+_STOPWORDS = _REFERENCES | {
+    "a", "an", "the", "and", "or", "but", "so", "then", "also", "of", "to", "in", "on", "at", "for", "by",
+    "with", "from", "about", "as", "into", "is", "are", "was", "were", "be", "been", "do", "does", "did",
+    "can", "could", "would", "should", "will", "what", "which", "who", "whom", "when", "where", "why",
+    "how", "me", "my", "i", "you", "your", "we", "our", "tell", "more", "else", "any", "some", "there",
+    "too", "please", "explain", "describe", "give", "say", "says", "said", "document", "pdf", "file",
+}
+
+
+def content_terms(text: str):
+    """Lowercased words of `text` that carry meaning, in order, without duplicates."""
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word not in _STOPWORDS and len(word) > 1 and word not in terms:
+            terms.append(word)
+    return terms
+
+
+def _clip(text: str, max_words: int) -> str:
+    words = text.split()
+    if len(words) <= max_words:
+        return text.strip()
+    return " ".join(words[:max_words]) + " …"
+
+
+class ChatSession:
+    """One conversation about one file."""
+
+    def __init__(self, session_id: str, file_id: str, turns=None, summary=None, turn_count: int = 0,
+                 candidates=None, updated_at: float = 0.0):
+        self.session_id = session_id
+        self.file_id = file_id
+        self.turns = turns or []        # [{"question", "standalone", "answer"}], the last CHAT_HISTORY_TURNS
+        self.summary = summary or []    # one line per older turn, oldest first
+        self.turn_count = turn_count
+        # Last turn's retrieval candidates: {"generation", "ids", "documents", "metadatas"}
+        self.candidates = candidates
+        self.updated_at = updated_at or time.time()
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "file_id": self.file_id,
+            "turns": self.turns,
+            "summary": self.summary,
+            "turn_count": self.turn_count,
+            "candidates": self.candidates,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def add_turn(self, question: str, standalone: str, answer: str):
+        """Record a turn; turns beyond CHAT_HISTORY_TURNS move into the summary."""
+        self.turns.append({"question": question, "standalone": standalone, "answer": answer})
+        self.turn_count += 1
+        while len(self.turns) > CHAT_HISTORY_TURNS:
+            old = self.turns.pop(0)
+            self.summary.append(
+                f"- Asked: {_clip(old['standalone'], 30)} Answer: {_clip(old['answer'], CHAT_SUMMARY_ANSWER_TOKENS)}"
+            )
+        # Oldest summary lines go first once the summary outgrows its budget
+        while len(self.summary) > 1 and sum(len(line.split()) for line in self.summary) > CHAT_SUMMARY_TOKENS:
+            self.summary.pop(0)
+
+    def history_text(self) -> str:
+        """The conversation so far for the prompt: summary of older turns, then recent turns."""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in the conversation:\n" + "\n".join(self.summary))
+        for turn in self.turns:
+            parts.append(f"User: {turn['question']}\nAssistant: {_clip(turn['answer'], CHAT_ANSWER_TOKENS)}")
+        return "\n\n".join(parts)
+
+    def previous_question(self):
+        return self.turns[-1]["standalone"] if self.turns else None
+
+
+def is_follow_up(question: str, previous: str) -> bool:
+    if not previous:
+        return False
+    words = {word.lower() for word in _WORD.findall(question)}
+    return (
+        bool(_FOLLOW_UP_OPENERS.match(question))
+        or bool(words & _REFERENCES)
+        or len(content_terms(question)) <= _FOLLOW_UP_MAX_TERMS
+    )
+
+
+def rewrite_heuristic(question: str, previous: str) -> str:
+    """The follow-up plus the previous question's content terms it does not repeat."""
+    own = set(content_terms(question))
+    carried = [term for term in content_terms(previous) if term not in own][:_REWRITE_MAX_TERMS]
+    if not carried:
+        return question
+    return f"{question.strip()} ({' '.join(carried)})"
+
+
+def build_rewrite_prompt(session: ChatSession, question: str) -> str:
+    return f"""
+    Rewrite the user's follow-up question into a standalone question that can be understood without the conversation.
+    Keep names, numbers and terms from the conversation that the follow-up refers to.
+    Reply with the rewritten question only.
+
+    CONVERSATION:
+    {session.history_text()}
+
+    FOLLOW-UP QUESTION:
+    {question}
+    """
+
+
+async def standalone_question(session: ChatSession, question: str, model=None) -> str:
+    """
+    `question` made understandable without the conversation. Questions that
+    do not look like follow-ups are used as they are (no LLM call).
+    """
+    previous = session.previous_question()
+    if CHAT_REWRITE == "off" or not is_follow_up(question, previous):
+        return question
+    if CHAT_REWRITE == "llm" and model is not None:
+        try:
+            rewritten = (await model.ainvoke(build_rewrite_prompt(session, question))).content.strip()
+            if rewritten:
+                return rewritten
+        except Exception:
+            logger.warning("⚠️ LLM rewrite failed, using the heuristic rewrite", exc_info=True)
+    return rewrite_heuristic(question, previous)
+
+
+def reusable_candidates(session: ChatSession, generation: int, lexical_ids) -> bool:
+    """
+    Whether the last turn's candidates can stand in for a fresh search:
+    same generation, and at least CHAT_REUSE_OVERLAP of the follow-up's
+    BM25 top-k already among them.
+    """
+    cached = session.candidates
+    if not cached or cached.get("generation") != generation or not lexical_ids:
+        return False
+    previous = set(cached["ids"])
+    overlap = sum(1 for chunk_id in lexical_ids if chunk_id in previous) / len(lexical_ids)
+    return overlap >= CHAT_REUSE_OVERLAP
+
+
+class MemorySessionStore:
+    """Sessions of this process, least recently used evicted past `max_sessions`."""
+
+    def __init__(self, max_sessions: int = CHAT_MAX_SESSIONS, ttl: float = CHAT_SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            data = self._sessions.get(session_id)
+            if data is None:
+                return None
+            if time.time() - data["updated_at"] > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+        # A copy: concurrent turns of one session never share mutable state
+        return ChatSession.from_dict(json.loads(json.dumps(data)))
+
+    def save(self, session: ChatSession):
+        session.updated_at = time.time()
+        with self._lock:
+            self._sessions[session.session_id] = session.to_dict()
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def forget_file(self, file_id: str):
+        with self._lock:
+            for session_id in [s for s, data in self._sessions.items() if data["file_id"] == file_id]:
+                del self._sessions[session_id]
+
+
+class SqliteSessionStore:
+    """Sessions in the chat_sessions table, shared by all workers."""
+
+    def __init__(self, session_factory=SessionLocal, max_sessions: int = CHAT_MAX_SESSIONS,
+                 ttl: float = CHAT_SESSION_TTL):
+        self.session_factory = session_factory
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+
+    def get(self, session_id: str):
+        with self.session_factory() as db:
+            record = db.get(ChatSessionRecord, session_id)
+            if record is None or time.time() - record.updated_at > self.ttl:
+                return None
+            return ChatSession.from_dict(json.loads(record.state))
+
+    def save(self, session: ChatSession):
+        session.updated_at = time.time()
+        with self.session_factory() as db:
+            db.merge(ChatSessionRecord(
+                session_id=session.session_id,
+                file_id=session.file_id,
+                state=json.dumps(session.to_dict()),
+                updated_at=session.updated_at,
+            ))
+            db.commit()
+
+    def delete(self, session_id: str) -> bool:
+        with self.session_factory() as db:
+            deleted = db.query(ChatSessionRecord).filter(ChatSessionRecord.session_id == session_id).delete()
+            db.commit()
+        return bool(deleted)
+
+    def forget_file(self, file_id: str):
+        with self.session_factory() as db:
+            db.query(ChatSessionRecord).filter(ChatSessionRecord.file_id == file_id).delete()
+            db.commit()
+
+    def evict(self):
+        """Drop expired sessions, then the least recently used beyond `max_sessions`."""
+        with self.session_factory() as db:
+            expired = db.query(ChatSessionRecord).filter(
+                ChatSessionRecord.updated_at < time.time() - self.ttl
+            ).delete(synchronize_session=False)
+            excess = db.query(ChatSessionRecord).count() - self.max_sessions
+            if excess > 0:
+                oldest = db.query(ChatSessionRecord.session_id).order_by(
+                    ChatSessionRecord.updated_at.asc()
+                ).limit(excess).subquery()
+                db.query(ChatSessionRecord).filter(
+                    ChatSessionRecord.session_id.in_(db.query(oldest.c.session_id))
+                ).delete(synchronize_session=False)
+            db.commit()
+        if expired or excess > 0:
+            logger.info("🧹 Chat sessions evicted: %d expired, %d over the limit", expired, max(excess, 0))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            if CHAT_SESSION_STORE not in ("memory", "sqlite"):
+                raise ValueError(f"Unknown CHAT_SESSION_STORE: {CHAT_SESSION_STORE}")
+            _store = SqliteSessionStore() if CHAT_SESSION_STORE == "sqlite" else MemorySessionStore()
+        return _store
+
+
+def create_session(file_id: str) -> ChatSession:
+    store = get_session_store()
+    if isinstance(store, SqliteSessionStore):
+        store.evict()
+    session = ChatSession(uuid.uuid4().hex, file_id)
+    store.save(session)
+    return session
+
+
+def forget_file(file_id: str):
+    """End every conversation about a deleted file."""
+    get_session_store().forget_file(file_id)
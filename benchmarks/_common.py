@@ -0,0 +1,194 @@
+"""Shared helpers for the benchmark scripts (local fakes, timing, reporting)."""
+import hashlib
+import math
+import os
+import time
+
+# Keep Chroma from phoning home during benchmark runs
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+
+def temp_environment(prefix="chatz_bench_"):
+    """Point the backend's database, logs and data dirs at a fresh temp dir (unless already set)."""
+    import tempfile
+
+    workdir = tempfile.mkdtemp(prefix=prefix)
+    for name, value in {
+        "GOOGLE_API_KEY": "bench-key",
+        "DATABASE_URL": f"sqlite:///{workdir}/files.db",
+        "LOG_DIR": f"{workdir}/logs",
+        "UPLOAD_DIR": f"{workdir}/uploaded_pdfs",
+        "EXTRACT_DIR": f"{workdir}/extracted_text",
+        "LEXICAL_INDEX_DIR": f"{workdir}/lexical_index",
+    }.items():
+        os.environ.setdefault(name, value)
+    return workdir
+
+
+class FakeEmbedder:
+    """
+    Deterministic stand-in for GoogleGenerativeAIEmbeddings.
+    Each call sleeps `latency + per_text * len(texts)` seconds to mimic a
+    network round-trip, and every `rate_limit_every`-th call raises a 429.
+    """
+
+    def __init__(self, dim=64, latency=0.05, per_text=0.0005, rate_limit_every=0):
+        self.dim = dim
+        self.latency = latency
+        self.per_text = per_text
+        self.rate_limit_every = rate_limit_every
+        self.calls = 0
+        self.query_calls = 0
+
+    def _vector(self, text):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        raw = [(digest[i % len(digest)] - 128) / 128.0 for i in range(self.dim)]
+        norm = math.sqrt(sum(v * v for v in raw)) or 1.0
+        return [v / norm for v in raw]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        if self.rate_limit_every and self.calls % self.rate_limit_every == 0:
+            raise RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+        time.sleep(self.latency + self.per_text * len(texts))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        time.sleep(self.latency)
+        return self._vector(text)
+
+
+def synthetic_chunks(n, size=700):
+    """`n` distinct chunks: the embedding engine deduplicates equal texts within a call."""
+    words = ("contract clause party payment invoice section delivery warranty "
+             "liability notice term agreement schedule").split()
+    return [
+        f"{i} " + " ".join(words[(i + j) % len(words)] for j in range(size // 8))
+        for i in range(n)
+    ]
+
+
+def print_table(headers, rows):
+    widths = [max(len(str(h)), *(len(str(r[i])) for r in rows)) for i, h in enumerate(headers)]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def synthetic_pdf(path, pages=100, lines_per_page=40):
+    """Write a text-heavy PDF of `pages` pages with PyMuPDF."""
+    import fitz
+
+    words = ("contract clause party payment invoice section delivery warranty "
+             "liability notice term agreement schedule").split()
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        lines = [
+            f"{p + 1}.{line} " + " ".join(words[(p + line + j) % len(words)] for j in range(10))
+            for line in range(lines_per_page)
+        ]
+        page.insert_text((36, 36), "\n".join(lines), fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Stand-in for ChatGoogleGenerativeAI. Emits `tokens` words after a
+    `ttft` delay (plus `per_prompt_token` seconds per prompt word, like
+    prefill) and `per_token` seconds per word, via invoke / ainvoke /
+    stream / astream like a LangChain chat model.
+    """
+
+    def __init__(self, tokens=80, ttft=0.3, per_token=0.015, per_prompt_token=0.0):
+        self.tokens = tokens
+        self.ttft = ttft
+        self.per_token = per_token
+        self.per_prompt_token = per_prompt_token
+
+    def _first_token_delay(self, prompt):
+        return self.ttft + self.per_prompt_token * len(prompt.split())
+
+    def _words(self, prompt):
+        seed = (prompt.split() or ["answer"])[-12:]
+        return [seed[i % len(seed)] + " " for i in range(self.tokens)]
+
+    def invoke(self, prompt):
+        time.sleep(self._first_token_delay(prompt) + self.per_token * self.tokens)
+        return _Message("".join(self._words(prompt)))
+
+    async def ainvoke(self, prompt):
+        import asyncio
+
+        await asyncio.sleep(self._first_token_delay(prompt) + self.per_token * self.tokens)
+        return _Message("".join(self._words(prompt)))
+
+    def stream(self, prompt):
+        time.sleep(self._first_token_delay(prompt))
+        for word in self._words(prompt):
+            yield _Message(word)
+            time.sleep(self.per_token)
+
+    async def astream(self, prompt):
+        import asyncio
+
+        await asyncio.sleep(self._first_token_delay(prompt))
+        for word in self._words(prompt):
+            yield _Message(word)
+            await asyncio.sleep(self.per_token)
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a local port for the duration of a `with` block."""
+
+    def __init__(self, app, port=8765):
+        import threading
+        import uvicorn
+
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class HashingEmbedder(FakeEmbedder):
+    """
+    The backend's EMBED_PROVIDER=hashing vectors (similar wording => similar
+    vectors, fully local) with FakeEmbedder's simulated latency and call counts.
+    """
+
+    def __init__(self, dim=64, **kwargs):
+        super().__init__(dim=dim, **kwargs)
+        # Imported here: backend modules read their env (set by temp_environment) at import time
+        from backend.embedding_providers import HashingEmbedder as HashingVectors
+
+        self._hashing = HashingVectors(dim)
+
+    def _vector(self, text):
+        return self._hashing.embed_query(text)
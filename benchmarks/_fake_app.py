@@ -0,0 +1,17 @@
+"""
+The ChatZ app with the benchmark chat model swapped in, importable by a
+multi-worker uvicorn (`uvicorn benchmarks._fake_app:app --workers N`):
+each worker process imports it and gets its own fake. Embeddings come from
+EMBED_PROVIDER (set it to `hashing` for a local, deterministic run).
+"""
+import os
+
+from benchmarks._common import FakeChatModel
+from backend import resources
+from backend.main import app  # noqa: F401  (served by uvicorn)
+
+resources.override(chat_model=FakeChatModel(
+    tokens=int(os.getenv("BENCH_TOKENS", "40")),
+    ttft=float(os.getenv("BENCH_TTFT", "0")),
+    per_token=0.0,
+))
@@ -0,0 +1,172 @@
+"""
+Multi-turn conversations over one synthetic PDF: the same scripted
+questions (a topic question followed by short follow-ups, then a new
+topic) sent as independent /query/ calls, and through /chat with the full
+history in every prompt, with the summarized history, and with the
+summarized history plus context reuse (the default).
+
+Prompt size is what the chat model was actually sent; the fake model's
+time grows with it (`--per-prompt-token`), the fake embedder sleeps
+`--embed-latency` per question like a remote embedding call.
+
+    python -m benchmarks.bench_chat --turns 20
+    python -m benchmarks.bench_chat --turns 40 --per-prompt-token 0.0005
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks._common import FakeChatModel, HashingEmbedder, percentile, print_table, temp_environment
+
+SCRIPT = [
+    "What does the contract say about payment of the invoice?",
+    "and when is it due?",
+    "what about the late fee for that?",
+    "Which warranty applies to delivery?",
+    "does it cover a defect?",
+    "and the liability cap?",
+    "What is the term of the agreement?",
+    "how about the notice for it?",
+]
+
+
+# Pages of the document cycle through these sections, so follow-ups stay on the same chunks
+TOPICS = {
+    "payment": "payment invoice due date schedule amount late fee interest instalment",
+    "warranty": "warranty delivery defect repair replacement liability cap damages",
+    "termination": "term agreement termination notice renewal period breach section",
+}
+FILLER = "the parties agree that this clause applies under the conditions set out below".split()
+
+
+def topical_pdf(path, pages=30, lines_per_page=40):
+    """A PDF whose pages are about one topic each, unlike the uniform synthetic_pdf."""
+    import fitz
+
+    topics = list(TOPICS.values())
+    doc = fitz.open()
+    for p in range(pages):
+        words = topics[p * len(topics) // pages].split()
+        page = doc.new_page()
+        lines = [
+            f"{p + 1}.{line} " + " ".join(
+                words[(p + line + j) % len(words)] if j % 2 else FILLER[(p * 7 + line + j) % len(FILLER)]
+                for j in range(12)
+            )
+            for line in range(lines_per_page)
+        ]
+        page.insert_text((36, 36), "\n".join(lines), fontsize=9)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+class RecordingChatModel(FakeChatModel):
+    """FakeChatModel that remembers the size of every prompt it answered."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.prompt_tokens = []
+
+    async def ainvoke(self, prompt):
+        from backend.chunking import count_tokens
+
+        self.prompt_tokens.append(count_tokens(prompt))
+        return await super().ainvoke(prompt)
+
+
+async def converse(client, file_id, turns, use_chat):
+    latencies, reused = [], 0
+    session_id = None
+    if use_chat:
+        session_id = (await client.post("/chat/", json={"file_id": file_id})).json()["session_id"]
+    for turn in range(turns):
+        question = SCRIPT[turn % len(SCRIPT)]
+        started = time.perf_counter()
+        if use_chat:
+            response = await client.post(f"/chat/{session_id}", json={"question": question})
+        else:
+            response = await client.post("/query/", json={"question": question, "file_id": file_id})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        reused += bool(response.json().get("reused_context"))
+    return latencies, reused
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--embed-latency", type=float, default=0.15, help="seconds per question embedding")
+    parser.add_argument("--tokens", type=int, default=60, help="words per fake answer")
+    parser.add_argument("--per-prompt-token", type=float, default=0.0002, help="fake prefill seconds per prompt word")
+    args = parser.parse_args()
+
+    workdir = temp_environment("chatz_chat_")
+    # Repeated questions must reach the model every time
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.chdir(workdir)
+
+    import chromadb
+    import httpx
+    from backend import resources, sessions
+    from backend.embedding import EmbeddingEngine
+    from backend.main import app
+
+    embedder = HashingEmbedder(latency=args.embed_latency, per_text=0.0)
+    model = RecordingChatModel(tokens=args.tokens, ttft=0.05, per_token=0.0, per_prompt_token=args.per_prompt_token)
+    resources.override(
+        chroma_client=chromadb.EphemeralClient(),
+        embedding_engine=EmbeddingEngine(embedder),
+        chat_model=model,
+    )
+    path = topical_pdf(os.path.join(workdir, "contract.pdf"), pages=args.pages)
+
+    cases = [
+        ("independent /query/ calls", False, {}),
+        ("chat, full history", True, {"CHAT_HISTORY_TURNS": 10 ** 6, "CHAT_REUSE_OVERLAP": 2.0}),
+        ("chat, summarized history", True, {"CHAT_REUSE_OVERLAP": 2.0}),
+        ("chat, summary + context reuse", True, {}),
+    ]
+    defaults = {name: getattr(sessions, name) for name in ("CHAT_HISTORY_TURNS", "CHAT_REUSE_OVERLAP")}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=600) as client:
+            with open(path, "rb") as f:
+                upload = await client.post("/upload/upload_file", files={"file": ("contract.pdf", f, "application/pdf")})
+            file_id = upload.json()["file_id"]
+            (await client.get(f"/extract/{file_id}")).raise_for_status()
+            (await client.post(f"/embed/{file_id}")).raise_for_status()
+
+            rows = []
+            for label, use_chat, overrides in cases:
+                for name, value in {**defaults, **overrides}.items():
+                    setattr(sessions, name, value)
+                model.prompt_tokens.clear()
+                query_calls = embedder.query_calls
+                latencies, reused = await converse(client, file_id, args.turns, use_chat)
+                tokens = model.prompt_tokens
+                rows.append((
+                    label,
+                    tokens[0], tokens[len(tokens) // 2], tokens[-1], max(tokens),
+                    f"{percentile(latencies, 50) * 1000:.0f}", f"{percentile(latencies, 99) * 1000:.0f}",
+                    embedder.query_calls - query_calls, reused,
+                ))
+            return rows
+
+    rows = asyncio.run(run())
+    print(f"{args.turns} turns over a {args.pages}-page PDF, {args.embed_latency * 1000:.0f} ms per question "
+          f"embedding, {args.per_prompt_token * 1000:g} ms per prompt word\n")
+    print_table(
+        ["conversation", "prompt t1", f"t{args.turns // 2 + 1}", f"t{args.turns}", "max",
+         "p50 ms", "p99 ms", "embeds", "reused"],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Chunk count, size and throughput of the chunking strategies against the
+legacy 700/100 character chunker, on synthetic multi-page text.
+
+    python -m benchmarks.bench_chunking --pages 500 --max-tokens 200
+"""
+import argparse
+import random
+import time
+
+from backend.chunking import STRATEGIES, chunk_document, count_tokens
+from benchmarks._common import print_table
+
+WORDS = ("the supplier shall deliver goods under this agreement and the buyer shall pay all "
+         "invoices within the agreed payment term subject to warranty liability notice").split()
+
+
+def synthetic_pages(n_pages, rng):
+    pages = []
+    for _ in range(n_pages):
+        paragraphs = []
+        for _ in range(rng.randint(3, 6)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 25))).capitalize() + "."
+                for _ in range(rng.randint(2, 6))
+            ]
+            paragraphs.append(" ".join(sentences))
+        pages.append("\n\n".join(paragraphs))
+
+    text, offsets, position = [], [], 0
+    for page in pages:
+        text.append(page + "\n")
+        offsets.append((position, position + len(page)))
+        position += len(page) + 1
+    return "".join(text), offsets
+
+
+def legacy_chunks(text, chunk_size=700, overlap=100):
+    """The original character chunker: 700-character windows every 600 characters."""
+    return [text[start:start + chunk_size] for start in range(0, len(text), chunk_size - overlap)]
+
+
+def cut_words(text, spans):
+    """Chunks starting or ending in the middle of a word."""
+    cuts = 0
+    for start, end in spans:
+        if 0 < start < len(text) and text[start - 1].isalnum() and text[start].isalnum():
+            cuts += 1
+        elif 0 < end < len(text) and text[end - 1].isalnum() and text[end].isalnum():
+            cuts += 1
+    return cuts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--overlap-tokens", type=int, default=0)
+    args = parser.parse_args()
+
+    text, offsets = synthetic_pages(args.pages, random.Random(3))
+    megabytes = len(text.encode("utf-8")) / 1e6
+    rows = []
+
+    start = time.perf_counter()
+    legacy = legacy_chunks(text)
+    elapsed = time.perf_counter() - start
+    legacy_spans = [(i * 600, i * 600 + len(c)) for i, c in enumerate(legacy)]
+    rows.append(("legacy 700/100 chars", len(legacy), sum(map(len, legacy)) // len(legacy),
+                 sum(map(count_tokens, legacy)) // len(legacy), cut_words(text, legacy_spans),
+                 f"{megabytes / elapsed:.1f}"))
+
+    for strategy in STRATEGIES:
+        start = time.perf_counter()
+        chunks = list(chunk_document(text, offsets, strategy=strategy,
+                                     max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens))
+        elapsed = time.perf_counter() - start
+        rows.append((strategy, len(chunks), sum(len(c.text) for c in chunks) // len(chunks),
+                     sum(c.tokens for c in chunks) // len(chunks),
+                     cut_words(text, [(c.start, c.end) for c in chunks]), f"{megabytes / elapsed:.1f}"))
+
+    print(f"{args.pages} pages, {megabytes:.1f} MB of text\n")
+    print_table(["chunker", "chunks", "avg chars", "avg tokens", "mid-word cuts", "MB/s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Memory, disk, latency and recall@k of one large file's vectors stored in
+Chroma vs. the compact store (int8 / float16 codes scanned brute-force or
+through IVF lists, final candidates rescored at float32, or ranked on the
+codes alone without a float32 copy on disk: COMPACT_RESCORE=0).
+
+Each variant is built in one subprocess and queried in a fresh one, so the
+resident memory reported is what opening the store and answering
+`--queries` questions costs, not what building it did.
+
+    python -m benchmarks.bench_compact --chunks 20000 --dim 768 --queries 200 --top-k 10
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks._common import percentile, print_table
+
+
+def _rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def fixture(n, dim, n_queries, seed=0):
+    """Clustered unit vectors (documents of one corpus are not uniform noise) and queries near them."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype(np.float32)
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.integers(n, size=n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, queries
+
+
+def _dir_mb(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files) / 1e6
+
+
+def build(variant, path, n, dim):
+    vectors, _ = fixture(n, dim, 0)
+    ids = [f"bench_{i}" for i in range(n)]
+    metadatas = [{"file_id": "bench", "chunk_id": i} for i in range(n)]
+    documents = [f"chunk {i}" for i in range(n)]
+    if variant == "chroma":
+        import chromadb
+
+        collection = chromadb.PersistentClient(path=path).get_or_create_collection(
+            name="bench_compact", metadata={"hnsw:space": "cosine"})
+        for start in range(0, n, 5000):
+            end = start + 5000
+            collection.add(ids=ids[start:end], embeddings=vectors[start:end],
+                           documents=documents[start:end], metadatas=metadatas[start:end])
+    else:
+        from backend import compact_store
+
+        dtype, ivf = variant.split()[1], "ivf" in variant
+        compact_store.COMPACT_STORE_DIR = path
+        compact_store.COMPACT_IVF_MIN_ROWS = 1 if ivf else n + 1
+        compact_store.write("bench", 1, ids, documents, metadatas, vectors, dtype=dtype,
+                            rescore=0 if "no-rescore" in variant else compact_store.COMPACT_RESCORE)
+
+
+def query(variant, path, n, dim, n_queries, top_k, exact):
+    _, queries = fixture(n, dim, n_queries)
+    before = _rss_mb()
+    if variant == "chroma":
+        import chromadb
+
+        store = chromadb.PersistentClient(path=path).get_collection("bench_compact")
+    else:
+        from backend import compact_store
+
+        compact_store.COMPACT_STORE_DIR = path
+        store = compact_store.load("bench", 1)
+
+    latencies, recall = [], []
+    for q, expected in zip(queries, exact):
+        started = time.perf_counter()
+        result = store.query(query_embeddings=[q.tolist()], n_results=top_k, where={"file_id": "bench"})
+        latencies.append(time.perf_counter() - started)
+        found = {int(chunk_id.split("_")[1]) for chunk_id in result["ids"][0]}
+        recall.append(len(found & set(expected)) / top_k)
+    return _rss_mb() - before, latencies, sum(recall) / len(recall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    import numpy as np
+
+    vectors, queries = fixture(args.chunks, args.dim, args.queries)
+    exact = [list(np.argsort(-(vectors @ q))[:args.top_k]) for q in queries]
+    del vectors
+
+    workdir = tempfile.mkdtemp(prefix="chatz_compact_")
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for variant in ("chroma", "compact float16", "compact int8", "compact int8 ivf", "compact int8 no-rescore"):
+        path = os.path.join(workdir, variant.replace(" ", "_"))
+        with ctx.Pool(1) as pool:
+            started = time.perf_counter()
+            pool.apply(build, (variant, path, args.chunks, args.dim))
+            build_s = time.perf_counter() - started
+        with ctx.Pool(1) as pool:
+            rss, latencies, recall = pool.apply(
+                query, (variant, path, args.chunks, args.dim, args.queries, args.top_k, exact))
+        full_mb = os.path.join(path, "bench.g1", "full.npy")
+        full_mb = f"{os.path.getsize(full_mb) / 1e6:.0f}" if os.path.exists(full_mb) else "-"
+        rows.append((variant, f"{_dir_mb(path):.0f}", full_mb, f"{rss:.0f}", f"{build_s:.1f}",
+                     f"{percentile(latencies, 50) * 1000:.2f}", f"{percentile(latencies, 99) * 1000:.2f}",
+                     f"{recall:.3f}"))
+
+    raw = args.chunks * args.dim * 4 / 1e6
+    print(f"{args.chunks} vectors x {args.dim} dims, raw float32 = {raw:.0f} MB\n")
+    print_table(["store", "disk MB", "float32 copy MB", "query RSS MB", "build s", "p50 ms", "p99 ms", f"recall@{args.top_k}"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Load test: latency of concurrent POST /query/ requests while a large
+POST /embed/{file_id} runs on the same uvicorn worker, with a fake
+embedder and chat model.
+
+Three phases are measured: queries alone, queries during the current
+embed handler (blocking work on the bulk pool), and queries during an
+old-style handler that calls embed_file() directly on the event loop.
+
+    python -m benchmarks.bench_concurrency --clients 8 --pages 400 --embed-latency 0.05
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from benchmarks._common import (FakeChatModel, FakeEmbedder, ServerThread, percentile,
+                                print_table, synthetic_pdf)
+
+
+def query_load(url, file_id, clients, stop, latencies):
+    """Each client sends questions back to back until `stop` is set."""
+    import httpx
+
+    def client_loop(n):
+        with httpx.Client(base_url=url, timeout=120) as client:
+            i = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                client.post("/query/", json={"question": f"payment clause {n}-{i}", "file_id": file_id}).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                i += 1
+
+    threads = [threading.Thread(target=client_loop, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_phase(url, file_id, clients, work=None, duration=3.0):
+    """Run the query load for `duration` seconds, or for as long as `work()` takes."""
+    stop = threading.Event()
+    latencies = []
+    threads = query_load(url, file_id, clients, stop, latencies)
+    started = time.perf_counter()
+    if work:
+        work()
+    else:
+        time.sleep(duration)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=400, help="size of the PDF embedded under load")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="simulated remote embedding call")
+    parser.add_argument("--ttft", type=float, default=0.1, help="simulated LLM latency")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chatz_load_")
+    os.environ.update({
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench-key"),
+        "DATABASE_URL": f"sqlite:///{workdir}/files.db",
+        "LOG_DIR": f"{workdir}/logs",
+        "UPLOAD_DIR": f"{workdir}/uploaded_pdfs",
+        "EXTRACT_DIR": f"{workdir}/extracted_text",
+        "LEXICAL_INDEX_DIR": f"{workdir}/lexical_index",
+        "ANSWER_CACHE_ENABLED": "false",
+        "EMBED_CACHE_ENABLED": "false",
+        "ANONYMIZED_TELEMETRY": "False",
+    })
+    os.chdir(workdir)
+
+    import chromadb
+    import httpx
+    from backend import resources
+    from backend.embedding import EmbeddingEngine
+    from backend.main import app
+    from backend.routers.embed import embed_file
+
+    resources.override(
+        collection=chromadb.EphemeralClient().get_or_create_collection(name="bench_load", metadata={"hnsw:space": "cosine"}),
+        embedding_engine=EmbeddingEngine(FakeEmbedder(latency=args.embed_latency, per_text=0.0005)),
+        chat_model=FakeChatModel(tokens=20, ttft=args.ttft, per_token=0.0),
+    )
+
+    # The pre-fix handler shape: blocking work straight on the event loop
+    @app.post("/bench/embed_inline/{file_id}")
+    async def embed_inline(file_id: str):
+        return embed_file(file_id)
+
+    small = synthetic_pdf(os.path.join(workdir, "small.pdf"), pages=5)
+    large = synthetic_pdf(os.path.join(workdir, "large.pdf"), pages=args.pages)
+
+    with ServerThread(app) as server, httpx.Client(base_url=server.url, timeout=600) as client:
+        def upload_and_extract(path):
+            with open(path, "rb") as f:
+                file_id = client.post("/upload/upload_file", files={"file": (os.path.basename(path), f, "application/pdf")}).json()["file_id"]
+            client.get(f"/extract/{file_id}").raise_for_status()
+            return file_id
+
+        query_file = upload_and_extract(small)
+        client.post(f"/embed/{query_file}").raise_for_status()
+        large_file = upload_and_extract(large)
+
+        # Warm up: first query builds the BM25 cache, Chroma segments and pool threads
+        run_phase(server.url, query_file, args.clients, duration=1.0)
+
+        rows = []
+
+        def report(label, latencies, elapsed):
+            rows.append((label, len(latencies), f"{len(latencies) / elapsed:.1f}",
+                         f"{percentile(latencies, 50) * 1000:.0f}", f"{percentile(latencies, 95) * 1000:.0f}",
+                         f"{percentile(latencies, 99) * 1000:.0f}", f"{max(latencies, default=0) * 1000:.0f}"))
+
+        report("queries only", *run_phase(server.url, query_file, args.clients))
+
+        def embed(path):
+            def work():
+                # Let the query clients reach a steady state first
+                time.sleep(0.5)
+                client.post(path).raise_for_status()
+            return work
+
+        report("during POST /embed (offloaded)", *run_phase(server.url, query_file, args.clients, embed(f"/embed/{large_file}")))
+
+        # embed_file deletes the extracted text when done: extract again for the second run
+        client.get(f"/extract/{large_file}").raise_for_status()
+        report("during embed on event loop (old)", *run_phase(server.url, query_file, args.clients, embed(f"/bench/embed_inline/{large_file}")))
+
+    print(f"{args.clients} query clients, embedding a {args.pages}-page PDF\n")
+    print_table(["phase", "queries", "qps", "p50 ms", "p95 ms", "p99 ms", "max ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+End-to-end benchmark: the FastAPI app on a local uvicorn server, with a
+deterministic fake embedder and chat model and an in-memory Chroma, driven
+over HTTP through upload -> extract -> embed -> query.
+
+Phase 1 pushes `--docs` synthetic PDFs (page counts cycled from `--pages`)
+through upload, extract and embed, `--concurrency` documents at a time.
+Phase 2 sends `--queries-per-doc` questions per document at the same
+concurrency, after `--warmup` untimed ones. Per-stage latency
+percentiles, throughput and peak RSS are printed and written to
+`--output` (JSON); `--baseline` prints the change against an earlier
+result file.
+
+    python -m benchmarks.bench_e2e --docs 8 --pages 20 100 --concurrency 4 --queries-per-doc 10
+    python -m benchmarks.bench_e2e --output after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks._common import (FakeChatModel, FakeEmbedder, ServerThread, percentile,
+                                print_table, synthetic_pdf, temp_environment)
+
+STAGES = ("upload", "extract", "embed", "query")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; extraction runs in worker processes (children)
+    return {
+        "server_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def _latency_summary(latencies):
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+def _rate(count, elapsed):
+    return round(count / elapsed, 2) if elapsed else 0.0
+
+
+def _compare(result, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "-"
+
+    rows = []
+    for stage in STAGES:
+        old, new = baseline["stages"].get(stage), result["stages"].get(stage)
+        if old and new:
+            rows += [(stage, key, old[key], new[key], change(old[key], new[key])) for key in ("p50_ms", "p99_ms")]
+    for phase, metrics in result["throughput"].items():
+        for key, new in metrics.items():
+            old = baseline["throughput"].get(phase, {}).get(key)
+            if old is not None:
+                rows.append((phase, key, old, new, change(old, new)))
+    old, new = baseline["peak_rss"]["server_mb"], result["peak_rss"]["server_mb"]
+    rows.append(("process", "peak_rss_mb", old, new, change(old, new)))
+    print(f"\nAgainst {baseline_path} (commit {baseline.get('commit')}):\n")
+    print_table(["stage", "metric", "baseline", "this run", "change"], rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=8)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100], help="page counts, cycled over the documents")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--queries-per-doc", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed questions per document before phase 2")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="simulated embedding call, seconds")
+    parser.add_argument("--ttft", type=float, default=0.1, help="simulated LLM latency, seconds")
+    parser.add_argument("--tokens", type=int, default=40, help="simulated answer length")
+    parser.add_argument("--output", default=None, help="result file (default: bench_e2e_<timestamp>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier result file to compare against")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output or f"bench_e2e_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    workdir = temp_environment("chatz_e2e_")
+    # Every question is new and every document distinct: measure the uncached path
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "false")
+    os.environ.setdefault("CHROMA_DIR", f"{workdir}/chroma_db")
+    os.chdir(workdir)
+
+    import chromadb
+    import httpx
+    from backend import resources
+    from backend.embedding import EmbeddingEngine
+    from backend.main import app
+
+    resources.override(
+        chroma_client=chromadb.EphemeralClient(),
+        embedding_engine=EmbeddingEngine(FakeEmbedder(latency=args.embed_latency, per_text=0.0005)),
+        chat_model=FakeChatModel(tokens=args.tokens, ttft=args.ttft, per_token=0.0),
+    )
+
+    # Distinct bytes per document (else uploads deduplicate to one file_id)
+    documents = []
+    for i in range(args.docs):
+        pages = args.pages[i % len(args.pages)]
+        path = synthetic_pdf(os.path.join(workdir, f"doc{i:03d}.pdf"), pages=pages, lines_per_page=40 + i % 7)
+        documents.append((path, pages))
+
+    latencies = {stage: [] for stage in STAGES}
+    lock = threading.Lock()
+
+    def timed(stage, call):
+        started = time.perf_counter()
+        response = call()
+        response.raise_for_status()
+        if stage:
+            with lock:
+                latencies[stage].append(time.perf_counter() - started)
+        return response.json()
+
+    with ServerThread(app, port=args.port) as server, httpx.Client(
+        base_url=server.url, timeout=600, limits=httpx.Limits(max_connections=args.concurrency * 2)
+    ) as client:
+        def ingest(document):
+            path, _ = document
+            with open(path, "rb") as f:
+                upload = timed("upload", lambda: client.post(
+                    "/upload/upload_file", files={"file": (os.path.basename(path), f, "application/pdf")}))
+            file_id = upload["file_id"]
+            timed("extract", lambda: client.get(f"/extract/{file_id}"))
+            timed("embed", lambda: client.post(f"/embed/{file_id}"))
+            return file_id
+
+        # 1️⃣ Upload -> extract -> embed, `concurrency` documents in flight
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            file_ids = list(pool.map(ingest, documents))
+        ingest_elapsed = time.perf_counter() - started
+
+        def ask(stage, item):
+            file_id, question = item
+            return timed(stage, lambda: client.post("/query/", json={"question": question, "file_id": file_id}))
+
+        # 2️⃣ Questions against every document, after untimed warm-up ones (first query loads the BM25 index)
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda item: ask(None, item), [
+                (file_id, f"warm up question {q}") for q in range(args.warmup) for file_id in file_ids
+            ]))
+        questions = [
+            (file_id, f"what does clause {q} say about payment and delivery")
+            for q in range(args.queries_per_doc) for file_id in file_ids
+        ]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            list(pool.map(lambda item: ask("query", item), questions))
+        query_elapsed = time.perf_counter() - started
+
+    total_pages = sum(pages for _, pages in documents)
+    result = {
+        "benchmark": "e2e",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "wall_seconds": {"ingest": round(ingest_elapsed, 3), "query": round(query_elapsed, 3)},
+        "stages": {stage: _latency_summary(latencies[stage]) for stage in STAGES},
+        "throughput": {
+            "ingest": {"docs_per_second": _rate(len(documents), ingest_elapsed),
+                       "pages_per_second": _rate(total_pages, ingest_elapsed)},
+            "query": {"queries_per_second": _rate(len(questions), query_elapsed)},
+        },
+        "peak_rss": _peak_rss_mb(),
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{args.docs} documents ({total_pages} pages), concurrency {args.concurrency}, "
+          f"{len(questions)} questions\n")
+    print_table(
+        ["stage", "count", "p50 ms", "p95 ms", "p99 ms", "max ms"],
+        [(stage, s["count"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["max_ms"]) for stage, s in result["stages"].items()],
+    )
+    throughput = result["throughput"]
+    print(f"\nIngest: {throughput['ingest']['docs_per_second']} docs/sec, {throughput['ingest']['pages_per_second']} pages/sec; "
+          f"query: {throughput['query']['queries_per_second']} questions/sec")
+    print(f"Peak RSS: {result['peak_rss']['server_mb']} MB (server + client), "
+          f"{result['peak_rss']['children_mb']} MB (largest extraction worker)")
+    print(f"Results written to {output}")
+
+    if baseline:
+        _compare(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Chunks/sec of the batched embedding engine against a local fake embedder.
+
+    python -m benchmarks.bench_embedding --chunks 2000 --latency 0.05
+"""
+import argparse
+import time
+
+from backend.embedding import EmbeddingEngine
+from benchmarks._common import FakeEmbedder, print_table, synthetic_chunks
+
+
+def run(chunks, batch_size, concurrency, latency):
+    engine = EmbeddingEngine(
+        FakeEmbedder(latency=latency),
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+    )
+    start = time.perf_counter()
+    engine.embed_documents(chunks)
+    elapsed = time.perf_counter() - start
+    engine.shutdown()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated round-trip seconds")
+    parser.add_argument("--batch-sizes", default="1,16,64,100")
+    parser.add_argument("--concurrency", default="1,4,8")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks)
+
+    # Baseline: the old code path, one request per chunk
+    baseline = FakeEmbedder(latency=args.latency)
+    start = time.perf_counter()
+    for chunk in chunks[: min(len(chunks), 200)]:
+        baseline.embed_documents([chunk])
+    per_chunk = (time.perf_counter() - start) / min(len(chunks), 200)
+    print(f"sequential per-chunk baseline: {1 / per_chunk:.1f} chunks/sec\n")
+
+    rows = []
+    for batch_size in map(int, args.batch_sizes.split(",")):
+        for concurrency in map(int, args.concurrency.split(",")):
+            elapsed = run(chunks, batch_size, concurrency, args.latency)
+            rows.append((batch_size, concurrency, f"{elapsed:.2f}", f"{len(chunks) / elapsed:.1f}"))
+    print_table(["batch_size", "concurrency", "seconds", "chunks/sec"], rows)
+
+
+if __name__ == "__main__":
+    main()
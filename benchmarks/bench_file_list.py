@@ -0,0 +1,91 @@
+"""
+GET /upload/list_files latency on a large catalog: the old full listing
+vs. keyset pages (first page, a page deep into the catalog, filtered by
+embedding status and by name prefix), and OFFSET paging for comparison.
+
+    python -m benchmarks.bench_file_list --rows 100000 --page-size 50 --repeat 20
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks._common import percentile, print_table, temp_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    temp_environment("chatz_file_list_")
+
+    from backend.database import SessionLocal, engine
+    from backend.migrations import run_migrations
+    from backend.models import FileInfo
+    from backend.routers.upload import _encode_cursor, _file_summary, list_files_page
+
+    run_migrations(engine)
+    rng = random.Random(5)
+    started_at = datetime(2024, 1, 1)
+    rows = [
+        {
+            "file_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "file_name": f"{rng.choice(['contract', 'invoice', 'report', 'memo'])}_{i:06d}.pdf",
+            "num_pages": rng.randint(1, 300),
+            "uploaded_at": started_at + timedelta(seconds=i * 7),
+            "embedding_status": rng.random() < 0.8,
+            "content_hash": f"{i:064x}",
+            "file_size": rng.randint(10_000, 50_000_000),
+            "active_generation": 1,
+        }
+        for i in range(args.rows)
+    ]
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(FileInfo, rows)
+        db.commit()
+    print(f"Inserted {args.rows} rows in {time.perf_counter() - started:.1f}s\n")
+
+    def full_listing(db):
+        return [_file_summary(f) for f in db.query(FileInfo).all()]
+
+    def offset_page(db, offset):
+        files = (db.query(FileInfo).order_by(FileInfo.uploaded_at.desc(), FileInfo.file_id.desc())
+                 .offset(offset).limit(args.page_size).all())
+        return [_file_summary(f) for f in files]
+
+    # Cursor of the page 90% into the catalog
+    deep = int(args.rows * 0.9)
+    with SessionLocal() as db:
+        row = db.query(FileInfo).order_by(FileInfo.uploaded_at.desc(), FileInfo.file_id.desc()).offset(deep - 1).first()
+        deep_cursor = _encode_cursor(row)
+
+    cases = [
+        ("old: every row", full_listing),
+        ("keyset: first page", lambda db: list_files_page(db, args.page_size)["files"]),
+        ("keyset: page at 90%", lambda db: list_files_page(db, args.page_size, deep_cursor)["files"]),
+        ("keyset: embedded=false", lambda db: list_files_page(db, args.page_size, embedded=False)["files"]),
+        ("keyset: name_prefix=memo_0999", lambda db: list_files_page(db, args.page_size, name_prefix="memo_0999")["files"]),
+        ("offset: page at 90%", lambda db: offset_page(db, deep)),
+    ]
+
+    table = []
+    for label, fn in cases:
+        latencies = []
+        for _ in range(args.repeat):
+            with SessionLocal() as db:
+                started = time.perf_counter()
+                returned = fn(db)
+                latencies.append(time.perf_counter() - started)
+        table.append((label, len(returned), f"{percentile(latencies, 50) * 1000:.2f}",
+                      f"{percentile(latencies, 99) * 1000:.2f}"))
+
+    print_table(["listing", "rows returned", "p50 ms", "p99 ms"], table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Bulk ingestion throughput: the old one-file-at-a-time flow (upload →
+extract → embed, sequentially) vs. backend.ingest's pipelined worker
+stages, on a directory of synthetic PDFs with a fake embedder. A second
+run over the same directory shows the resume path (everything skipped),
+and one corrupt file shows up in the failure report.
+
+    python -m benchmarks.bench_ingest --files 40 --pages 20 --workers 4 --embed-workers 4
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks._common import FakeEmbedder, print_table, synthetic_pdf, temp_environment
+
+
+def fixture_directory(path, n_files, pages):
+    import fitz
+
+    os.makedirs(path, exist_ok=True)
+    for i in range(n_files):
+        pdf_path = os.path.join(path, f"doc_{i:04d}.pdf")
+        synthetic_pdf(pdf_path, pages=pages)
+        # Distinct content per file, otherwise the content-hash dedupe collapses them
+        with fitz.open(pdf_path) as doc:
+            for p, page in enumerate(doc):
+                page.insert_text((36, 800), f"Document {i} page {p + 1}", fontsize=9)
+            doc.saveIncr()
+    with open(os.path.join(path, "corrupt.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4 not really a pdf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--embed-workers", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="simulated seconds per embedder call")
+    args = parser.parse_args()
+
+    workdir = temp_environment("chatz_ingest_")
+    os.environ.setdefault("EMBED_CACHE_ENABLED", "false")
+    os.environ.setdefault("INGEST_REPORT_DIR", f"{workdir}/reports")
+    os.environ.setdefault("EXTRACT_WORKERS", "1")
+
+    import chromadb
+    from backend import ingest, resources
+    from backend.database import engine
+    from backend.embedding import EmbeddingEngine
+    from backend.migrations import run_migrations
+    from backend.routers.embed import embed_file
+    from backend.routers.extract import extract_text
+    from backend.routers.upload import store_pdf
+
+    run_migrations(engine)
+    rows = []
+
+    for label in ("sequential (old flow)", f"pipelined {args.workers}+{args.embed_workers} workers", "re-run (resume)"):
+        if not label.startswith("re-run"):
+            source = os.path.join(workdir, f"inbox_{len(rows)}")
+            fixture_directory(source, args.files, args.pages)
+            resources.override(
+                collection=chromadb.EphemeralClient().get_or_create_collection(
+                    name=f"bench_ingest_{len(rows)}", metadata={"hnsw:space": "cosine"}),
+                embedding_engine=EmbeddingEngine(FakeEmbedder(latency=args.embed_latency, per_text=0.0005)),
+            )
+
+        if label.startswith("sequential"):
+            started, pages, chunks, failed = time.perf_counter(), 0, 0, 0
+            for name in sorted(os.listdir(source)):
+                try:
+                    file_id = store_pdf(os.path.join(source, name))["file_id"]
+                    pages += extract_text(file_id)["num_pages"]
+                    chunks += embed_file(file_id)["total_chunks"]
+                except Exception:
+                    failed += 1
+            elapsed = time.perf_counter() - started
+            rows.append((label, args.files + 1, pages, chunks, failed, f"{elapsed:.1f}",
+                         f"{pages / elapsed:.1f}", f"{chunks / elapsed:.1f}"))
+            continue
+
+        summary = ingest.run_ingest(ingest.IngestRun(source, args.workers, args.embed_workers))
+        files = summary["files"]
+        rows.append((label, files["seen"], summary["pages"], summary["chunks"], files["failed"],
+                     f"{summary['elapsed_seconds']:.1f}", summary["pages_per_sec"], summary["chunks_per_sec"]))
+        report = summary["report_path"]
+
+    print_table(["run", "files", "pages", "chunks", "failed", "seconds", "pages/s", "chunks/s"], rows)
+    with open(report, encoding="utf-8") as f:
+        print("\nfailure report:", json.dumps(json.load(f)["failures"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Per-request logging overhead: the same in-process requests (through the
+app's log_requests middleware plus one INFO line in the handler) with
+logging disabled, written synchronously by the caller (the old setup),
+and handed to the background writer as text / JSON, with and without
+sampling. Console output goes to /dev/null so only the logging work is
+measured, not the terminal; `--write-latency-ms` adds a stall to every
+log file write, like a busy disk or a rotation would.
+
+    python -m benchmarks.bench_logging --requests 3000 --concurrency 32
+    python -m benchmarks.bench_logging --write-latency-ms 1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from benchmarks._common import percentile, print_table, temp_environment
+
+
+async def drive(app, n_requests, concurrency):
+    import httpx
+
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker(n):
+            for i in range(n, n_requests, concurrency):
+                started = time.perf_counter()
+                (await client.get(f"/bench/ping/{i}")).raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    parser.add_argument("--write-latency-ms", type=float, default=0.0, help="simulated stall per log file write")
+    args = parser.parse_args()
+
+    temp_environment("chatz_logging_")
+
+    if args.write_latency_ms:
+        from logging.handlers import RotatingFileHandler
+
+        emit = RotatingFileHandler.emit
+
+        def slow_emit(self, record):
+            time.sleep(args.write_latency_ms / 1000)
+            emit(self, record)
+
+        RotatingFileHandler.emit = slow_emit
+
+    from backend import config
+    from backend import main as app_module
+
+    app = app_module.app
+    logger = logging.getLogger("BenchRouter")
+
+    @app.get("/bench/ping/{n}")
+    async def ping(n: int):
+        logger.info("🏓 Ping %d: question=%.200s", n, "what does the contract say about late payment " * 3)
+        return {"n": n}
+
+    def configure(enabled=True, async_=True, fmt="text", sample_rate=1.0):
+        root = logging.getLogger()
+        config.shutdown_logging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        # A fresh /dev/null per setup: the console handler's wrapper closes its stream once dropped
+        sys.stderr = open(os.devnull, "w", encoding="utf-8")
+        app_module.LOG_SAMPLE_RATE = sample_rate
+        if not enabled:
+            root.setLevel(logging.CRITICAL)
+            return
+        config.LOG_ASYNC, config.LOG_FORMAT = async_, fmt
+        config.setup_logging()
+
+    cases = [
+        ("logging disabled", {"enabled": False}),
+        ("sync handlers, text (old)", {"async_": False}),
+        ("queue writer, text", {}),
+        ("queue writer, json", {"fmt": "json"}),
+        (f"queue writer, json, sample {args.sample_rate:g}", {"fmt": "json", "sample_rate": args.sample_rate}),
+    ]
+
+    rows, baseline = [], None
+    for label, options in cases:
+        configure(**options)
+        asyncio.run(drive(app, min(500, args.requests), args.concurrency))  # warm up
+        latencies, elapsed = asyncio.run(drive(app, args.requests, args.concurrency))
+        per_request = elapsed / args.requests * 1e6
+        baseline = baseline or per_request
+        rows.append((label, f"{args.requests / elapsed:.0f}", f"{per_request:.0f}", f"{per_request - baseline:+.0f}",
+                     f"{percentile(latencies, 50) * 1000:.2f}", f"{percentile(latencies, 99) * 1000:.2f}"))
+    configure(enabled=False)
+
+    print(f"{args.requests} requests, {args.concurrency} concurrent, in-process ASGI, "
+          f"{args.write_latency_ms:g} ms per log file write\n")
+    print_table(["logging", "req/s", "µs/request", "vs disabled", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
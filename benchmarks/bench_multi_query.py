@@ -0,0 +1,75 @@
+"""
+Multi-document retrieval latency as the collection grows: one `$in`
+vector search (retrieve_multi) vs. one search per file, for a fixed set
+of files to ask about, and one unfiltered search over every file.
+
+    python -m benchmarks.bench_multi_query --files 100 1000 3000 --chunks-per-file 5 --ask 10
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import HashingEmbedder, percentile, print_table, synthetic_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 1000, 3000])
+    parser.add_argument("--chunks-per-file", type=int, default=5)
+    parser.add_argument("--ask", type=int, default=10, help="files named in each multi-document query")
+    parser.add_argument("--queries", type=int, default=30)
+    args = parser.parse_args()
+
+    import chromadb
+    from backend import retrieval
+
+    embedder = HashingEmbedder(latency=0.0)
+    rng = random.Random(7)
+    texts = synthetic_chunks(200)
+    rows = []
+
+    for n_files in args.files:
+        collection = chromadb.EphemeralClient().get_or_create_collection(
+            name=f"bench_multi_{n_files}", metadata={"hnsw:space": "cosine"}
+        )
+        ids, documents, metadatas = [], [], []
+        for f in range(n_files):
+            for c in range(args.chunks_per_file):
+                ids.append(f"file{f}_chunk_{c}")
+                documents.append(f"file {f} {texts[(f * 7 + c) % len(texts)]}")
+                metadatas.append({"file_id": f"file{f}", "chunk_id": c})
+        vectors = embedder.embed_documents(documents)
+        for start in range(0, len(ids), 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000],
+                           documents=documents[start:start + 5000], metadatas=metadatas[start:start + 5000])
+
+        multi, per_file, everything = [], [], []
+        for q in range(args.queries):
+            asked = [f"file{i}" for i in rng.sample(range(n_files), min(args.ask, n_files))]
+            question = f"payment clause delivery {q}"
+            query_embedding = embedder.embed_query(question)
+
+            start = time.perf_counter()
+            retrieval.retrieve_multi(collection, asked, question, None, query_embedding=query_embedding)
+            multi.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for file_id in asked:
+                retrieval._vector_search(collection, file_id, query_embedding, retrieval.MULTI_PER_FILE)
+            per_file.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            retrieval.retrieve_multi(collection, None, question, None, query_embedding=query_embedding)
+            everything.append(time.perf_counter() - start)
+
+        for label, values in ((f"one $in search ({args.ask} files)", multi),
+                              (f"{args.ask} per-file searches", per_file),
+                              ("one search, all files", everything)):
+            rows.append((n_files, n_files * args.chunks_per_file, label,
+                         f"{percentile(values, 50) * 1000:.1f}", f"{percentile(values, 95) * 1000:.1f}"))
+
+    print_table(["files", "chunks", "retrieval", "p50 ms", "p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
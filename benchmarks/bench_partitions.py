@@ -0,0 +1,94 @@
+"""
+Single-file query latency (p50/p99) and recall@k against corpus size for
+each vector storage layout: one shared collection filtered by file_id,
+files hashed into `--buckets` collections, and one collection per file.
+Recall is measured against an exact (brute-force) top-k within the file.
+
+    python -m benchmarks.bench_partitions --files 100 1000 2000 --chunks-per-file 20 --buckets 64
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import HashingEmbedder, percentile, print_table, synthetic_chunks, temp_environment
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    parser.add_argument("--buckets", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    temp_environment("chatz_partitions_")
+
+    import chromadb
+    import numpy as np
+    from backend import partitions, retrieval
+
+    partitions.VECTOR_BUCKETS = args.buckets
+    embedder = HashingEmbedder(latency=0.0)
+    rng = random.Random(3)
+    texts = synthetic_chunks(500)
+    rows = []
+
+    for n_files in args.files:
+        file_ids = [f"file{f:05d}" for f in range(n_files)]
+        chunks = {
+            file_id: [f"{file_id} {texts[rng.randrange(len(texts))]} {rng.random():.6f}" for _ in range(args.chunks_per_file)]
+            for file_id in file_ids
+        }
+        vectors = {file_id: embedder.embed_documents(documents) for file_id, documents in chunks.items()}
+        questions = [(rng.choice(file_ids), f"payment clause delivery {q}") for q in range(args.queries)]
+
+        # Exact top-k within each asked file, for recall
+        exact = {}
+        for file_id, question in questions:
+            scores = np.asarray(vectors[file_id]) @ np.asarray(embedder.embed_query(question))
+            exact[(file_id, question)] = {f"{file_id}_{i}" for i in np.argsort(-scores)[:args.top_k]}
+
+        for layout in ("single", "bucket", "file"):
+            client = chromadb.EphemeralClient()
+            grouped = {}
+            for file_id in file_ids:
+                grouped.setdefault(f"{partitions.partition_for_layout(file_id, layout).name}_{n_files}", []).append(file_id)
+
+            collections = {}
+            started = time.perf_counter()
+            for name, members in grouped.items():
+                collection = collections[name] = client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+                ids, embeddings, documents, metadatas = [], [], [], []
+                for file_id in members:
+                    ids += [f"{file_id}_{i}" for i in range(args.chunks_per_file)]
+                    embeddings += vectors[file_id]
+                    documents += chunks[file_id]
+                    metadatas += [{"file_id": file_id, "chunk_id": i} for i in range(args.chunks_per_file)]
+                for start in range(0, len(ids), 5000):
+                    end = start + 5000
+                    collection.add(ids=ids[start:end], embeddings=embeddings[start:end],
+                                   documents=documents[start:end], metadatas=metadatas[start:end])
+            build = time.perf_counter() - started
+
+            latencies, recall = [], []
+            for file_id, question in questions:
+                partition = partitions.partition_for_layout(file_id, layout)
+                collection = collections[f"{partition.name}_{n_files}"]
+                query_embedding = embedder.embed_query(question)
+                started = time.perf_counter()
+                ids, _, _ = retrieval._vector_search(
+                    collection, file_id, query_embedding, args.top_k, shared=partition.shared
+                )
+                latencies.append(time.perf_counter() - started)
+                recall.append(len(set(ids) & exact[(file_id, question)]) / args.top_k)
+
+            rows.append((n_files, n_files * args.chunks_per_file, layout, len(collections),
+                         f"{build:.1f}", f"{percentile(latencies, 50) * 1000:.2f}",
+                         f"{percentile(latencies, 99) * 1000:.2f}", f"{sum(recall) / len(recall):.3f}"))
+
+    print_table(["files", "chunks", "layout", "collections", "build s", "p50 ms", "p99 ms", f"recall@{args.top_k}"], rows)
+
+
+if __name__ == "__main__":
+    main()
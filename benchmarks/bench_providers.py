@@ -0,0 +1,67 @@
+"""
+Embedding throughput (chunks/sec through EmbeddingEngine) and question
+embedding latency per provider: the remote API (simulated with
+`--remote-latency` seconds per call), the local hashing vectorizer and,
+when the package is installed, a local sentence-transformers model at
+each `--threads` setting.
+
+    python -m benchmarks.bench_providers --chunks 2000 --queries 200 --threads 1 4
+"""
+import argparse
+import time
+
+from benchmarks._common import FakeEmbedder, percentile, print_table, synthetic_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--remote-latency", type=float, default=0.15, help="simulated API seconds per call")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4], help="EMBED_THREADS for local models")
+    args = parser.parse_args()
+
+    from backend.embedding import EMBED_MAX_CONCURRENCY, EmbeddingEngine
+    from backend.embedding_providers import HashingEmbedder, SentenceTransformerEmbedder
+
+    # Unique texts: the engine would otherwise send each distinct text only once
+    texts = synthetic_chunks(args.chunks)
+    questions = [f"what does clause {i} say about payment terms" for i in range(args.queries)]
+
+    providers = [
+        (f"gemini (simulated {args.remote_latency * 1000:.0f} ms/call)",
+         lambda: FakeEmbedder(latency=args.remote_latency, per_text=0.0), EMBED_MAX_CONCURRENCY),
+        ("hashing", HashingEmbedder, 1),
+    ]
+    for threads in args.threads:
+        providers.append((f"sentence-transformers, {threads} thread(s)",
+                          lambda threads=threads: SentenceTransformerEmbedder(threads=threads), 1))
+
+    rows = []
+    for label, factory, concurrency in providers:
+        try:
+            embedder = factory()
+        except RuntimeError as e:
+            rows.append((label, "-", "-", "-", f"skipped: {e}"))
+            continue
+        engine = EmbeddingEngine(embedder, max_concurrency=concurrency)
+
+        started = time.perf_counter()
+        engine.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+
+        latencies = []
+        for question in questions[:args.queries if concurrency == 1 else 20]:
+            started = time.perf_counter()
+            engine.embed_query(question)
+            latencies.append(time.perf_counter() - started)
+        engine.shutdown()
+
+        rows.append((label, f"{len(texts) / elapsed:.0f}", f"{percentile(latencies, 50) * 1000:.2f}",
+                     f"{percentile(latencies, 99) * 1000:.2f}", ""))
+
+    print_table(["provider", "chunks/sec", "query p50 ms", "query p99 ms", "note"], rows)
+
+
+if __name__ == "__main__":
+    main()
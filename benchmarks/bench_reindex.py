@@ -0,0 +1,87 @@
+"""
+Re-embedding a document after a small edit: full re-embed (every chunk
+sent to the embedder again) vs. the incremental path, which only embeds
+chunks whose content changed and reuses the stored vectors of the rest.
+Also checks that no chunk of the old version is visible afterwards.
+
+    python -m benchmarks.bench_reindex --pages 500 --edited 5
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import FakeEmbedder, print_table, synthetic_chunks, temp_environment
+
+
+def fixture_pages(n_pages, rng):
+    sentences = synthetic_chunks(300)
+    return [" ".join(rng.choice(sentences) for _ in range(6)) + f" End of page {p + 1}." for p in range(n_pages)]
+
+
+def page_chunks(pages, chunk_document):
+    text, offsets = "", []
+    for page in pages:
+        offsets.append((len(text), len(text) + len(page)))
+        text += page + "\n\n"
+    return list(chunk_document(text, offsets))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--edited", type=int, default=5, help="pages changed between the two versions")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="simulated seconds per embedder call")
+    args = parser.parse_args()
+
+    temp_environment("chatz_reindex_")
+
+    import chromadb
+    from backend import resources
+    from backend.chunking import chunk_document
+    from backend.database import Base, SessionLocal, engine
+    from backend.embedding import EmbeddingEngine
+    from backend.indexing import index_chunks
+    from backend.models import FileInfo
+    from backend.retrieval import generation_where
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(5)
+    original = fixture_pages(args.pages, rng)
+    edited = list(original)
+    for page in rng.sample(range(args.pages), args.edited):
+        edited[page] = edited[page].replace("End of page", "Amended page")
+
+    rows = []
+    for label, full in (("full re-embed", True), ("incremental", False)):
+        embedder = FakeEmbedder(latency=args.embed_latency, per_text=0.0002)
+        collection = chromadb.EphemeralClient().get_or_create_collection(
+            name=f"bench_reindex_{int(full)}", metadata={"hnsw:space": "cosine"}
+        )
+        # No embedding cache: measure what the re-index itself avoids
+        resources.override(embedding_engine=EmbeddingEngine(embedder), collection=collection)
+        file_id = f"bench_{int(full)}"
+        with SessionLocal() as db:
+            db.add(FileInfo(file_id=file_id, file_name=f"{file_id}.pdf", num_pages=args.pages))
+            db.commit()
+
+        index_chunks(file_id, page_chunks(original, chunk_document))
+        embedder.calls = 0
+        sent = []
+        embed_documents = embedder.embed_documents
+        embedder.embed_documents = lambda texts: sent.append(len(texts)) or embed_documents(texts)
+
+        started = time.perf_counter()
+        stats = index_chunks(file_id, page_chunks(edited, chunk_document), full=full)
+        elapsed = time.perf_counter() - started
+
+        visible = collection.get(where=generation_where(file_id, stats["generation"]), include=["documents"])
+        expected = {c.text for c in page_chunks(edited, chunk_document)}
+        stale = sum(1 for document in visible["documents"] if document not in expected)
+        rows.append((label, stats["total_chunks"], sum(sent), embedder.calls,
+                     stats["removed_chunks"], stale, f"{elapsed * 1000:.0f}"))
+
+    print_table(["re-index", "chunks", "texts embedded", "embed calls", "removed", "stale visible", "time ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Prompt size, answer coverage and end-to-end latency of the query
+pipeline before (top 3 chunks verbatim) and after reranking + token
+budget packing, on a contract-like document chunked with fixed token
+windows and with sentence chunks.
+
+The fake chat model charges `--prefill` seconds per prompt word, so
+smaller prompts show up as lower latency.
+
+    python -m benchmarks.bench_rerank --paragraphs 400 --queries 100 --budget 600
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import FakeChatModel, HashingEmbedder, percentile, print_table, temp_environment
+
+
+def fixture_document(n_paragraphs, rng):
+    filler = ("the supplier shall deliver goods under this agreement and the buyer shall pay "
+              "all invoices within the agreed payment term subject to warranty and liability").split()
+    paragraphs, facts = [], []
+    for i in range(n_paragraphs):
+        part, price = f"PN-{10000 + i}", rng.randint(10, 999)
+        body = " ".join(rng.choice(filler) for _ in range(60))
+        paragraphs.append(f"Clause {i + 1}. {body}. Part {part} is priced at {price} USD. {body}.")
+        facts.append((part, f"{part} is priced at {price} USD"))
+    return "\n\n".join(paragraphs), facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--budget", type=int, default=600, help="context token budget")
+    parser.add_argument("--candidates", type=int, default=12)
+    parser.add_argument("--prefill", type=float, default=0.0005, help="simulated LLM seconds per prompt word")
+    args = parser.parse_args()
+
+    temp_environment("chatz_rerank_")
+
+    import chromadb
+    from backend import rerank, retrieval
+    from backend.chunking import chunk_document, count_tokens
+    from backend.lexical_index import build_index
+    from backend.routers.query import build_prompt
+
+    rng = random.Random(11)
+    text, facts = fixture_document(args.paragraphs, rng)
+    embedder = HashingEmbedder(latency=0.0)
+    model = FakeChatModel(tokens=40, ttft=0.05, per_token=0.0, per_prompt_token=args.prefill)
+    questions = rng.sample(facts, min(args.queries, len(facts)))
+    rows = []
+
+    for strategy in ("fixed", "sentence"):
+        chunks = list(chunk_document(text, strategy=strategy))
+        file_id = f"bench_{strategy}"
+        ids = [f"{file_id}_chunk_{i}" for i in range(len(chunks))]
+        collection = chromadb.EphemeralClient().get_or_create_collection(
+            name=f"bench_rerank_{strategy}", metadata={"hnsw:space": "cosine"}
+        )
+        collection.add(
+            ids=ids,
+            embeddings=embedder.embed_documents([c.text for c in chunks]),
+            documents=[c.text for c in chunks],
+            metadatas=[{"file_id": file_id, "chunk_id": i, "char_start": c.start, "char_end": c.end, "tokens": c.tokens}
+                       for i, c in enumerate(chunks)],
+        )
+        build_index(file_id, ids, [c.text for c in chunks])
+
+        for label, reranked in (("top 3 verbatim", False), (f"rerank, {args.budget}-token budget", True)):
+            tokens, latencies, found = [], [], 0
+            for part, answer in questions:
+                question = f"What is the price of part {part}?"
+                start = time.perf_counter()
+                if reranked:
+                    cand_ids, documents, metadatas, _ = retrieval.retrieve_candidates(
+                        collection, file_id, question, embedder.embed_query, top_k=args.candidates)
+                    passages = rerank.rerank(question, cand_ids, documents, metadatas, budget=args.budget)
+                    context = "\n\n".join(p.text for p in passages)
+                else:
+                    _, documents, _ = retrieval.retrieve(collection, file_id, question, embedder.embed_query, top_k=3)
+                    context = "\n\n".join(documents)
+                model.invoke(build_prompt(context, question))
+                latencies.append(time.perf_counter() - start)
+                tokens.append(count_tokens(context))
+                found += answer in context
+
+            rows.append((f"{strategy} ({len(chunks)} chunks)", label,
+                         f"{percentile(tokens, 50):.0f}", f"{max(tokens)}",
+                         f"{found / len(questions):.0%}",
+                         f"{percentile(latencies, 50) * 1000:.0f}", f"{percentile(latencies, 95) * 1000:.0f}"))
+
+    print_table(["chunking", "context", "ctx tokens p50", "max", "answer in ctx", "e2e p50 ms", "e2e p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Retention and compaction on a persistent store: `--files` files of
+`--chunks-per-file` chunks in one shared Chroma collection (plus their
+file_info / jobs rows), of which `--expired` share is past the retention
+age. Reports filtered single-file query latency, Chroma / SQLite size on
+disk before and after, delete throughput, and query latency measured by a
+concurrent query loop while retention and compaction run (they must not
+stall live queries).
+
+    python -m benchmarks.bench_retention --files 1000 --chunks-per-file 20 --expired 0.8
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._common import HashingEmbedder, percentile, print_table, synthetic_chunks, temp_environment
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--chunks-per-file", type=int, default=20)
+    parser.add_argument("--expired", type=float, default=0.8, help="share of files older than the retention age")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = temp_environment("chatz_retention_")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOCK_DIR", f"{workdir}/locks")
+    os.environ.setdefault("COMPACT_STORE_DIR", f"{workdir}/compact_store")
+    chroma_dir = f"{workdir}/chroma_db"
+    db_path = os.environ["DATABASE_URL"].replace("sqlite:///", "")
+
+    import chromadb
+    from backend import resources, retention, retrieval
+    from backend.database import SessionLocal, engine
+    from backend.migrations import run_migrations
+    from backend.models import FileInfo, Job
+
+    run_migrations(engine)
+    resources.override(chroma_client=chromadb.PersistentClient(path=chroma_dir))
+    collection = resources.get_collection()
+    embedder = HashingEmbedder(dim=args.dim, latency=0.0)
+    rng = random.Random(7)
+    texts = synthetic_chunks(500)
+
+    # 1️⃣ Corpus: expired files first, each with a few finished jobs like real ingests leave behind
+    now = datetime.utcnow()
+    n_expired = int(args.files * args.expired)
+    file_ids = [f"file{f:06d}" for f in range(args.files)]
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        for f, file_id in enumerate(file_ids):
+            age = timedelta(days=400 if f < n_expired else 1, seconds=f)
+            db.add(FileInfo(file_id=file_id, file_name=f"{file_id}.pdf", num_pages=10, uploaded_at=now - age,
+                            embedding_status=True, active_generation=1))
+            db.add_all(Job(job_id=f"{file_id}-{kind}", file_id=file_id, kind=kind, status="done", stage="done",
+                           result=json.dumps({"text": "x" * 2000})) for kind in ("extract", "embed", "ingest"))
+        db.commit()
+    for start in range(0, len(file_ids), 100):
+        ids, documents, metadatas = [], [], []
+        for file_id in file_ids[start:start + 100]:
+            for i in range(args.chunks_per_file):
+                ids.append(f"{file_id}_{i}")
+                documents.append(f"{file_id} {texts[rng.randrange(len(texts))]}")
+                metadatas.append({"file_id": file_id, "chunk_id": i, "gen_min": 1, "gen_max": 1})
+        collection.add(ids=ids, embeddings=embedder.embed_documents(documents), documents=documents, metadatas=metadatas)
+    print(f"Built {args.files} files x {args.chunks_per_file} chunks in {time.perf_counter() - started:.1f} s")
+
+    kept = file_ids[n_expired:]
+    questions = [(rng.choice(kept), embedder.embed_query(f"payment clause {q}")) for q in range(args.queries)]
+
+    def run_queries(latencies, stop=None):
+        for q in range(10 ** 9 if stop else len(questions)):
+            if stop is not None and stop.is_set():
+                break
+            file_id, embedding = questions[q % len(questions)]
+            started = time.perf_counter()
+            retrieval._vector_search(collection, file_id, embedding, 5, generation=1)
+            latencies.append(time.perf_counter() - started)
+
+    def measure(label, action=None):
+        latencies, stop = [], threading.Event()
+        elapsed = None
+        if action is None:
+            run_queries(latencies)
+        else:
+            loop = threading.Thread(target=run_queries, args=(latencies, stop))
+            loop.start()
+            started = time.perf_counter()
+            action()
+            elapsed = time.perf_counter() - started
+            stop.set()
+            loop.join()
+        engine.dispose()
+        rows.append((
+            label,
+            f"{dir_size(chroma_dir) / 1e6:.1f}",
+            f"{sum(os.path.getsize(p) for p in (db_path, db_path + '-wal') if os.path.exists(p)) / 1e6:.1f}",
+            len(latencies),
+            f"{percentile(latencies, 50) * 1000:.2f}",
+            f"{percentile(latencies, 99) * 1000:.2f}",
+            "" if elapsed is None else f"{elapsed:.2f}",
+        ))
+
+    rows, results = [], {}
+    measure("before (idle)")
+    measure("during retention", lambda: results.update(
+        retention=retention.apply_retention(max_age_days=365, unused_days=0)))
+    measure("after retention (idle)")
+    measure("during compaction", lambda: results.update(compaction=retention.compact()))
+    measure("after compaction (idle)")
+
+    deleted = len(results["retention"]["deleted"])
+    seconds = float(rows[1][-1])
+    print(f"Retention deleted {deleted} file(s), {results['retention']['chunks_deleted']} chunk(s): "
+          f"{deleted / seconds:.0f} files/s")
+    print(f"Compaction: {results['compaction']}\n")
+    print_table(["phase", "chroma MB", "sqlite MB", "queries", "p50 ms", "p99 ms", "action s"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Retrieval quality (recall@k) and latency of vector, lexical and hybrid
+retrieval on a fixture corpus of contract-like chunks, each with a unique
+part number and clause id. Questions ask about those exact terms.
+
+    python -m benchmarks.bench_retrieval --chunks 500 --queries 100 --embed-latency 0.15
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks._common import HashingEmbedder, percentile, print_table
+
+
+def fixture_corpus(n_chunks, rng):
+    filler = ("the supplier shall deliver goods under this agreement and the buyer shall pay "
+              "all invoices within the agreed payment term subject to warranty and liability").split()
+    chunks, facts = [], []
+    for i in range(n_chunks):
+        part = f"PN-{10000 + i}"
+        clause = f"{1 + i // 20}.{1 + i % 20}"
+        price = rng.randint(10, 999)
+        body = " ".join(rng.choice(filler) for _ in range(90))
+        chunks.append(f"Clause {clause}: {body}. Part {part} is priced at {price} USD. {body}")
+        facts.append((part, clause))
+    return chunks, facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--embed-latency", type=float, default=0.15, help="simulated remote embedding call")
+    args = parser.parse_args()
+
+    os.environ["LEXICAL_INDEX_DIR"] = tempfile.mkdtemp(prefix="chatz_lexical_")
+
+    import chromadb
+    from backend import retrieval
+    from backend.lexical_index import build_index
+
+    rng = random.Random(7)
+    chunks, facts = fixture_corpus(args.chunks, rng)
+    ids = [f"bench_chunk_{i}" for i in range(len(chunks))]
+
+    embedder = HashingEmbedder(dim=256, latency=0.0)
+    collection = chromadb.EphemeralClient().get_or_create_collection(
+        name="bench_retrieval", metadata={"hnsw:space": "cosine"}
+    )
+    collection.add(ids=ids, embeddings=embedder.embed_documents(chunks), documents=chunks,
+                   metadatas=[{"file_id": "bench", "chunk_id": i} for i in range(len(chunks))])
+    build_index("bench", ids, chunks)
+
+    remote = HashingEmbedder(dim=256, latency=args.embed_latency)
+    targets = rng.sample(range(len(chunks)), min(args.queries, len(chunks)))
+    questions = []
+    for i in targets:
+        part, clause = facts[i]
+        question = f"What is the price of part {part}?" if rng.random() < 0.5 else f"What does clause {clause} say?"
+        questions.append((question, ids[i]))
+
+    rows = []
+    for mode in retrieval.MODES:
+        hits, latencies = 0, []
+        for question, gold in questions:
+            start = time.perf_counter()
+            found, _, _ = retrieval.retrieve(collection, "bench", question, remote.embed_query,
+                                             mode=mode, top_k=args.k)
+            latencies.append(time.perf_counter() - start)
+            hits += gold in found
+        rows.append((mode, f"{hits / len(questions):.3f}", f"{percentile(latencies, 50) * 1000:.1f}",
+                     f"{percentile(latencies, 99) * 1000:.1f}", remote.query_calls))
+        remote.query_calls = 0
+
+    print(f"{len(chunks)} chunks, {len(questions)} exact-term questions\n")
+    print_table(["mode", f"recall@{args.k}", "p50 ms", "p99 ms", "embed calls"], rows)
+
+
+if __name__ == "__main__":
+    main()
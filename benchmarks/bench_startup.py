@@ -0,0 +1,83 @@
+"""
+Cold start and per-request client overhead.
+
+Cold start is the import time of backend.main in a fresh interpreter (no
+client is created at import any more) plus the one-off cost of building the
+shared resources. Per-request overhead compares the old pattern - building
+the chat model, embedder and collection handle inside every request - with
+the shared resource getters. No network calls are made.
+
+    python -m benchmarks.bench_startup --requests 200
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks._common import print_table
+
+COLD_START = """
+import time
+started = time.perf_counter()
+import backend.main
+imported = time.perf_counter()
+from backend import resources
+resources.warm_up()
+print(imported - started, time.perf_counter() - imported)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="chatz_startup_")
+    env = {
+        **os.environ,
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "bench-key"),
+        "DATABASE_URL": f"sqlite:///{workdir}/files.db",
+        "LOG_DIR": f"{workdir}/logs",
+        "UPLOAD_DIR": f"{workdir}/uploaded_pdfs",
+        "EXTRACT_DIR": f"{workdir}/extracted_text",
+        "CHROMA_DIR": f"{workdir}/chroma_db",
+        "LEXICAL_INDEX_DIR": f"{workdir}/lexical_index",
+        "PYTHONPATH": os.getcwd(),
+    }
+    out = subprocess.run([sys.executable, "-c", COLD_START], env=env, cwd=workdir,
+                         capture_output=True, text=True, check=True).stdout.split()
+    import_s, warmup_s = float(out[-2]), float(out[-1])
+
+    os.environ.update(env)
+    import chromadb
+    from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+    from backend import resources
+
+    # Old pattern: new clients in every request
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        ChatGoogleGenerativeAI(model=resources.CHAT_MODEL)
+        GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+        chromadb.PersistentClient(path=env["CHROMA_DIR"]).get_or_create_collection(name="pdf_collection")
+    per_request_old = (time.perf_counter() - started) / args.requests
+
+    resources.warm_up()
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        resources.get_chat_model()
+        resources.get_embedding_engine()
+        resources.get_collection()
+    per_request_shared = (time.perf_counter() - started) / args.requests
+
+    print_table(["measurement", "ms"], [
+        ("import backend.main (cold)", f"{import_s * 1000:.0f}"),
+        ("build shared resources (once)", f"{warmup_s * 1000:.0f}"),
+        ("per-request clients, rebuilt", f"{per_request_old * 1000:.3f}"),
+        ("per-request clients, shared", f"{per_request_shared * 1000:.3f}"),
+    ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Time-to-first-token of POST /query/stream vs. full latency of POST /query/,
+with a fake streaming chat model and fake embedder.
+
+    python -m benchmarks.bench_streaming --runs 10 --ttft 0.3 --tokens 80
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks._common import (FakeChatModel, FakeEmbedder, ServerThread, percentile,
+                                print_table, synthetic_chunks, temp_environment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens", type=int, default=80)
+    parser.add_argument("--per-token", type=float, default=0.015)
+    args = parser.parse_args()
+
+    os.chdir(temp_environment("chatz_bench_"))
+
+    import chromadb
+    from backend import resources
+    from backend.embedding import EmbeddingEngine
+    from backend.routers import query
+
+    embedder = FakeEmbedder(latency=0.0)
+    collection = chromadb.EphemeralClient().get_or_create_collection(name="bench_streaming")
+    resources.override(embedding_engine=EmbeddingEngine(embedder), collection=collection)
+
+    chunks = synthetic_chunks(20)
+    collection.add(
+        ids=[f"bench_chunk_{i}" for i in range(len(chunks))],
+        embeddings=embedder.embed_documents(chunks),
+        documents=chunks,
+        metadatas=[{"file_id": "bench", "chunk_id": i} for i in range(len(chunks))],
+    )
+
+    app = FastAPI()
+    app.include_router(query.router)
+    model = FakeChatModel(tokens=args.tokens, ttft=args.ttft, per_token=args.per_token)
+    app.dependency_overrides[resources.get_chat_model] = lambda: model
+
+    blocking, first_token, streamed = [], [], []
+    with ServerThread(app) as server, httpx.Client(base_url=server.url, timeout=60) as client:
+        for i in range(args.runs):
+            body = {"question": f"payment terms {i}", "file_id": "bench"}
+
+            start = time.perf_counter()
+            client.post("/query/", json=body).raise_for_status()
+            blocking.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with client.stream("POST", "/query/stream", json=body) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if line.startswith("event: token") and len(first_token) == i:
+                        first_token.append(time.perf_counter() - start)
+            streamed.append(time.perf_counter() - start)
+
+    rows = [
+        ("POST /query/ (answer)", f"{percentile(blocking, 50) * 1000:.0f}", f"{percentile(blocking, 95) * 1000:.0f}"),
+        ("POST /query/stream (first token)", f"{percentile(first_token, 50) * 1000:.0f}", f"{percentile(first_token, 95) * 1000:.0f}"),
+        ("POST /query/stream (complete)", f"{percentile(streamed, 50) * 1000:.0f}", f"{percentile(streamed, 95) * 1000:.0f}"),
+    ]
+    print_table(["perceived latency", "p50 ms", "p95 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
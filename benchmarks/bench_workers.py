@@ -0,0 +1,154 @@
+"""
+Multi-worker load test: POST /query/ throughput and latency against the
+number of uvicorn worker processes, all sharing one SQLite database (WAL)
+and one Chroma server (CHROMA_HOST), as in the multi-worker deployment.
+
+Embeddings use the local hashing provider and answers a fake chat model
+(`--ttft` seconds, default 0 so the server's own CPU work is what scales).
+Throughput can only scale up to the number of cores: the load generator
+runs on the same machine.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --clients 16 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks._common import percentile, print_table, synthetic_pdf, temp_environment
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait_until(check, timeout=60.0, what="service"):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{what} did not come up within {timeout:.0f}s")
+
+
+class Process:
+    """A subprocess for the duration of a `with` block."""
+
+    def __init__(self, args, ready, what):
+        self.args, self.ready, self.what = args, ready, what
+
+    def __enter__(self):
+        self.proc = subprocess.Popen(self.args, cwd=REPO_ROOT, env=os.environ.copy(),
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _wait_until(self.ready, what=self.what)
+        return self
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def uvicorn_server(port, workers):
+    import httpx
+
+    return Process(
+        [sys.executable, "-m", "uvicorn", "benchmarks._fake_app:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        lambda: httpx.get(f"http://127.0.0.1:{port}/metrics", timeout=2).status_code == 200,
+        f"uvicorn ({workers} workers)",
+    )
+
+
+async def query_load(url, file_ids, clients, duration):
+    """`clients` closed-loop clients asking back to back for `duration` seconds."""
+    import httpx
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client_loop(client, n):
+        i = 0
+        while time.perf_counter() < deadline:
+            file_id = file_ids[(n + i) % len(file_ids)]
+            started = time.perf_counter()
+            response = await client.post("/query/", json={"question": f"payment clause delivery {n}-{i}", "file_id": file_id})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            i += 1
+
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, n) for n in range(clients)))
+        return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--docs", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--ttft", type=float, default=0.0, help="simulated LLM latency, seconds")
+    parser.add_argument("--port", type=int, default=8770)
+    parser.add_argument("--chroma-port", type=int, default=8771)
+    args = parser.parse_args()
+
+    workdir = temp_environment("chatz_workers_")
+    os.environ.update({
+        "EMBED_PROVIDER": "hashing",
+        "ANSWER_CACHE_ENABLED": "false",
+        "EMBED_CACHE_ENABLED": "false",
+        "CHROMA_HOST": "127.0.0.1",
+        "CHROMA_PORT": str(args.chroma_port),
+        "LOCK_DIR": f"{workdir}/locks",
+        "INGEST_REPORT_DIR": f"{workdir}/ingest_reports",
+        "BENCH_TTFT": str(args.ttft),
+    })
+
+    import chromadb
+    import httpx
+
+    url = f"http://127.0.0.1:{args.port}"
+    chroma = Process(
+        [os.path.join(os.path.dirname(sys.executable), "chroma"), "run", "--path", f"{workdir}/chroma_db",
+         "--port", str(args.chroma_port)],
+        lambda: chromadb.HttpClient(host="127.0.0.1", port=args.chroma_port).heartbeat(),
+        "chroma server",
+    )
+    rows = []
+    with chroma:
+        # 1️⃣ Seed: upload, extract and embed a few documents through one worker
+        with uvicorn_server(args.port, 1), httpx.Client(base_url=url, timeout=600) as client:
+            file_ids = []
+            for i in range(args.docs):
+                path = synthetic_pdf(os.path.join(workdir, f"doc{i}.pdf"), pages=args.pages, lines_per_page=40 + i)
+                with open(path, "rb") as f:
+                    file_id = client.post("/upload/upload_file", files={"file": (f"doc{i}.pdf", f, "application/pdf")}).json()["file_id"]
+                client.get(f"/extract/{file_id}").raise_for_status()
+                client.post(f"/embed/{file_id}").raise_for_status()
+                file_ids.append(file_id)
+
+        # 2️⃣ Same data, same load, more worker processes
+        for workers in args.workers:
+            with uvicorn_server(args.port, workers):
+                asyncio.run(query_load(url, file_ids, args.clients, min(2.0, args.duration)))  # warm every worker up
+                latencies, elapsed = asyncio.run(query_load(url, file_ids, args.clients, args.duration))
+            qps = len(latencies) / elapsed
+            rows.append((workers, len(latencies), f"{qps:.1f}",
+                         f"{qps / float(rows[0][2]):.2f}x" if rows else "1.00x",
+                         f"{percentile(latencies, 50) * 1000:.1f}", f"{percentile(latencies, 99) * 1000:.1f}"))
+
+    print(f"{args.clients} clients, {args.docs} documents x {args.pages} pages, {os.cpu_count()} CPU(s)\n")
+    print_table(["workers", "queries", "qps", "speedup", "p50 ms", "p99 ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import streamlit as st
 import requests
+import json
+import time
 
 API_URL = "http://127.0.0.1:8000"
+POLL_INTERVAL = 1.0
 
 st.set_page_config(page_title="ChatZ", layout="wide")
 st.title("📚 ChatZ – PDF AI Assistant")
@@ -43,6 +46,58 @@ def restrict(page):
             st.error("✔ Embeddings ready. Access allowed only to Query page.")
             st.stop()
 
+# ----------------------------
+# BACKGROUND JOBS
+# ----------------------------
+
+def run_job(kind, file_id):
+    """Submit a background job and poll it until it finishes. Returns the final job dict."""
+    resp = requests.post(f"{API_URL}/jobs/", json={"file_id": file_id, "kind": kind})
+    if resp.status_code != 200:
+        st.error(resp.text)
+        return None
+
+    job = resp.json()
+    bar = st.progress(0.0, text="⏳ Queued...")
+
+    while job["status"] in ("queued", "running"):
+        time.sleep(POLL_INTERVAL)
+        resp = requests.get(f"{API_URL}/jobs/{job['job_id']}")
+        if resp.status_code != 200:
+            st.error(resp.text)
+            return None
+        job = resp.json()
+
+        if job["stage"] == "extracting" and job["pages_total"]:
+            bar.progress(job["pages_done"] / job["pages_total"],
+                         text=f"📑 Extracting page {job['pages_done']}/{job['pages_total']}")
+        elif job["stage"] == "embedding" and job["chunks_total"]:
+            bar.progress(job["chunks_embedded"] / job["chunks_total"],
+                         text=f"🧠 Embedded {job['chunks_embedded']}/{job['chunks_total']} chunks")
+        elif job["stage"] == "chunking":
+            bar.progress(0.0, text="✂️ Chunking text...")
+
+    if job["status"] == "failed":
+        bar.empty()
+        st.error(job["error"])
+        return None
+
+    bar.progress(1.0, text="✅ Done")
+    return job
+
+def iter_sse(resp):
+    """Yield (event, data) pairs from a Server-Sent Events response."""
+    event, data = "message", ""
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads(data)
+            event, data = "message", ""
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data += line[len("data:"):].strip()
+
 # Sidebar Navigation
 page = st.sidebar.radio("Navigation", ["Upload", "Extract", "Embed", "Query"])
 st.sidebar.markdown("### 📘 User Manual")
@@ -63,20 +118,34 @@ restrict(page)
 if page == "Upload":
     st.header("📤 Upload PDF")
 
-    # ---- Fetch existing uploaded PDFs from DB ----
+    # ---- Show dropdown of uploaded PDFs ----
+    st.subheader("📂 Existing Uploaded PDFs")
+
+    name_prefix = st.text_input("Filter by file name (starts with):")
+    if st.session_state.get("list_prefix") != name_prefix:
+        st.session_state.list_prefix = name_prefix
+        st.session_state.list_pages = 1
+
+    # ---- Fetch existing uploaded PDFs from DB, one page at a time ----
+    pdf_files, next_cursor = [], None
     try:
-        list_resp = requests.get(f"{API_URL}/upload/list_files")
-        if list_resp.status_code == 200:
-            pdf_files = list_resp.json()
-        else:
-            pdf_files = []
-            st.warning("Could not load existing files.")
+        for _ in range(st.session_state.get("list_pages", 1)):
+            params = {"name_prefix": name_prefix or None, "cursor": next_cursor}
+            list_resp = requests.get(f"{API_URL}/upload/list_files", params=params)
+            if list_resp.status_code != 200:
+                st.warning("Could not load existing files.")
+                break
+            page_data = list_resp.json()
+            pdf_files += page_data["files"]
+            next_cursor = page_data["next_cursor"]
+            if not next_cursor:
+                break
     except:
-        pdf_files = []
         st.warning("Server not reachable.")
 
-    # ---- Show dropdown of uploaded PDFs ----
-    st.subheader("📂 Existing Uploaded PDFs")
+    if next_cursor and st.button("Load more files"):
+        st.session_state.list_pages = st.session_state.get("list_pages", 1) + 1
+        st.rerun()
 
     if pdf_files:
         # Dropdown list of file names
@@ -91,6 +160,17 @@ if page == "Upload":
 
             st.info("### File Metadata")
             st.json(selected_file)
+
+            # ---- Delete the file with its vectors ----
+            if st.button("🗑️ Delete File"):
+                del_resp = requests.delete(f"{API_URL}/upload/{selected_file['file_id']}")
+                if del_resp.status_code == 200:
+                    if st.session_state.get("file_id") == selected_file["file_id"]:
+                        st.session_state.file_id = None
+                        st.session_state.embeddings_done = False
+                    st.rerun()
+                else:
+                    st.error(del_resp.text)
     else:
         st.info("No files uploaded yet.")
 
@@ -129,17 +209,13 @@ elif page == "Extract":
     st.header("📑 Extract Text")
 
     if st.button("Extract Text"):
-        with st.spinner("⏳ Extracting text... Please wait"):
-            fid = st.session_state.file_id
-            resp = requests.get(f"{API_URL}/extract/{fid}")
+        job = run_job("extract", st.session_state.file_id)
 
-        if resp.status_code == 200:
-            data = resp.json()
+        if job:
+            data = job["result"]
             st.success("Text extracted!")
             st.text_area("Preview", data["preview_text"])
             st.session_state.extracted = True
-        else:
-            st.error(resp.text)
 
 # ----------------------------
 # PAGE: EMBED
@@ -151,15 +227,11 @@ elif page == "Embed":
         st.warning("Extract text first!")
     else:
         if st.button("Create Embeddings"):
-            with st.spinner("⏳ Creating AI embeddings... Please wait"):
-                fid = st.session_state.file_id
-                resp = requests.post(f"{API_URL}/embed/{fid}")
+            job = run_job("embed", st.session_state.file_id)
 
-            if resp.status_code == 200:
-                st.success("Embeddings created!")
+            if job:
+                st.success(f"Embeddings created! ({job['result']['total_chunks']} chunks)")
                 st.session_state.embeddings_done = True
-            else:
-                st.error(resp.text)
 
 
 
@@ -172,13 +244,22 @@ elif page == "Query":
     q = st.text_input("Your question:")
 
     if st.button("Ask"):
-        with st.spinner("⏳ Thinking... generating answer"):
-            fid = st.session_state.file_id
-            resp = requests.post(f"{API_URL}/query/", json={"question": q, "file_id": fid})
+        fid = st.session_state.file_id
+        placeholder = st.empty()
+        placeholder.info("⏳ Thinking... generating answer")
+
+        resp = requests.post(f"{API_URL}/query/stream", json={"question": q, "file_id": fid}, stream=True)
 
         if resp.status_code == 200:
-            data = resp.json()
-            st.success(data["answer"])
+            answer = ""
+            for event, data in iter_sse(resp):
+                if event == "token":
+                    answer += data["text"]
+                    placeholder.success(answer)
+                elif event == "error":
+                    placeholder.error(data["detail"])
+                    break
+            resp.close()
 
         else:
-            st.error(resp.text)
+            placeholder.error(resp.text)
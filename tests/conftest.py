@@ -0,0 +1,70 @@
+"""
+Offline test setup: every path and the database live in a temp dir, vectors
+come from EMBED_PROVIDER=hashing, Chroma runs in memory and the chat model
+is a local stand-in, so the suite needs no network and no API key.
+"""
+import os
+import tempfile
+
+import pytest
+
+# Backend modules read their settings at import time: set them before any import
+_WORKDIR = tempfile.mkdtemp(prefix="chatz_tests_")
+for _name, _value in {
+    "EMBED_PROVIDER": "hashing",
+    "GOOGLE_API_KEY": "offline",
+    "ANONYMIZED_TELEMETRY": "False",
+    "DATABASE_URL": f"sqlite:///{_WORKDIR}/files.db",
+    "LOG_DIR": f"{_WORKDIR}/logs",
+    "LOG_LEVEL": "WARNING",
+    "UPLOAD_DIR": f"{_WORKDIR}/uploaded_pdfs",
+    "EXTRACT_DIR": f"{_WORKDIR}/extracted_text",
+    "LEXICAL_INDEX_DIR": f"{_WORKDIR}/lexical_index",
+    "COMPACT_STORE_DIR": f"{_WORKDIR}/compact_store",
+    "LOCK_DIR": f"{_WORKDIR}/locks",
+    "RESOURCES_WARMUP": "false",
+}.items():
+    os.environ[_name] = _value
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class RecordingChatModel:
+    """Answers with a fixed text and keeps every prompt, so tests can inspect the retrieved context."""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return _Message("offline answer")
+
+    async def astream(self, prompt):
+        self.prompts.append(prompt)
+        for word in ("offline ", "answer"):
+            yield _Message(word)
+
+
+@pytest.fixture(scope="session")
+def chat_model():
+    return RecordingChatModel()
+
+
+@pytest.fixture(scope="session")
+def client(chat_model):
+    import chromadb
+    from fastapi.testclient import TestClient
+    from backend import resources
+    from backend.main import app
+
+    resources.override(chroma_client=chromadb.EphemeralClient(), chat_model=chat_model)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def workdir():
+    return _WORKDIR
@@ -0,0 +1,50 @@
+import pytest
+
+from backend.chunking import STRATEGIES, chunk_document, count_tokens
+
+
+def make_document(pages=3, sentences=40):
+    texts = [
+        " ".join(f"Page {p} clause {s} sets the delivery terms for order {p}-{s}." for s in range(sentences))
+        for p in range(1, pages + 1)
+    ]
+    offsets, pos = [], 0
+    for page_text in texts:
+        offsets.append((pos, pos + len(page_text)))
+        pos += len(page_text) + 1
+    return "\n".join(texts), offsets
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_chunks_respect_budget_and_pages(strategy):
+    text, offsets = make_document()
+    chunks = list(chunk_document(text, offsets, strategy=strategy, max_tokens=50))
+
+    assert chunks
+    for chunk in chunks:
+        assert chunk.tokens == count_tokens(chunk.text) <= 50
+        assert text[chunk.start:chunk.end] == chunk.text
+        page_start, page_end = offsets[chunk.page - 1]
+        assert page_start <= chunk.start and chunk.end <= page_end
+
+
+def test_sentence_strategy_keeps_sentences_whole():
+    text, offsets = make_document(pages=1, sentences=10)
+    for chunk in chunk_document(text, offsets, strategy="sentence", max_tokens=40):
+        assert chunk.text.startswith("Page") and chunk.text.endswith(".")
+
+
+def test_fixed_windows_overlap():
+    text, _ = make_document(pages=1, sentences=5)
+    chunks = list(chunk_document(text, strategy="fixed", max_tokens=20, overlap_tokens=5))
+
+    assert all(chunk.page is None for chunk in chunks)
+    assert all(chunk.tokens == 20 for chunk in chunks[:-1])
+    assert chunks[1].start < chunks[0].end
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        list(chunk_document("text", strategy="words"))
+    with pytest.raises(ValueError):
+        list(chunk_document("text", max_tokens=0))
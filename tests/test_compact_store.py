@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from backend import compact_store
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(compact_store, "COMPACT_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def random_vectors(n, dim=64, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def write_file(file_id, vectors, generation=1, dtype="int8"):
+    ids = [f"{file_id}_{i}" for i in range(len(vectors))]
+    compact_store.write(file_id, generation, ids, [f"text {i}" for i in ids],
+                        [{"file_id": file_id, "gen_min": generation} for _ in ids], vectors, dtype=dtype)
+    return ids
+
+
+@pytest.mark.parametrize("dtype", compact_store.DTYPES)
+def test_quantized_search_recalls_exact_neighbours(store_dir, dtype):
+    vectors = random_vectors(2000)
+    write_file("f1", vectors, dtype=dtype)
+    index = compact_store.load("f1", 1)
+    queries = random_vectors(50, seed=1)
+
+    recall = []
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query))[:10])
+        found = {row for row, _ in index.search(query, 10)}
+        recall.append(len(exact & found) / 10)
+    assert np.mean(recall) >= 0.98
+
+
+def test_ivf_layout_keeps_rows_addressable(store_dir, monkeypatch):
+    monkeypatch.setattr(compact_store, "COMPACT_IVF_MIN_ROWS", 500)
+    vectors = random_vectors(1000)
+    ids = write_file("f1", vectors)
+    index = compact_store.load("f1", 1)
+    assert index.centroids is not None
+
+    # The stored row order changes, ids must still map to their own vectors
+    result = index.query([vectors[123].tolist()], n_results=1)
+    assert result["ids"] == [[ids[123]]]
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+    assert np.allclose(index.vectors([ids[7]])[ids[7]], vectors[7], atol=1e-6)
+
+
+def test_generations_are_separate_and_deletable(store_dir):
+    assert not compact_store.in_use()
+    write_file("f1", random_vectors(5), generation=1)
+    write_file("f1", random_vectors(3, seed=2), generation=2)
+
+    assert compact_store.in_use()
+    assert len(compact_store.load("f1", 1)) == 5
+    assert len(compact_store.load("f1", 2)) == 3
+    assert compact_store.load("f1", 0) is None
+
+    compact_store.delete("f1", 1)
+    assert compact_store.load("f1", 1) is None
+    assert compact_store.load("f1", 2).get(ids=["f1_0", "missing"])["documents"] == ["text f1_0"]
+
+
+@pytest.mark.parametrize("dtype", compact_store.DTYPES)
+def test_without_rescoring_no_float32_copy_is_written(store_dir, dtype):
+    vectors = random_vectors(500)
+    ids = [f"f1_{i}" for i in range(len(vectors))]
+    compact_store.write("f1", 1, ids, ids, [{"file_id": "f1"} for _ in ids], vectors, dtype=dtype, rescore=0)
+    assert not (store_dir / "f1.g1" / "full.npy").exists()
+
+    index = compact_store.load("f1", 1)
+    query = random_vectors(1, seed=1)[0]
+    hits = index.search(query, 10)
+    exact = set(np.argsort(-(vectors @ query))[:10])
+    assert len(exact & {row for row, _ in hits}) >= 8
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+    # The next generation reuses vectors decoded from the codes
+    reused = index.vectors(ids[:5])
+    assert list(reused) == ids[:5]
+    for row, chunk_id in enumerate(ids[:5]):
+        assert reused[chunk_id].dtype == np.float32
+        assert float(reused[chunk_id] @ vectors[row]) > 0.99
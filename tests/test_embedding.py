@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+from backend.embedding import EmbeddingEngine, is_rate_limit_error
+
+
+class CountingEmbedder:
+    """Returns [index] vectors, records batch sizes and the peak number of calls in flight."""
+
+    def __init__(self, latency=0.0, fail_times=0, error="429 RESOURCE_EXHAUSTED"):
+        self.latency = latency
+        self.fail_times = fail_times
+        self.error = error
+        self.batches = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(len(texts))
+            if self.fail_times:
+                self.fail_times -= 1
+                raise RuntimeError(self.error)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+        return [[float(t)] for t in texts]
+
+    def embed_query(self, text):
+        return [float(text)]
+
+
+def make_engine(embedder, **kwargs):
+    kwargs.setdefault("sleep", lambda _delay: None)
+    return EmbeddingEngine(embedder, **kwargs)
+
+
+def test_batches_keep_input_order():
+    embedder = CountingEmbedder()
+    engine = make_engine(embedder, batch_size=4, max_concurrency=3)
+    texts = [str(i) for i in range(10)]
+
+    progress = []
+    vectors = engine.embed_documents(texts, on_batch=progress.append)
+
+    assert vectors == [[float(i)] for i in range(10)]
+    assert sorted(embedder.batches) == [2, 4, 4]
+    assert progress[-1] == 10
+
+
+def test_concurrency_is_bounded():
+    embedder = CountingEmbedder(latency=0.02)
+    engine = make_engine(embedder, batch_size=1, max_concurrency=2)
+
+    engine.embed_documents([str(i) for i in range(8)])
+
+    assert embedder.peak == 2
+
+
+def test_rate_limits_are_retried_with_backoff():
+    delays = []
+    embedder = CountingEmbedder(fail_times=2)
+    engine = make_engine(embedder, batch_size=8, backoff_base=1.0, backoff_max=1.5, sleep=delays.append)
+
+    assert engine.embed_documents(["1", "2"]) == [[1.0], [2.0]]
+    assert len(delays) == 2
+    assert 0.5 <= delays[0] <= 1.0  # base * 2**0 with jitter
+    assert delays[1] <= 1.5  # capped by backoff_max
+
+
+def test_other_errors_and_exhausted_retries_raise():
+    engine = make_engine(CountingEmbedder(fail_times=1, error="invalid argument"))
+    with pytest.raises(RuntimeError, match="invalid argument"):
+        engine.embed_documents(["1"])
+
+    engine = make_engine(CountingEmbedder(fail_times=5), max_retries=2)
+    with pytest.raises(RuntimeError, match="429"):
+        engine.embed_documents(["1"])
+
+
+def test_rate_limit_detection():
+    assert is_rate_limit_error(RuntimeError("429 Too Many Requests"))
+    assert is_rate_limit_error(RuntimeError("Quota exceeded for metric"))
+    assert not is_rate_limit_error(ValueError("bad input"))
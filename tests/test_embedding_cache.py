@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.embedding import EmbeddingEngine
+from backend.embedding_cache import EmbeddingCache
+from backend.models import EmbeddingCacheEntry
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        self.texts.append(text)
+        return [float(len(text)), 0.0]
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/cache.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+def test_roundtrip_normalizes_whitespace(session_factory):
+    cache = EmbeddingCache(session_factory=session_factory)
+    cache.put_many("m", ["hello  world"], [[0.5, -1.0]])
+
+    assert cache.get_many("m", ["hello world", "other"]) == [[0.5, -1.0], None]
+    assert cache.get_many("other-model", ["hello world"]) == [None]
+    assert cache.get_many("m", ["hello world"], kind="query") == [None]
+    assert cache.stats()["hits"] == 1
+
+
+def test_evicts_least_recently_used(session_factory):
+    cache = EmbeddingCache(session_factory=session_factory, max_entries=2, touch_interval=0)
+    cache.put_many("m", ["a"], [[1.0]])
+    cache.put_many("m", ["b"], [[2.0]])
+    cache.get_many("m", ["a"])  # "b" is now the oldest
+    cache.put_many("m", ["c"], [[3.0]])
+
+    with session_factory() as db:
+        assert db.query(EmbeddingCacheEntry).count() == 2
+    assert cache.get_many("m", ["a", "b", "c"]) == [[1.0], None, [3.0]]
+
+
+def test_recent_hits_are_not_written_back(session_factory):
+    cache = EmbeddingCache(session_factory=session_factory, touch_interval=3600)
+    cache.put_many("m", ["a"], [[1.0]])
+    with session_factory() as db:
+        stored = db.query(EmbeddingCacheEntry.last_used_at).scalar()
+
+    assert cache.get_many("m", ["a"]) == [[1.0]]
+    with session_factory() as db:
+        assert db.query(EmbeddingCacheEntry.last_used_at).scalar() == stored
+
+def test_engine_only_embeds_unseen_texts(session_factory):
+    embedder = CountingEmbedder()
+    engine = EmbeddingEngine(embedder, cache=EmbeddingCache(session_factory=session_factory), model_name="m")
+
+    first = engine.embed_documents(["alpha", "beta", "alpha"])
+    assert embedder.texts == ["alpha", "beta"]
+
+    second = engine.embed_documents(["beta", "gamma"])
+    assert embedder.texts == ["alpha", "beta", "gamma"]
+    assert second[0] == first[1]
+
+    engine.embed_query("alpha")
+    engine.embed_query("alpha")
+    assert embedder.texts.count("alpha") == 2  # one document call, one query call
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.embedding_providers import provider_model
+from backend.migrations import run_migrations
+from backend.models import FileInfo, Job
+from backend.routers.upload import list_files_page
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path}/files.db", connect_args={"check_same_thread": False})
+
+
+@pytest.fixture
+def db(engine):
+    run_migrations(engine)
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+def add_files(db, count, start=datetime(2026, 1, 1)):
+    for i in range(count):
+        db.add(FileInfo(
+            file_id=f"file-{i:03d}",
+            file_name=f"{'report' if i % 2 else 'invoice'}-{i:03d}.pdf",
+            # Pairs share a timestamp, so the file_id tie-break matters
+            uploaded_at=start + timedelta(minutes=i // 2),
+            embedding_status=i % 3 == 0,
+            embedding_model=provider_model(),
+        ))
+    db.commit()
+
+
+def all_pages(db, **filters):
+    file_ids, cursor = [], None
+    while True:
+        page = list_files_page(db, limit=4, cursor=cursor, **filters)
+        file_ids.extend(f["file_id"] for f in page["files"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return file_ids
+
+
+def test_keyset_pages_cover_every_file_once_newest_first(db):
+    add_files(db, 11)
+    assert all_pages(db) == [f"file-{i:03d}" for i in reversed(range(11))]
+
+
+def test_new_uploads_do_not_shift_later_pages(db):
+    add_files(db, 8)
+    first = list_files_page(db, limit=4)
+    db.add(FileInfo(file_id="file-new", file_name="new.pdf", uploaded_at=datetime(2027, 1, 1)))
+    db.commit()
+
+    second = list_files_page(db, limit=4, cursor=first["next_cursor"])
+    assert [f["file_id"] for f in second["files"]] == ["file-003", "file-002", "file-001", "file-000"]
+
+
+def test_filters(db):
+    add_files(db, 9)
+    assert all_pages(db, embedded=True) == ["file-006", "file-003", "file-000"]
+    assert all(name.startswith("file-") for name in all_pages(db, embedded=False))
+    assert len(all_pages(db, embedded=False)) == 6
+    assert all_pages(db, name_prefix="report") == ["file-007", "file-005", "file-003", "file-001"]
+
+
+def test_legacy_string_dates_are_migrated(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE file_info (file_id VARCHAR PRIMARY KEY, file_name VARCHAR, num_pages INTEGER, "
+            "uploaded_at VARCHAR, embedding_status BOOLEAN)"
+        ))
+        conn.execute(text(
+            "INSERT INTO file_info VALUES ('old', 'old.pdf', 1, '2024-05-01T10:30:00', 1), "
+            "('undated', 'undated.pdf', 1, NULL, 0)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE jobs (job_id VARCHAR PRIMARY KEY, file_id VARCHAR NOT NULL, kind VARCHAR NOT NULL, "
+            "status VARCHAR, created_at VARCHAR, updated_at VARCHAR)"
+        ))
+        conn.execute(text(
+            "INSERT INTO jobs (job_id, file_id, kind, status, created_at) "
+            "VALUES ('j1', 'old', 'embed', 'done', '2024-05-01T10:30:00.250000')"
+        ))
+
+    before = datetime.utcnow()
+    run_migrations(engine)
+    with sessionmaker(bind=engine)() as session:
+        files = {f.file_id: f for f in session.query(FileInfo)}
+        assert files["old"].uploaded_at == datetime(2024, 5, 1, 10, 30)
+        # Missing dates get the migration time, not an epoch sentinel
+        assert files["undated"].uploaded_at >= before.replace(microsecond=0)
+        assert session.get(Job, "j1").created_at == datetime(2024, 5, 1, 10, 30, 0, 250000)
+        assert [f["file_id"] for f in list_files_page(session)["files"]] == ["undated", "old"]
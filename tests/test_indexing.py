@@ -0,0 +1,68 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from backend import indexing
+from backend.chunking import Chunk, count_tokens
+from backend.database import SessionLocal
+from backend.models import FileInfo
+from backend.partitions import get_partition
+from backend.resources import get_embedding_engine
+
+
+def make_chunks(*texts):
+    chunks, start = [], 0
+    for text in texts:
+        chunks.append(Chunk(text, start, start + len(text), 1, count_tokens(text)))
+        start += len(text) + 1
+    return chunks
+
+
+def visible_ids(file_id, generation):
+    stored = get_partition(file_id).collection.get(where={"file_id": file_id}, include=["metadatas"])
+    return {
+        chunk_id for chunk_id, meta in zip(stored["ids"], stored["metadatas"])
+        if meta["gen_min"] <= generation <= meta["gen_max"]
+    }
+
+
+@pytest.fixture
+def file_id(client):
+    file_id = f"idx-{uuid.uuid4().hex}"
+    with SessionLocal() as db:
+        db.add(FileInfo(file_id=file_id, file_name="indexing.pdf", uploaded_at=datetime.utcnow()))
+        db.commit()
+    return file_id
+
+
+def test_crash_leftover_stays_hidden_until_the_flip(file_id, monkeypatch):
+    kept, dropped = "Payment is due in thirty days.", "Warranty claims quote ZX-4471."
+    indexing.index_chunks(file_id, make_chunks(kept, dropped))
+    indexing.index_chunks(file_id, make_chunks(kept))
+    assert indexing.get_active_generation(file_id) == 2
+
+    # A re-index that flipped to generation 2 but died before deleting the dropped chunk
+    leftover_id = indexing.chunk_ids(file_id, [kept, dropped])[1]
+    get_partition(file_id).collection.upsert(
+        ids=[leftover_id],
+        embeddings=get_embedding_engine().embed_documents([dropped]),
+        documents=[dropped],
+        metadatas=[{"file_id": file_id, "chunk_id": 1, "gen_min": 1, "gen_max": 1}],
+    )
+    assert leftover_id not in visible_ids(file_id, 2)
+
+    # The chunk comes back in generation 3: it is written but must not surface at generation 2
+    seen_before_flip = {}
+    build_index = indexing.build_index
+
+    def check_then_build(*args, **kwargs):
+        seen_before_flip.update(visible=visible_ids(file_id, indexing.get_active_generation(file_id)))
+        return build_index(*args, **kwargs)
+
+    monkeypatch.setattr(indexing, "build_index", check_then_build)
+    result = indexing.index_chunks(file_id, make_chunks(kept, dropped))
+
+    assert result["embedded_chunks"] == 0  # its vector was reused
+    assert leftover_id not in seen_before_flip["visible"]
+    assert leftover_id in visible_ids(file_id, 3)
@@ -0,0 +1,119 @@
+import threading
+import uuid
+
+import pytest
+
+from backend import jobs
+from backend.database import SessionLocal
+from backend.indexing import _file_lock
+from backend.locks import process_lock
+from backend.models import Job
+from backend.routers import embed, extract
+
+
+class HeldPool:
+    """Keeps submitted jobs instead of running them."""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append(args)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    held = HeldPool()
+    monkeypatch.setattr(jobs, "_get_pool", lambda: held)
+    return held
+
+
+def set_status(job_id, status):
+    with SessionLocal() as db:
+        db.query(Job).filter(Job.job_id == job_id).update({"status": status})
+        db.commit()
+
+
+def test_duplicate_submit_returns_the_pending_job(pool):
+    file_id = uuid.uuid4().hex
+    first = jobs.submit_job(file_id, "ingest")
+    assert jobs.submit_job(file_id, "ingest")["job_id"] == first["job_id"]
+
+    set_status(first["job_id"], "running")
+    assert jobs.submit_job(file_id, "ingest")["job_id"] == first["job_id"]
+    # Another kind, or another file, is a different job
+    assert jobs.submit_job(file_id, "embed")["job_id"] != first["job_id"]
+    assert jobs.submit_job(uuid.uuid4().hex, "ingest")["job_id"] != first["job_id"]
+
+    set_status(first["job_id"], "done")
+    assert jobs.submit_job(file_id, "ingest")["job_id"] != first["job_id"]
+    assert len(pool.calls) == 4
+
+
+def test_concurrent_submits_queue_one_job(pool):
+    file_id = uuid.uuid4().hex
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(jobs.submit_job(file_id, "embed"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({job["job_id"] for job in results}) == 1
+    assert len(pool.calls) == 1
+
+
+def test_store_jobs_with_other_params_are_not_merged(pool):
+    with SessionLocal() as db:
+        db.query(Job).filter(Job.kind == "retention", Job.status.in_(["queued", "running"])).delete()
+        db.commit()
+    dry_run = jobs.submit_job("*", "retention", {"max_age_days": 30, "dry_run": True})
+    assert jobs.submit_job("*", "retention", {"max_age_days": 30, "dry_run": True})["job_id"] == dry_run["job_id"]
+    assert jobs.submit_job("*", "retention", {"max_age_days": 30})["job_id"] != dry_run["job_id"]
+
+
+def test_file_stages_run_under_the_file_lock(pool, monkeypatch):
+    file_id = uuid.uuid4().hex
+    waiter_done = threading.Event()
+
+    def wait_for_lock():
+        with _file_lock(file_id):
+            waiter_done.set()
+
+    def fake_extract(file_id, progress=None):
+        waiter = threading.Thread(target=wait_for_lock)
+        waiter.start()
+        waiter.join(timeout=0.2)
+        assert not waiter_done.is_set()  # another worker's job waits for this one
+        return {"pages": 1}
+
+    def fake_embed(file_id, progress=None):
+        # index_chunks takes the same lock again in this thread
+        with _file_lock(file_id):
+            return {"total_chunks": 2}
+
+    monkeypatch.setattr(extract, "extract_text", fake_extract)
+    monkeypatch.setattr(embed, "embed_file", fake_embed)
+    job = jobs.submit_job(file_id, "ingest")
+    jobs._run_job(job["job_id"], "queued")
+
+    finished = jobs.get_job(job["job_id"])
+    assert finished["status"] == "done", finished["error"]
+    assert finished["result"] == {"total_chunks": 2}
+    assert waiter_done.wait(timeout=2)
+
+
+def test_process_lock_is_reentrant_per_thread():
+    name = f"test_{uuid.uuid4().hex}"
+    acquired = threading.Event()
+
+    def other_thread():
+        with process_lock(name):
+            acquired.set()
+
+    with process_lock(name):
+        with process_lock(name):
+            pass
+        threading.Thread(target=other_thread).start()
+        assert not acquired.wait(timeout=0.2)  # still held after the inner exit
+    assert acquired.wait(timeout=2)
@@ -0,0 +1,73 @@
+from backend import retrieval
+from backend.lexical_index import build_index, delete_index, load_index, tokenize
+
+CHUNKS = {
+    "c0": "Payment is due within thirty days of the invoice date.",
+    "c1": "Replacement part PN-1042 is covered by the warranty.",
+    "c2": "Either party may terminate the agreement with written notice.",
+}
+
+
+class FakeCollection:
+    """Vector side of retrieval: returns `vector_ids` in order for every query."""
+
+    def __init__(self, vector_ids):
+        self.vector_ids = vector_ids
+        self.queries = 0
+
+    def query(self, query_embeddings, n_results, where):
+        self.queries += 1
+        ids = self.vector_ids[:n_results]
+        return {"ids": [ids], "documents": [[CHUNKS[i] for i in ids]]}
+
+    def get(self, ids, include):
+        return {
+            "ids": ids,
+            "documents": [CHUNKS[i] for i in ids],
+            "metadatas": [{"file_id": "lex-file"} for _ in ids] if "metadatas" in include else None,
+        }
+
+
+def test_compound_tokens_are_indexed_whole_and_by_parts():
+    assert tokenize("See PN-1042.") == ["see", "pn-1042", "pn", "1042"]
+
+
+def test_bm25_ranks_exact_identifier_first():
+    index = build_index("lex-file", list(CHUNKS), list(CHUNKS.values()))
+    try:
+        assert index.search("PN-1042", k=3)[0][0] == "c1"
+        assert index.search("no such words", k=3) == []
+        assert load_index("lex-file").search("terminate")[0][0] == "c2"
+    finally:
+        delete_index("lex-file")
+    assert load_index("lex-file") is None
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = retrieval.reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]])
+    assert [item for item, _ in fused] == ["b", "a", "c"]
+
+
+def test_lexical_mode_skips_the_embedding_call():
+    build_index("lex-file", list(CHUNKS), list(CHUNKS.values()))
+    try:
+        collection = FakeCollection(["c0", "c2", "c1"])
+
+        def embed_query(_question):
+            raise AssertionError("lexical retrieval must not embed")
+
+        ids, documents, _ = retrieval.retrieve(collection, "lex-file", "PN-1042", embed_query, mode="lexical", top_k=1)
+        assert ids == ["c1"] and documents == [CHUNKS["c1"]]
+        assert collection.queries == 0
+
+        ids, _, embedding = retrieval.retrieve(collection, "lex-file", "PN-1042 warranty", lambda q: [1.0], mode="hybrid", top_k=2)
+        assert ids[0] == "c1" and embedding == [1.0]
+        assert collection.queries == 1
+    finally:
+        delete_index("lex-file")
+
+
+def test_missing_index_falls_back_to_vector_search():
+    collection = FakeCollection(["c2", "c0"])
+    ids, _, _ = retrieval.retrieve(collection, "unindexed", "terminate", lambda q: [1.0], mode="lexical", top_k=1)
+    assert ids == ["c2"]
@@ -0,0 +1,248 @@
+"""Upload -> extract -> embed -> query end to end with EMBED_PROVIDER=hashing, no network."""
+import asyncio
+import json
+import os
+import uuid
+from types import SimpleNamespace
+
+import fitz
+import pytest
+
+PAGES = [
+    "Payment terms. The buyer shall pay every invoice within thirty days of delivery. "
+    "Late payment accrues interest of two percent per month on the outstanding amount.",
+    "Warranty. The supplier repairs or replaces defective goods for twelve months. "
+    "Warranty claims must quote the reference code ZX-4471 and a photo of the defect.",
+    "Termination. Either party may end this agreement with ninety days written notice. "
+    "Termination does not affect invoices already issued.",
+]
+
+
+def write_pdf(path, pages):
+    """A PDF with one page per string in `pages`."""
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 560, 800), text, fontsize=10)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def embedded_file(client, workdir):
+    # A unique last line keeps every test's file distinct (uploads are deduplicated by content)
+    pages = PAGES[:-1] + [f"{PAGES[-1]} Copy {uuid.uuid4()}."]
+    path = write_pdf(os.path.join(workdir, f"{uuid.uuid4()}.pdf"), pages)
+    with open(path, "rb") as f:
+        upload = client.post("/upload/upload_file", files={"file": ("contract.pdf", f, "application/pdf")})
+    assert upload.status_code == 200, upload.text
+    file_id = upload.json()["file_id"]
+
+    extract = client.get(f"/extract/{file_id}")
+    assert extract.status_code == 200, extract.text
+    embed = client.post(f"/embed/{file_id}")
+    assert embed.status_code == 200, embed.text
+    assert embed.json()["total_chunks"] >= len(PAGES)
+    return file_id
+
+
+def test_query_retrieves_matching_page(client, chat_model, embedded_file):
+    response = client.post("/query/", json={
+        "question": "Which reference code do warranty claims need?",
+        "file_id": embedded_file,
+    })
+    assert response.status_code == 200, response.text
+    assert response.json() == {"answer": "offline answer", "cached": False}
+    assert "ZX-4471" in chat_model.prompts[-1]
+
+
+@pytest.mark.parametrize("mode", ["vector", "lexical", "hybrid"])
+def test_every_retrieval_mode_answers(client, embedded_file, mode):
+    response = client.post("/query/", json={
+        "question": "How many days of notice end the agreement?",
+        "file_id": embedded_file,
+        "mode": mode,
+    })
+    assert response.status_code == 200, response.text
+
+
+def test_multi_query_limits_are_bounded(client, embedded_file):
+    from backend.retrieval import MULTI_CANDIDATES
+
+    question = {"question": "When is an invoice due?", "file_ids": [embedded_file]}
+    response = client.post("/query/multi", json={**question, "top_k": 3, "per_file": 3})
+    assert response.status_code == 200, response.text
+    assert len(response.json()["citations"]) <= 3
+
+    for limits in ({"top_k": 0}, {"per_file": -1}, {"top_k": MULTI_CANDIDATES + 1}, {"per_file": 10 ** 9}):
+        assert client.post("/query/multi", json={**question, **limits}).status_code == 422
+
+
+
+
+def parse_events(body):
+    """[(event, data), ...] of a Server-Sent Events body."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class GatedChatModel:
+    """Streams one token, waits for `release`, then finishes or raises `error`."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.release = asyncio.Event()
+        self.finished = False
+        self.closed = False
+
+    async def astream(self, prompt):
+        try:
+            yield SimpleNamespace(content="first ")
+            await self.release.wait()
+            if self.error:
+                raise self.error
+            yield SimpleNamespace(content="second")
+            self.finished = True
+        finally:
+            self.closed = True
+
+
+def stream_query(file_id, model, consume):
+    """Run POST /query/stream's handler with `model`; `consume(model, events)` reads the SSE body."""
+    from backend.routers.query import QueryRequest, query_pdf_stream
+
+    async def run():
+        request = QueryRequest(question="Which reference code do warranty claims need?", file_id=file_id)
+        response = await query_pdf_stream(request, model=model)
+        return await consume(model, response.body_iterator)
+
+    return asyncio.run(run())
+
+
+def event_name(event):
+    return event.split("\n", 1)[0].removeprefix("event: ")
+
+
+def test_stream_sends_context_then_tokens_then_done(client, embedded_file):
+    question = {"question": "Which reference code do warranty claims need?", "file_id": embedded_file}
+    with client.stream("POST", "/query/stream", json=question) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_events(response.read().decode("utf-8"))
+
+    assert [name for name, _ in events] == ["context", "token", "token", "done"]
+    assert events[0][1]["chunk_ids"]
+    assert "".join(data["text"] for name, data in events if name == "token") == "offline answer"
+
+
+def test_first_token_arrives_before_generation_finishes(client, embedded_file):
+    async def consume(model, events):
+        assert event_name(await events.__anext__()) == "context"
+        assert event_name(await events.__anext__()) == "token"
+        assert not model.finished
+        model.release.set()
+        return [event_name(event) async for event in events]
+
+    assert stream_query(embedded_file, GatedChatModel(), consume) == ["token", "done"]
+
+
+def test_llm_failure_mid_stream_ends_with_an_error_event(client, embedded_file):
+    async def consume(model, events):
+        received = [await events.__anext__(), await events.__anext__()]
+        model.release.set()
+        return received + [event async for event in events]
+
+    model = GatedChatModel(error=ConnectionResetError("upstream closed the connection"))
+    events = parse_events("".join(stream_query(embedded_file, model, consume)))
+    assert [name for name, _ in events] == ["context", "token", "error"]
+    assert "upstream closed" in events[-1][1]["detail"]
+
+    # The partial answer was not cached
+    question = {"question": "Which reference code do warranty claims need?", "file_id": embedded_file}
+    assert client.post("/query/", json=question).json()["cached"] is False
+
+
+def test_client_disconnect_stops_the_llm_stream(client, embedded_file):
+    async def consume(model, events):
+        await events.__anext__()
+        await events.__anext__()
+        # What Starlette does when the client goes away mid-answer
+        await events.aclose()
+        return model.closed, model.finished
+
+    assert stream_query(embedded_file, GatedChatModel(), consume) == (True, False)
+
+def test_cached_answer_is_scoped_to_the_retrieval_mode(client, embedded_file):
+    question = {"question": "When is an invoice due?", "file_id": embedded_file, "mode": "vector"}
+    assert client.post("/query/", json=question).json()["cached"] is False
+    assert client.post("/query/", json=question).json()["cached"] is True
+    # Another retrieval mode never reuses that answer
+    assert client.post("/query/", json={**question, "mode": "lexical"}).json()["cached"] is False
+
+    assert client.delete(f"/upload/{embedded_file}").status_code == 200
+    assert client.post("/query/", json=question).status_code == 404
+
+def test_cached_answer_is_checked_against_the_active_generation(client, embedded_file, monkeypatch):
+    from backend.answer_cache import answer_cache
+
+    # Another worker's cache: it never hears about this worker's re-embeds and deletes
+    monkeypatch.setattr(answer_cache, "invalidate_file", lambda file_id: None)
+    question = {"question": "How long is the warranty?", "file_id": embedded_file, "mode": "vector"}
+    assert client.post("/query/", json=question).json()["cached"] is False
+    assert client.post("/query/", json=question).json()["cached"] is True
+
+    assert client.get(f"/extract/{embedded_file}").status_code == 200
+    assert client.post(f"/embed/{embedded_file}").status_code == 200
+    assert client.post("/query/", json=question).json()["cached"] is False
+
+    assert client.delete(f"/upload/{embedded_file}").status_code == 200
+    assert client.post("/query/", json=question).status_code == 404
+
+def test_chat_follow_up_is_rewritten(client, embedded_file):
+    session_id = client.post("/chat/", json={"file_id": embedded_file}).json()["session_id"]
+
+    first = client.post(f"/chat/{session_id}", json={"question": "Which reference code do warranty claims need?"})
+    assert first.status_code == 200, first.text
+    follow_up = client.post(f"/chat/{session_id}", json={"question": "and for how many months?"}).json()
+    assert "warranty" in follow_up["standalone_question"]
+    assert follow_up["turn"] == 2
+
+    assert client.get(f"/chat/{session_id}").json()["turn_count"] == 2
+    assert client.delete(f"/chat/{session_id}").status_code == 200
+    assert client.post(f"/chat/{session_id}", json={"question": "anything else?"}).status_code == 404
+
+
+def test_bulk_ingest_counts_pages_of_resumed_and_skipped_files(client, workdir, tmp_path):
+    from backend.ingest import IngestRun, run_ingest
+
+    source = tmp_path / "inbox"
+    source.mkdir()
+    write_pdf(str(source / "contract.pdf"), PAGES[:-1] + [f"{PAGES[-1]} Copy {uuid.uuid4()}."])
+    with open(source / "contract.pdf", "rb") as f:
+        file_id = client.post("/upload/upload_file", files={"file": ("contract.pdf", f, "application/pdf")}).json()["file_id"]
+    # Extracted by an earlier run that stopped before embedding
+    assert client.get(f"/extract/{file_id}").status_code == 200
+
+    resumed = run_ingest(IngestRun(str(source), 1, 1), report_path=str(tmp_path / "first.json"))
+    assert resumed["files"]["extracted"] == resumed["files"]["embedded"] == 1
+    assert resumed["pages"] == len(PAGES)
+
+    skipped = run_ingest(IngestRun(str(source), 1, 1), report_path=str(tmp_path / "second.json"))
+    assert skipped["files"]["skipped"] == 1
+    assert skipped["pages"] == len(PAGES)
+
+    assert client.delete(f"/upload/{file_id}").status_code == 200
+
+
+def test_deleted_file_is_gone_everywhere(client, embedded_file):
+    response = client.delete(f"/upload/{embedded_file}")
+    assert response.status_code == 200, response.text
+    assert response.json()["chunks_deleted"] >= len(PAGES)
+
+    listed = client.get("/upload/list_files", params={"limit": 500}).json()["files"]
+    assert embedded_file not in {f["file_id"] for f in listed}
+    assert client.post("/query/", json={"question": "When is an invoice due?", "file_id": embedded_file}).status_code == 404
+    assert client.delete(f"/upload/{embedded_file}").status_code == 404
@@ -0,0 +1,69 @@
+import uuid
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from backend import compact_store, retrieval
+from backend.database import SessionLocal
+from backend.models import FileInfo, VectorPartition
+from backend.partitions import is_file_collection, is_partition_name, migrate, unregister
+from backend.resources import COLLECTION_NAME
+
+
+def test_only_this_providers_collections_are_partitions():
+    assert is_partition_name(COLLECTION_NAME)
+    assert is_partition_name(f"{COLLECTION_NAME}_b007")
+    assert is_partition_name(f"{COLLECTION_NAME}_f_1234")
+    assert is_file_collection(f"{COLLECTION_NAME}_f_1234")
+
+    # Another provider's collections share the prefix but are not ours
+    assert not is_partition_name(f"{COLLECTION_NAME}_sentence-transformers")
+    assert not is_partition_name(f"{COLLECTION_NAME}_sentence-transformers_b000")
+    assert not is_partition_name(f"{COLLECTION_NAME}_bucket")
+    assert not is_file_collection(f"{COLLECTION_NAME}_b007")
+
+
+@pytest.fixture
+def compact_files():
+    """FileInfo rows whose active generation 1 is in the compact store; removed afterwards."""
+    created = []
+
+    def add():
+        file_id = f"compact-{uuid.uuid4().hex[:8]}"
+        vectors = np.eye(4, dtype=np.float32)
+        ids = [f"{file_id}_{i}" for i in range(len(vectors))]
+        compact_store.write(file_id, 1, ids, ids, [{"file_id": file_id, "gen_min": 1} for _ in ids], vectors)
+        with SessionLocal() as db:
+            db.add(FileInfo(file_id=file_id, file_name=f"{file_id}.pdf", active_generation=1))
+            db.commit()
+        created.append(file_id)
+        return file_id
+
+    yield add
+    for file_id in created:
+        compact_store.delete(file_id, 1)
+        unregister(file_id)
+    with SessionLocal() as db:
+        db.query(FileInfo).filter(FileInfo.file_id.in_(created)).delete(synchronize_session=False)
+        db.commit()
+
+
+def test_migration_skips_files_in_the_compact_store(client, compact_files):
+    file_id = compact_files()
+
+    assert migrate("single")["files_skipped"] >= 1
+    with SessionLocal() as db:
+        assert db.get(VectorPartition, file_id) is None
+
+
+def test_multi_query_fan_out_is_capped(compact_files, monkeypatch):
+    from backend.routers.query import search_targets
+
+    first, second = compact_files(), compact_files()
+    monkeypatch.setattr(retrieval, "MULTI_MAX_SEARCHES", 1)
+
+    assert len(search_targets([first])) == 1
+    with pytest.raises(HTTPException) as error:
+        search_targets([first, second])
+    assert error.value.status_code == 400
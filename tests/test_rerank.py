@@ -0,0 +1,68 @@
+from backend.chunking import count_tokens
+from backend.rerank import rerank, score_candidates
+
+DOCUMENT = (
+    "The warranty covers part ZX-4471 for two years. "
+    "Claims must be filed within thirty days. "
+    "Payment is due within sixty days of the invoice. "
+    "Either party may terminate with ninety days notice."
+)
+
+
+def chunk(text, start=None, chunk_id=0, file_id="f1"):
+    """(id, text, metadata) for a chunk of DOCUMENT; spans come from the text's position."""
+    start = DOCUMENT.index(text) if start is None else start
+    metadata = {"file_id": file_id, "char_start": start, "char_end": start + len(text),
+                "chunk_id": chunk_id, "tokens": count_tokens(text), "page": 1}
+    return f"{file_id}:{chunk_id}", text, metadata
+
+
+def run(question, chunks, **kwargs):
+    ids, documents, metadatas = zip(*chunks)
+    return rerank(question, list(ids), list(documents), list(metadatas), **kwargs)
+
+
+def test_query_terms_outrank_retriever_order():
+    documents = ["Payment is due within sixty days.", "The warranty covers part ZX-4471."]
+    scores = score_candidates("warranty ZX-4471", documents)
+    assert scores[1] > scores[0]
+
+
+def test_consecutive_chunks_merge_without_repeating_overlap():
+    first = "The warranty covers part ZX-4471 for two years. Claims must"
+    second = "Claims must be filed within thirty days."
+    passages = run("warranty claims filed", [chunk(first, chunk_id=0), chunk(second, chunk_id=1)])
+
+    assert len(passages) == 1
+    assert passages[0].text == DOCUMENT[:DOCUMENT.index("days.") + len("days.")]
+    assert passages[0].chunk_ids == ["f1:0", "f1:1"]
+
+
+def test_covered_chunk_is_dropped():
+    outer = "The warranty covers part ZX-4471 for two years."
+    inner = "part ZX-4471 for two years."
+    passages = run("warranty ZX-4471", [chunk(outer, chunk_id=0), chunk(inner, chunk_id=5)])
+    assert [p.chunk_ids for p in passages] == [["f1:0"]]
+
+
+def test_packing_respects_budget_and_passage_cap():
+    chunks = [
+        chunk("The warranty covers part ZX-4471 for two years.", chunk_id=0, file_id="a"),
+        chunk("The warranty covers part ZX-4471 for two years.", chunk_id=0, file_id="b"),
+        chunk("The warranty covers part ZX-4471 for two years.", chunk_id=0, file_id="c"),
+    ]
+    # Same text from three files: deduplicated by span per file, so each file survives
+    passages = run("warranty ZX-4471", chunks, budget=30, max_passages=2)
+    assert len(passages) == 2
+    assert sum(p.tokens for p in passages) <= 30
+
+    passages = run("warranty ZX-4471", chunks, budget=5)
+    assert len(passages) == 1 and passages[0].tokens == 5  # best passage truncated, not dropped
+
+
+def test_low_scoring_passages_are_cut_off():
+    passages = run("warranty ZX-4471", [
+        chunk("The warranty covers part ZX-4471 for two years.", chunk_id=0),
+        chunk("Either party may terminate with ninety days notice.", chunk_id=9),
+    ], min_relative_score=0.6)
+    assert [p.chunk_ids for p in passages] == [["f1:0"]]
@@ -0,0 +1,122 @@
+import fcntl
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import jobs, retention
+from backend.database import SessionLocal
+from backend.locks import LOCK_DIR, process_lock
+from backend.models import FileInfo, Job
+
+
+@pytest.fixture
+def files():
+    """Adds FileInfo rows named `{prefix}-{name}` and removes them afterwards."""
+    prefix = uuid.uuid4().hex[:8]
+    created = []
+
+    def add(name, uploaded_days=None, used_days=None):
+        now = datetime.utcnow()
+        file_id = f"{prefix}-{name}"
+        with SessionLocal() as db:
+            db.add(FileInfo(
+                file_id=file_id,
+                file_name=f"{name}.pdf",
+                uploaded_at=None if uploaded_days is None else now - timedelta(days=uploaded_days),
+                last_used_at=None if used_days is None else now - timedelta(days=used_days),
+            ))
+            db.commit()
+        created.append(file_id)
+        return file_id
+
+    add.prefix = prefix
+    yield add
+    with SessionLocal() as db:
+        db.query(FileInfo).filter(FileInfo.file_id.in_(created)).delete(synchronize_session=False)
+        db.commit()
+
+
+def expired(files, **policy):
+    return [f["file_id"].split("-", 1)[1] for f in retention.expired_files(**policy)
+            if f["file_id"].startswith(files.prefix)]
+
+
+def test_max_age_selects_old_uploads_oldest_first(files):
+    files("new", uploaded_days=1)
+    files("old", uploaded_days=40, used_days=0)
+    files("older", uploaded_days=90)
+    files("undated")
+
+    assert expired(files, max_age_days=30, unused_days=0) == ["older", "old"]
+
+
+def test_unused_counts_from_upload_when_never_queried(files):
+    files("used-recently", uploaded_days=90, used_days=2)
+    files("used-long-ago", uploaded_days=90, used_days=20)
+    files("never-used", uploaded_days=20)
+    files("never-used-new", uploaded_days=2)
+    files("undated")
+
+    assert sorted(expired(files, max_age_days=0, unused_days=10)) == ["never-used", "used-long-ago"]
+
+
+def test_no_policy_selects_nothing(files):
+    files("ancient", uploaded_days=1000)
+    assert expired(files, max_age_days=0, unused_days=0) == []
+
+
+def test_scheduler_submits_once_per_interval(monkeypatch):
+    submitted = []
+
+    def submit_job(file_id, kind, params=None):
+        with SessionLocal() as db:
+            db.add(Job(job_id=str(uuid.uuid4()), file_id=file_id, kind=kind, status="queued",
+                       created_at=datetime.utcnow(), updated_at=datetime.utcnow()))
+            db.commit()
+        submitted.append(params)
+        return {"kind": kind}
+
+    monkeypatch.setattr(jobs, "submit_job", submit_job)
+    with SessionLocal() as db:
+        db.query(Job).filter(Job.kind == "retention").delete()
+        db.commit()
+
+    assert retention._schedule_once(3600) == {"kind": "retention"}
+    # A second worker waking up within the same interval finds the job and skips
+    assert retention._schedule_once(3600) is None
+    assert submitted == [{"compact_after": True}]
+
+
+def test_scheduler_skips_while_retention_is_locked(monkeypatch):
+    monkeypatch.setattr(jobs, "submit_job", lambda *args, **kwargs: pytest.fail("submitted while locked"))
+
+    # Held by another thread of this worker
+    locked, release = threading.Event(), threading.Event()
+
+    def hold():
+        with process_lock("retention"):
+            locked.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    assert locked.wait(timeout=2)
+    try:
+        assert retention._schedule_once(3600) is None
+    finally:
+        release.set()
+        holder.join()
+
+    # Held by another worker process (its flock)
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    with open(os.path.join(LOCK_DIR, "retention.lock"), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            assert retention._schedule_once(3600) is None
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    with process_lock("retention", blocking=False) as acquired:
+        assert acquired
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import sessions
+from backend.database import Base
+from backend.sessions import ChatSession, MemorySessionStore, SqliteSessionStore
+
+
+def test_follow_ups_are_detected_and_rewritten():
+    previous = "What is the late payment penalty for invoices?"
+    assert sessions.is_follow_up("and in 2023?", previous)
+    assert sessions.is_follow_up("Does it apply to refunds?", previous)
+    assert not sessions.is_follow_up("Who signs the warranty certificate?", previous)
+    assert not sessions.is_follow_up("and in 2023?", None)
+
+    assert sessions.rewrite_heuristic("and in 2023?", previous) == "and in 2023? (late payment penalty invoices)"
+
+
+def test_old_turns_fold_into_a_bounded_summary(monkeypatch):
+    monkeypatch.setattr(sessions, "CHAT_HISTORY_TURNS", 2)
+    monkeypatch.setattr(sessions, "CHAT_SUMMARY_TOKENS", 40)
+    session = ChatSession("s1", "f1")
+    for i in range(10):
+        session.add_turn(f"question {i}", f"standalone question {i}", "answer " * 200)
+
+    assert session.turn_count == 10
+    assert [turn["question"] for turn in session.turns] == ["question 8", "question 9"]
+    assert "standalone question 7" in session.summary[-1]
+    assert sum(len(line.split()) for line in session.summary) <= 40
+    history = session.history_text()
+    assert history.startswith("Earlier in the conversation:") and history.endswith("…")
+
+
+def test_candidates_are_reused_only_for_the_same_generation_and_enough_overlap():
+    session = ChatSession("s1", "f1", candidates={"generation": 2, "ids": ["a", "b", "c"], "documents": [], "metadatas": []})
+    assert sessions.reusable_candidates(session, 2, ["a", "b", "x"])
+    assert not sessions.reusable_candidates(session, 2, ["a", "x", "y"])
+    assert not sessions.reusable_candidates(session, 3, ["a", "b", "c"])
+    assert not sessions.reusable_candidates(session, 2, [])
+
+
+def test_memory_store_returns_copies_and_evicts():
+    store = MemorySessionStore(max_sessions=2, ttl=60)
+    first = ChatSession("s1", "f1")
+    store.save(first)
+    store.get("s1").add_turn("q", "q", "a")
+    assert store.get("s1").turns == []  # the stored session is not shared
+
+    store.save(ChatSession("s2", "f1"))
+    store.get("s1")  # s2 is now least recently used
+    store.save(ChatSession("s3", "f1"))
+    assert store.get("s2") is None and store.get("s1") is not None
+
+    store.ttl = 0
+    time.sleep(0.01)
+    assert store.get("s1") is None
+    assert not store.delete("s1")
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/sessions.db", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return SqliteSessionStore(session_factory=sessionmaker(bind=engine), max_sessions=2, ttl=60)
+
+
+def test_sqlite_store_roundtrip_and_evict(sqlite_store):
+    session = ChatSession("s1", "f1")
+    session.add_turn("What is due?", "What is due?", "The invoice.")
+    sqlite_store.save(session)
+    assert sqlite_store.get("s1").turns == session.turns
+
+    for session_id in ("s2", "s3"):
+        time.sleep(0.01)
+        sqlite_store.save(ChatSession(session_id, "f1"))
+    sqlite_store.evict()
+    assert sqlite_store.get("s1") is None
+    assert sqlite_store.get("s3") is not None
+    assert sqlite_store.delete("s3") and not sqlite_store.delete("s3")